@@ -1,113 +1,106 @@
 import os
+import sys
+import json
+import asyncio
+import multiprocessing
 import discord
 from discord.ext import commands, tasks
 from discord import app_commands
 from dotenv import load_dotenv
 import importlib
 import pkgutil
-from datetime import datetime, timedelta
 import database  # <-- Import  database module
+import documents
 import settings # <-- Import settings module
+import outbound
+import permissions
+import thread_sync
+import StayAlive
+import worker
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# Create tables
-database.create_all_tables()
+# Create tables / apply pending schema migrations
 database.migrate_database()
 
 load_dotenv()
 TOKEN = settings.DISCORD_TOKEN
 
 intents = discord.Intents.all()
-bot = commands.Bot(command_prefix=settings.COMMAND_PREFIX, intents=intents)
-
-# ------------------ CONFIG ------------------
-NOTIFICATION_CHANNEL_ID = settings.NOTIFICATION_CHANNEL_ID  # Set your Discord channel ID in .env
-DUE_SOON_WINDOW = settings.DUE_SOON_WINDOW  # Notify tasks due within N hour
-NOTIFIED_TASKS = set()  # Tracks tasks already notified
-# -------------------------------------------
-
-def parse_deadline(deadline_str):
-    """Parse deadline in either DD.MM.YYYY or DD.MM.YYYY HH:MM format."""
-    if not deadline_str:
-        return None
-    for fmt in ("%d.%m.%Y %H:%M", "%d.%m.%Y"):
-        try:
-            return datetime.strptime(deadline_str, fmt)
-        except ValueError:
-            continue
-    return None
-
-# ------------------ BACKGROUND LOOP ------------------
-@tasks.loop(minutes=5)
-async def check_due_tasks():
-    now = datetime.now()
-    upcoming_window = now + DUE_SOON_WINDOW
-    
-    all_tasks = database.get_all_tasks()
-    channel = bot.get_channel(NOTIFICATION_CHANNEL_ID)
-    if not channel:
-        return  # skip if channel not found
-    
-    for task in all_tasks:
-        task_id, case_id, description, deadline_str, done = task
-        
-        if done or task_id in NOTIFIED_TASKS:
-            continue  # Skip completed or already notified tasks
-        
-        task_dt = parse_deadline(deadline_str)
-        if not task_dt:
+bot_class = commands.AutoShardedBot if settings.SHARDED else commands.Bot
+bot = bot_class(
+    command_prefix=settings.COMMAND_PREFIX,
+    intents=intents,
+    max_ratelimit_timeout=settings.MAX_RATELIMIT_WAIT
+)
+bot.add_listener(permissions.invalidate_member, "on_member_update")
+for event in ("on_message", "on_message_edit", "on_raw_message_delete"):
+    bot.add_listener(getattr(thread_sync, event), event)  # keeps thread_messages current
+bot.add_listener(documents.on_message, "on_message")  # stores files posted in case threads
+
+# ------------------ BACKGROUND LOOPS ------------------
+@tasks.loop(seconds=settings.OUTBOX_POLL_SECONDS)
+async def deliver_notifications():
+    """Sends the reminders worker.py rendered into the notification outbox."""
+    pending = await asyncio.to_thread(database.get_pending_notifications, settings.OUTBOX_BATCH_SIZE)
+    results = []
+    for entry in pending:
+        channel = bot.get_channel(int(entry.channel_id))
+        if channel is None or channel.guild.id != int(entry.guild_id):
+            results.append((entry.id, "failed"))  # channel deleted or bot removed from the guild
             continue
 
-        case = database.get_case_by_id(case_id)
-        contacts = database.get_contacts_for_case(case_id)
-
-        # Collect mentions for Discord users who have discord_id set
-        print(contacts)
-        mentions = [f"<@{c[7]}>" for c in contacts if c[7]]  # c[7] is discord_id
-        mention_text = " ".join(mentions) if mentions else "No users linked"
-
-        if task_dt < now:
-            # OVERDUE TASK
-            embed = discord.Embed(
-                title="❌ Task Overdue!",
-                color=discord.Color.red(),
-                timestamp=task_dt
-            )
-            embed.add_field(name="Task", value=description, inline=False)
-            embed.add_field(name="Case", value=f"{case[1]} (ID: {case_id})", inline=False)
-            embed.add_field(name="Deadline", value=task_dt.strftime('%d.%m.%Y %H:%M'), inline=False)
-            embed.add_field(name="Linked Contacts", value=mention_text, inline=False)
-            embed.set_footer(text="Reminder from TaskBot")
-
-            await channel.send(embed=embed)
-
-            # Send actual ping message
-            if mentions:
-                await channel.send("🔔 " + " ".join(mentions))
-
-            NOTIFIED_TASKS.add(task_id)
-
-        elif now <= task_dt <= upcoming_window:
-            # DUE SOON TASK
-            embed = discord.Embed(
-                title="⚠️ Task Due Soon!",
-                color=discord.Color.orange(),
-                timestamp=task_dt
-            )
-            embed.add_field(name="Task", value=description, inline=False)
-            embed.add_field(name="Case", value=f"{case[1]} (ID: {case_id})", inline=False)
-            embed.add_field(name="Deadline", value=task_dt.strftime('%d.%m.%Y %H:%M'), inline=False)
-            embed.add_field(name="Linked Contacts", value=mention_text, inline=False)
-            embed.set_footer(text="Reminder from TaskBot")
-
-            await channel.send(embed=embed)
-
+        payload = json.loads(entry.payload)
+        embed = discord.Embed.from_dict(payload["embed"])
+        route = f"channel:{channel.id}"
+        try:
+            await outbound.submit(outbound.BACKGROUND, route, lambda: channel.send(embed=embed))
             # Send actual ping message
-            if mentions:
-                await channel.send("🔔 " + " ".join(mentions))
-
-            NOTIFIED_TASKS.add(task_id)
+            if payload["ping"]:
+                await outbound.submit(outbound.BACKGROUND, route, lambda: channel.send(payload["ping"]))
+            results.append((entry.id, "sent"))
+        except discord.HTTPException as e:
+            print(f"[REMINDERS] Sending notification {entry.id} failed: {e}")
+            results.append((entry.id, "failed"))
+
+    if results:
+        await asyncio.to_thread(database.mark_notifications, results)
+
+@tasks.loop(hours=settings.MAINTENANCE_INTERVAL_HOURS)
+async def run_maintenance():
+    """Reclaims free pages and refreshes planner statistics in small steps off the event loop."""
+    remaining = await asyncio.to_thread(database.get_freelist_count)
+    while remaining:
+        previous = remaining
+        remaining = await asyncio.to_thread(database.incremental_vacuum, settings.VACUUM_PAGES_PER_STEP)
+        if remaining >= previous:
+            break  # auto_vacuum not incremental, nothing to reclaim
+        await asyncio.sleep(settings.MAINTENANCE_STEP_DELAY)
+
+    await asyncio.to_thread(database.analyze)
+    pruned = await asyncio.to_thread(database.prune_notifications, settings.OUTBOX_RETENTION_DAYS)
+    await asyncio.to_thread(database.prune_idempotency_keys, settings.IDEMPOTENCY_TTL_SECONDS)
+    removed = await asyncio.to_thread(documents.prune)
+    evicted = permissions.prune()
+    print(
+        f"[MAINTENANCE] Vacuum and ANALYZE finished ({remaining} free pages left, {pruned} old notifications pruned, "
+        f"{removed} unused document files removed, {evicted} idle permission cache entries dropped)"
+    )
+
+
+@tasks.loop(minutes=settings.STATS_REFRESH_MINUTES)
+async def refresh_task_stats():
+    """Task counts are kept by triggers; only deadlines passing need a periodic recompute."""
+    await asyncio.to_thread(database.refresh_overdue_stats)
+
+
+@tasks.loop(minutes=settings.THREAD_SYNC_MINUTES)
+async def sync_threads():
+    """Copies thread messages posted while the bot was offline or disconnected."""
+    try:
+        await thread_sync.sync(bot)
+    except Exception as e:
+        print(f"[THREADS] Sync failed: {e}")
 
 
 # ------------------ BOT EVENTS ------------------
@@ -123,9 +116,29 @@ async def on_ready():
     await bot.tree.sync()
     print(f"{bot.user} is online!")
     
-    # Start the background task
-    check_due_tasks.start()
-    check_due_tasks()
-
-# ------------------ RUN BOT ------------------
-bot.run(TOKEN)
+    # Start the background tasks (on_ready fires again after reconnects)
+    for loop in (deliver_notifications, run_maintenance, refresh_task_stats, sync_threads):
+        if not loop.is_running():
+            loop.start()
+
+# ------------------ RUN ------------------
+# python MainScript.py [all|bot|worker], see settings.PROCESS_ROLE
+# python MainScript.py assign-guild: one-off, gives rows from before multi-guild support to GUILD_ID
+if __name__ == "__main__":
+    role = sys.argv[1] if len(sys.argv) > 1 else settings.PROCESS_ROLE
+    if role not in ("all", "bot", "worker", "assign-guild"):
+        sys.exit(f"Unknown role '{role}', expected all, bot, worker or assign-guild")
+
+    if role == "assign-guild":
+        if not settings.DEFAULT_GUILD_ID:
+            sys.exit("Set GUILD_ID to the guild the existing cases and contacts belong to")
+        database.assign_default_guild()
+    elif role == "worker":
+        worker.run()
+    else:
+        if role == "all":
+            # Scanning runs on its own core; daemon, so it stops with the bot
+            multiprocessing.Process(target=worker.run, name="reminder-worker", daemon=True).start()
+        if settings.KEEP_ALIVE_PORT:
+            StayAlive.keep_alive()  # /metrics reads this process's counters, so it runs next to the bot
+        bot.run(TOKEN)
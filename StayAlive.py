@@ -1,5 +1,7 @@
-from flask import Flask
+from flask import Flask, jsonify
 from threading import Thread
+import metrics
+import settings
 
 app = Flask('')
 
@@ -7,9 +9,13 @@ app = Flask('')
 def home():
     return "Bot is alive!"
 
+@app.route('/metrics')
+def show_metrics():
+    return jsonify(metrics.snapshot())
+
 def run():
-    app.run(host='0.0.0.0', port=8080)
+    app.run(host='0.0.0.0', port=settings.KEEP_ALIVE_PORT)
 
 def keep_alive():
-    t = Thread(target=run)
+    t = Thread(target=run, daemon=True)  # stops with the bot
     t.start()
@@ -0,0 +1,99 @@
+"""
+Append-only audit log of changes to cases and contacts (the case_events table).
+
+record() only appends to an in-memory buffer, so handlers never wait on a write.
+The buffer is written in one executemany transaction once it holds
+settings.AUDIT_BATCH_SIZE events, or settings.AUDIT_FLUSH_SECONDS after the first
+unwritten event, whichever comes first. Events still buffered at exit are written then.
+"""
+import asyncio
+import atexit
+import json
+import database
+import metrics
+import settings
+import temporal
+
+_buffer = []  # rows in case_events column order, see database.insert_case_events
+_flush_handle = None
+_flush_lock = None
+
+
+def changes(before, after):
+    """{field: [old, new]} for the fields of `after` whose value differs in `before`."""
+    # Empty strings from modal inputs count as unset, like None in the database
+    return {
+        field: [before.get(field), value]
+        for field, value in after.items()
+        if (before.get(field) or None) != (value or None)
+    }
+
+
+def record(action, actor_id, description=None, case_id=None, contact_id=None, diff=None, guild_id=None):
+    """Queues one event. `diff` is a dict (see changes()) and is stored as JSON."""
+    _buffer.append((
+        case_id,
+        contact_id,
+        str(actor_id) if actor_id else None,
+        action,
+        description,
+        json.dumps(diff, ensure_ascii=False) if diff else None,
+        temporal.now().strftime("%Y-%m-%d %H:%M:%S"),
+        str(guild_id) if guild_id else None,
+    ))
+    metrics.set_value("audit_buffered", len(_buffer))
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        database.insert_case_events(_take())  # no event loop (scripts): write right away
+        return
+
+    if len(_buffer) >= settings.AUDIT_BATCH_SIZE:
+        _schedule_flush(0)
+    elif _flush_handle is None:
+        _schedule_flush(settings.AUDIT_FLUSH_SECONDS)
+
+
+def _take():
+    batch = _buffer[:]
+    _buffer.clear()
+    metrics.set_value("audit_buffered", 0)
+    return batch
+
+
+def _schedule_flush(delay):
+    global _flush_handle
+    if _flush_handle:
+        _flush_handle.cancel()
+    _flush_handle = asyncio.get_running_loop().call_later(delay, lambda: asyncio.ensure_future(flush()))
+
+
+async def flush():
+    """Writes all buffered events. Call before reading case_events so the newest events are included."""
+    global _flush_handle, _flush_lock
+    if _flush_lock is None:
+        _flush_lock = asyncio.Lock()
+
+    # The lock keeps batches in order, so event ids follow the order events were recorded
+    async with _flush_lock:
+        if _flush_handle:
+            _flush_handle.cancel()
+            _flush_handle = None
+        batch = _take()
+        if not batch:
+            return
+        try:
+            await asyncio.to_thread(database.insert_case_events, batch)
+        except Exception as e:
+            print(f"[AUDIT] Writing {len(batch)} events failed, retrying later: {e}")
+            _buffer[:0] = batch
+            _schedule_flush(settings.AUDIT_FLUSH_SECONDS)
+            return
+        metrics.increment("audit_events_written", len(batch))
+
+
+@atexit.register
+def _flush_at_exit():
+    if _buffer:
+        database.insert_case_events(_take())
@@ -0,0 +1,41 @@
+"""
+The clock the reminder path reads the current time from.
+
+Production code calls temporal.now(), which asks the clock installed here; that is
+the system clock unless replay.py installs a SimulatedClock to run days of
+deadlines in seconds.
+"""
+from datetime import datetime, timezone
+
+
+class SystemClock:
+    def now(self):
+        return datetime.now(timezone.utc)
+
+
+class SimulatedClock:
+    """A clock that only moves when advance() is called."""
+
+    def __init__(self, start):
+        self.current = start.astimezone(timezone.utc)
+
+    def now(self):
+        return self.current
+
+    def advance(self, delta):
+        self.current += delta
+        return self.current
+
+
+_clock = SystemClock()
+
+
+def now():
+    return _clock.now()
+
+
+def install(new_clock):
+    """Makes `new_clock` the process-wide clock and returns the previous one."""
+    global _clock
+    previous, _clock = _clock, new_clock
+    return previous
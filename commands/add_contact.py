@@ -2,6 +2,11 @@ import discord
 from discord import app_commands
 import database
 import settings
+import permissions
+import outbound
+import audit
+import guild_config
+import idempotency
 from datetime import datetime
 
 class ContactModal(discord.ui.Modal, title="Add Contact"):
@@ -16,22 +21,43 @@ class ContactModal(discord.ui.Modal, title="Add Contact"):
     )
 
     async def on_submit(self, interaction: discord.Interaction):
-        # Convert empty string to None
-        discord_user_id = self.discord_id.value.strip() if self.discord_id.value else None
-
-        # Get contacts forum
-        forum_channel = interaction.client.get_channel(settings.CONTACTS_FORUM_CHANNEL_ID)
-        if forum_channel is None:
+        # Ask first if this looks like a contact that already exists
+        duplicates = database.find_similar_contacts(interaction.guild_id, self.name.value, self.contact.value)
+        if duplicates:
             await interaction.response.send_message(
-                "⚠️ Contacts forum channel not found. Please check settings.CONTACTS_FORUM_CHANNEL_ID.",
+                embed=build_duplicates_embed(duplicates),
+                view=DuplicateContactView(self, duplicates),
                 ephemeral=True
             )
             return
 
+        # Creating the thread waits its turn in the outbound queue, which can take longer
+        # than Discord allows before an interaction must be answered
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        await interaction.followup.send(await self.create_contact(interaction), ephemeral=True)
+
+    async def create_contact(self, interaction: discord.Interaction):
+        """Creates the forum thread and the contact; returns the confirmation to show the user."""
+        # Get contacts forum
+        forum_channel = guild_config.get_channel(interaction.client, interaction.guild_id, "contacts_forum_channel_id")
+        if forum_channel is None:
+            return "⚠️ Contacts forum channel not found. An admin can set it with `/configure`."
+
+        # A repeated submission gets the first reply instead of a second contact and thread
+        payload = {field.label: field.value for field in (self.name, self.contact, self.notes, self.status, self.discord_id)}
+        return await idempotency.run(
+            interaction, "add_contact", payload, lambda: self.insert_contact(interaction, forum_channel)
+        )
+
+    async def insert_contact(self, interaction: discord.Interaction, forum_channel):
+        # Convert empty string to None
+        discord_user_id = self.discord_id.value.strip() if self.discord_id.value else None
+
         # Step 1: Create placeholder thread
-        created = await forum_channel.create_thread(
-            name=f"{self.name.value}",
-            content="📌 Contact created via bot."
+        created = await outbound.submit(
+            outbound.INTERACTION,
+            f"channel:{forum_channel.id}",
+            lambda: forum_channel.create_thread(name=f"{self.name.value}", content="📌 Contact created via bot.")
         )
 
         contact_thread = created.thread
@@ -45,7 +71,12 @@ class ContactModal(discord.ui.Modal, title="Add Contact"):
             self.status.value,
             discord_user_id,
             str(contact_thread.id),
-            str(starter_message.id)
+            str(starter_message.id),
+            interaction.guild_id
+        )
+        audit.record(
+            "create", interaction.user.id, f"Contact created: {self.name.value}",
+            contact_id=contact_id, guild_id=interaction.guild_id
         )
 
         # Step 3: Build embed (now including contact_id)
@@ -63,24 +94,69 @@ class ContactModal(discord.ui.Modal, title="Add Contact"):
             embed.add_field(name="Linked Discord", value=f"<@{discord_user_id}>", inline=False)
 
         # Update the starter message with the final embed
-        await starter_message.edit(content="📌 Contact created via bot:", embed=embed)
+        await outbound.submit(
+            outbound.INTERACTION,
+            f"channel:{contact_thread.id}",
+            lambda: starter_message.edit(content="📌 Contact created via bot:", embed=embed)
+        )
 
         # Confirm to user
-        await interaction.response.send_message(
+        return (
             f"✅ Contact added!\nID: `{contact_id}`\nName: `{self.name.value}`"
             f"\n🔗 Linked forum post: {contact_thread.mention}"
-            + (f"\nDiscord: <@{discord_user_id}>" if discord_user_id else ""),
-            ephemeral=True
+            + (f"\nDiscord: <@{discord_user_id}>" if discord_user_id else "")
         )
 
 
+# ---- Duplicate Check ----
+def build_duplicates_embed(duplicates):
+    lines = []
+    for score, contact in duplicates[:settings.DUPLICATES_SHOWN]:
+        thread = f" • <#{contact.channel_id}>" if contact.channel_id else ""
+        lines.append(
+            f"- `{contact.id}` **{contact.name}** ({contact.status or 'no status'}) — {score:.0%} match{thread}"
+            + (f"\n  {contact.contact}" if contact.contact else "")
+        )
+    return discord.Embed(
+        title="⚠️ Possible duplicate contact",
+        description="Similar contacts already exist:\n" + "\n".join(lines),
+        color=discord.Color.gold()
+    )
+
+
+class DuplicateContactView(discord.ui.View):
+    """Use one of the existing contacts, or create the new one anyway. Only lives for this prompt."""
+    def __init__(self, modal, duplicates):
+        super().__init__(timeout=300)
+        self.modal = modal
+        for _, contact in duplicates[:settings.DUPLICATES_SHOWN]:
+            button = discord.ui.Button(label=f"Use #{contact.id}", style=discord.ButtonStyle.primary)
+            button.callback = self.use_existing(contact)
+            self.add_item(button)
+        create = discord.ui.Button(label="Create anyway", style=discord.ButtonStyle.secondary)
+        create.callback = self.create_anyway
+        self.add_item(create)
+
+    def use_existing(self, contact):
+        async def callback(interaction: discord.Interaction):
+            self.stop()
+            thread = f"\n🔗 Forum post: <#{contact.channel_id}>" if contact.channel_id else ""
+            await interaction.response.edit_message(
+                content=f"👍 Using existing contact `{contact.id}` **{contact.name}**; nothing was created.{thread}",
+                embed=None,
+                view=None
+            )
+        return callback
+
+    async def create_anyway(self, interaction: discord.Interaction):
+        self.stop()
+        await interaction.response.defer()
+        confirmation = await self.modal.create_contact(interaction)
+        await interaction.edit_original_response(content=confirmation, embed=None, view=None)
+
+
 async def setup(bot):
     @bot.tree.command(name="add_contact", description="Add a new contact/party.")
+    @permissions.guard("add_contact")
     async def add_contact(interaction: discord.Interaction):
-        allowed_role = discord.utils.get(interaction.user.roles, id=settings.EMPLOYEE_ROLE_ID)
-        if not allowed_role:
-            # Not allowed
-            await interaction.response.send_message("❌ You do not have permission.", ephemeral=True)
-            return
-       # Allowed
         await interaction.response.send_modal(ContactModal())
@@ -0,0 +1,32 @@
+import discord
+from discord import app_commands
+import asyncio
+from datetime import datetime, timedelta
+import database
+import conflicts
+import permissions
+
+async def setup(bot):
+    @bot.tree.command(
+        name="archive_cases",
+        description="Move closed cases with their tasks and links into the archive."
+    )
+    @app_commands.describe(
+        older_than_days="Only archive cases closed at least this many days ago (default 0)"
+    )
+    @permissions.guard("archive_cases")
+    async def archive_cases(interaction: discord.Interaction, older_than_days: int = 0):
+
+        closed_before = None
+        if older_than_days > 0:
+            # closed_at is stored by SQLite's CURRENT_TIMESTAMP, i.e. in UTC
+            closed_before = (datetime.utcnow() - timedelta(days=older_than_days)).strftime("%Y-%m-%d %H:%M:%S")
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        archived = await asyncio.to_thread(database.archive_closed_cases, interaction.guild_id, closed_before)
+        conflicts.invalidate(interaction.guild_id)  # their links are reloaded from the archive
+
+        await interaction.followup.send(
+            f"🗄️ Archived `{archived}` closed case(s). They remain viewable with `/view_case`.",
+            ephemeral=True
+        )
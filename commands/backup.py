@@ -0,0 +1,141 @@
+import discord
+from discord.ext import tasks
+import asyncio
+import os
+import shutil
+import time
+from datetime import datetime
+import database
+import documents
+import metrics
+import settings
+import permissions
+
+BACKUP_PREFIX = "database-"
+ARCHIVE_PREFIX = "archive-"
+DOCUMENTS_BACKUP_DIR = os.path.join(settings.BACKUP_DIR, "documents")
+REMOVED_SUFFIX = ".removed"
+
+# ---- Helper Functions to Take, Verify and Rotate a Backup ----
+def take_copy(prefix, stamp, archive=False):
+    """Backs up one database file as <prefix><stamp>.db, keeping only verified copies; returns the path."""
+    path = os.path.join(settings.BACKUP_DIR, f"{prefix}{stamp}.db")
+    partial_path = path + ".partial"
+    try:
+        database.backup_database(partial_path, archive=archive)
+    except Exception:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    os.replace(partial_path, path)  # only verified backups get a final name
+    return path
+
+
+def rotate(prefix):
+    backups = sorted(f for f in os.listdir(settings.BACKUP_DIR) if f.startswith(prefix) and f.endswith(".db"))
+    for old in backups[:-settings.BACKUP_KEEP]:
+        os.remove(os.path.join(settings.BACKUP_DIR, old))
+
+
+def mirror_documents():
+    """
+    Copies stored documents that aren't in the backup yet; returns how many. Files are named
+    by their hash and never change, so each is copied once. Files removed from the store are
+    marked and only deleted from the backup once every kept database backup is newer.
+    """
+    if not os.path.isdir(settings.DOCUMENTS_DIR):
+        return 0
+    stored = {}
+    for root, _, files in os.walk(settings.DOCUMENTS_DIR):
+        if root != documents.TEMP_DIR:
+            stored.update((name, os.path.join(root, name)) for name in files)
+
+    copied = 0
+    os.makedirs(DOCUMENTS_BACKUP_DIR, exist_ok=True)
+    for name, source in stored.items():
+        target = os.path.join(DOCUMENTS_BACKUP_DIR, name)
+        if os.path.exists(target + REMOVED_SUFFIX):
+            os.replace(target + REMOVED_SUFFIX, target)  # used by a case again
+        if not os.path.exists(target):
+            shutil.copyfile(source, target + ".partial")
+            os.replace(target + ".partial", target)
+            copied += 1
+
+    retention = settings.BACKUP_KEEP * settings.BACKUP_INTERVAL_HOURS * 3600
+    for name in os.listdir(DOCUMENTS_BACKUP_DIR):
+        path = os.path.join(DOCUMENTS_BACKUP_DIR, name)
+        if name.endswith(REMOVED_SUFFIX):
+            if os.path.getmtime(path) < time.time() - retention:
+                os.remove(path)
+        elif name not in stored:
+            os.replace(path, path + REMOVED_SUFFIX)
+            os.utime(path + REMOVED_SUFFIX)  # the retention period starts now
+    return copied
+
+
+def run_backup():
+    """
+    Takes a verified backup of the live and archive databases, copies new documents and
+    deletes the oldest database backups beyond settings.BACKUP_KEEP.
+    Returns (path, size, seconds, documents copied).
+    """
+    os.makedirs(settings.BACKUP_DIR, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+
+    started = time.perf_counter()
+    paths = [take_copy(BACKUP_PREFIX, stamp)]
+    if database.has_archive():
+        paths.append(take_copy(ARCHIVE_PREFIX, stamp, archive=True))
+    copied = mirror_documents()
+    duration = time.perf_counter() - started
+    size = sum(os.path.getsize(path) for path in paths)
+
+    rotate(BACKUP_PREFIX)
+    rotate(ARCHIVE_PREFIX)
+
+    metrics.observe("backup_duration_seconds", round(duration, 3))
+    metrics.observe("backup_size_bytes", size)
+    metrics.increment("backups_taken")
+    metrics.increment("backup_documents_copied", copied)
+    print(f"[BACKUP] {paths[0]} ({size / 1024:.0f} KiB in {duration:.1f}s, {copied} new documents)")
+    return paths[0], size, duration, copied
+
+
+async def backup_in_background():
+    try:
+        return await asyncio.to_thread(run_backup)
+    except Exception as e:
+        metrics.increment("backups_failed")
+        print(f"[BACKUP] Backup failed: {e}")
+        raise
+
+
+@tasks.loop(hours=settings.BACKUP_INTERVAL_HOURS)
+async def scheduled_backup():
+    try:
+        await backup_in_background()
+    except Exception:
+        pass  # logged by backup_in_background; the next run tries again
+
+
+async def setup(bot):
+    if not scheduled_backup.is_running():
+        scheduled_backup.start()
+
+    @bot.tree.command(name="backup", description="Take a database backup now.")
+    @permissions.guard("backup")
+    async def backup(interaction: discord.Interaction):
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        try:
+            path, size, duration, copied = await backup_in_background()
+        except Exception as e:
+            await interaction.followup.send(f"❌ Backup failed: {e}", ephemeral=True)
+            return
+
+        await interaction.followup.send(
+            f"✅ Backup saved as `{os.path.basename(path)}`\n"
+            f"Size: `{size / 1024:.0f} KiB` with the archive • Duration: `{duration:.1f}s` • Integrity check passed\n"
+            f"Documents: `{copied}` new files copied to `{os.path.relpath(DOCUMENTS_BACKUP_DIR, settings.BACKUP_DIR)}/`",
+            ephemeral=True
+        )
@@ -0,0 +1,114 @@
+import discord
+from discord import app_commands
+import aiohttp
+import asyncio
+import os
+import database
+import documents
+import embeds
+import permissions
+import settings
+import temporal
+from commands.view_case import update_case_post
+
+
+def document_line(guild_id, document):
+    name = embeds.clip(document.filename, 100)
+    if document.message_id:
+        name = f"[{name}](https://discord.com/channels/{guild_id}/{document.channel_id}/{document.message_id})"
+    uploader = f" · <@{document.uploaded_by}>" if document.uploaded_by else ""
+    return (
+        f"- `#{document.id}` {name} · {documents.format_size(document.size or 0)}"
+        f"{uploader} · {temporal.format_deadline(document.created_at, 'd')}"
+    )
+
+
+def case_exists(case_id, guild_id):
+    return database.get_case_by_id(case_id, guild_id) or database.get_archived_case_details(case_id, guild_id)
+
+
+async def setup(bot):
+    @bot.tree.command(name="case_documents", description="List the documents stored for a case.")
+    @app_commands.describe(case_id="ID of the case")
+    @permissions.guard("case_documents")
+    async def case_documents(interaction: discord.Interaction, case_id: str):
+        if not case_exists(case_id, interaction.guild_id):
+            await interaction.response.send_message("❌ Case not found.", ephemeral=True)
+            return
+
+        listed, (count, total_size) = database.get_case_documents(case_id, interaction.guild_id, settings.DOCUMENTS_SHOWN)
+        if not count:
+            await interaction.response.send_message(
+                f"No documents stored for case `{case_id}`. Post files in its thread or use `/upload_document`.",
+                ephemeral=True
+            )
+            return
+
+        def make_page(number):
+            embed = discord.Embed(
+                title=f"📎 Documents of Case {case_id}",
+                description=f"{count} files, {documents.format_size(total_size)}. Download one with `/get_document`.",
+                color=discord.Color.blue()
+            )
+            if count > len(listed):
+                embed.set_footer(text=f"Newest {len(listed)} shown")
+            return embed
+
+        composer = embeds.EmbedComposer(make_page)
+        composer.add_lines("Files", [document_line(interaction.guild_id, d) for d in listed])
+        pages = composer.build()
+        await interaction.response.send_message(embed=pages[0], ephemeral=True)
+        for page in pages[1:]:
+            await interaction.followup.send(embed=page, ephemeral=True)
+
+    @bot.tree.command(name="upload_document", description="Store a file with a case.")
+    @app_commands.describe(case_id="ID of the case", file="The document to store")
+    @permissions.guard("upload_document")
+    async def upload_document(interaction: discord.Interaction, case_id: str, file: discord.Attachment):
+        if not database.get_case_by_id(case_id, interaction.guild_id):
+            await interaction.response.send_message("❌ Case not found.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        try:
+            document_id = await documents.store_attachment(file, case_id, interaction.guild_id, interaction.user.id)
+        except documents.DocumentTooLarge as e:
+            await interaction.followup.send(f"❌ `{file.filename}` is {e}.", ephemeral=True)
+            return
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            await interaction.followup.send(f"❌ Could not download `{file.filename}`: {e}", ephemeral=True)
+            return
+
+        if document_id is None:
+            await interaction.followup.send(f"ℹ️ Case `{case_id}` already has this file.", ephemeral=True)
+            return
+        await update_case_post(
+            interaction, case_id, f"📎 Document `#{document_id}` added: {file.filename}", action="document"
+        )
+        await interaction.followup.send(
+            f"✅ `{file.filename}` ({documents.format_size(file.size)}) stored as document `#{document_id}`.",
+            ephemeral=True
+        )
+
+    @bot.tree.command(name="get_document", description="Download a stored case document.")
+    @app_commands.describe(document_id="Document number from /case_documents")
+    @permissions.guard("get_document")
+    async def get_document(interaction: discord.Interaction, document_id: int):
+        document = database.get_case_document(document_id, interaction.guild_id)
+        path = documents.path_for(document.sha256) if document else None
+        if not path or not os.path.exists(path):
+            await interaction.response.send_message("❌ Document not found.", ephemeral=True)
+            return
+        if document.size > interaction.guild.filesize_limit:
+            await interaction.response.send_message(
+                f"❌ `{document.filename}` ({documents.format_size(document.size)}) is larger than this server's upload limit.",
+                ephemeral=True
+            )
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        await interaction.followup.send(
+            f"📎 `{document.filename}` from case `{document.case_id}`",
+            file=discord.File(path, filename=document.filename),
+            ephemeral=True
+        )
@@ -0,0 +1,89 @@
+import discord
+from discord import app_commands
+import json
+import database
+import settings
+import permissions
+import temporal
+import audit
+
+MAX_DESCRIPTION_LENGTH = 4000  # Slightly below Discord limit
+MAX_VALUE_LENGTH = 80  # per old/new value in a diff line
+
+def shorten(value, length=MAX_VALUE_LENGTH):
+    value = str(value) if value not in (None, "") else "∅"
+    return value if len(value) <= length else value[:length - 1] + "…"
+
+def format_event(event):
+    actor = f"<@{event.actor_id}>" if event.actor_id else "System"
+    lines = [f"{temporal.format_deadline(event.created_at)} · {actor} · **{event.action}**"]
+    if event.diff:
+        for field, (old, new) in json.loads(event.diff).items():
+            lines.append(f"> {field}: {shorten(old)} → {shorten(new)}")
+    elif event.description:
+        lines.append(f"> {shorten(event.description.replace(chr(10), ' '), 200)}")
+    return "\n".join(lines)
+
+# ---- Helper Function to Build One History Page ----
+def build_history_page(guild_id, case_id, before_id=None):
+    """Returns (embed, view) for the events of a case older than `before_id`."""
+    page_size = settings.HISTORY_PAGE_SIZE
+    events = database.get_case_events(guild_id, case_id, before_id, page_size + 1)
+    has_more = len(events) > page_size
+
+    description = ""
+    last_shown = None
+    for event in events[:page_size]:
+        entry = format_event(event) + "\n\n"
+        if description and len(description) + len(entry) > MAX_DESCRIPTION_LENGTH:
+            has_more = True
+            break
+        description += entry
+        last_shown = event.id
+
+    embed = discord.Embed(
+        title=f"🕓 History of Case {case_id}",
+        description=description or "No history recorded for this case.",
+        color=discord.Color.dark_grey()
+    )
+    embed.set_footer(text="Newest first")
+
+    view = discord.ui.View(timeout=None)
+    if has_more and last_shown is not None:
+        view.add_item(HistoryButton(case_id, last_shown))
+    view.stop()  # clicks are routed to the registered HistoryButton, see view_case.build_case_view
+    return embed, view
+
+
+class HistoryButton(
+    discord.ui.DynamicItem[discord.ui.Button, discord.ui.View],
+    template=r"case_history:(?P<case_id>[\w-]+):(?P<before_id>\d+)"
+):
+    """Loads the next older page; the position is carried in the custom_id."""
+    def __init__(self, case_id, before_id):
+        super().__init__(discord.ui.Button(
+            label="Older", style=discord.ButtonStyle.secondary, custom_id=f"case_history:{case_id}:{before_id}"
+        ))
+        self.case_id = case_id
+        self.before_id = before_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["case_id"], int(match["before_id"]))
+
+    @permissions.guard("case_history")
+    async def callback(self, interaction: discord.Interaction):
+        embed, view = build_history_page(interaction.guild_id, self.case_id, self.before_id)
+        await interaction.response.edit_message(embed=embed, view=view)
+
+
+async def setup(bot):
+    bot.add_dynamic_items(HistoryButton)
+
+    @bot.tree.command(name="case_history", description="Show the change history of a case.")
+    @app_commands.describe(case_id="The ID of the case")
+    @permissions.guard("case_history")
+    async def case_history(interaction: discord.Interaction, case_id: str):
+        await audit.flush()  # include events still waiting in the write buffer
+        embed, view = build_history_page(interaction.guild_id, case_id)
+        await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
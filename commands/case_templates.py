@@ -0,0 +1,117 @@
+import discord
+from discord import app_commands
+import database
+import embeds
+import permissions
+import settings
+import temporal
+
+# ---- Helper Function to Parse Template Tasks ----
+def parse_template_tasks(text):
+    """
+    Reads one task per line, optionally followed by "| <deadline offset>" such as
+    "| 14d" or "| 2d 4h". Returns (tasks, errors): tasks as (task, minutes or None).
+    """
+    tasks, errors = [], []
+    for number, line in enumerate(text.splitlines(), start=1):
+        task, _, offset_text = line.partition("|")
+        task = task.strip().lstrip("-• ").strip()
+        if not task:
+            continue
+        offset = None
+        if offset_text.strip():
+            offset = temporal.parse_offset(offset_text)
+            if offset is None:
+                errors.append(f"Line {number}: `{offset_text.strip()}` is not an offset like `14d` or `2d 4h`")
+                continue
+        tasks.append((task, offset))
+    return tasks, errors
+
+
+def template_task_line(task):
+    return f"- {task.task}" + (f" (+{temporal.format_offset(task.deadline_offset)})" if task.deadline_offset is not None else "")
+
+
+async def template_autocomplete(interaction: discord.Interaction, current: str):
+    current = current.lower()
+    templates = database.get_case_templates(interaction.guild_id)
+    return [app_commands.Choice(name=t.name, value=t.name) for t in templates if current in t.name.lower()][:25]
+
+
+# ---- Modal for Saving a Template ----
+class TemplateModal(discord.ui.Modal, title="Save Case Template"):
+    def __init__(self, name=None, tasks=()):
+        super().__init__()
+        self.name = discord.ui.TextInput(
+            label="Template Name", placeholder="e.g. Lease dispute", default=name, required=True, max_length=100
+        )
+        self.tasks = discord.ui.TextInput(
+            label="Tasks (one per line, optional | deadline)",
+            placeholder="Request lease agreement | 3d\nSend demand letter | 14d\nCalendar hearing",
+            default="\n".join(
+                f"{t.task} | {temporal.format_offset(t.deadline_offset)}" if t.deadline_offset is not None else t.task
+                for t in tasks
+            ) or None,
+            required=True,
+            style=discord.TextStyle.paragraph,
+            max_length=4000
+        )
+        self.add_item(self.name)
+        self.add_item(self.tasks)
+
+    async def on_submit(self, interaction: discord.Interaction):
+        tasks, errors = parse_template_tasks(self.tasks.value)
+        if errors:
+            await interaction.response.send_message("❌ Template not saved:\n" + "\n".join(errors[:10]), ephemeral=True)
+            return
+        if len(tasks) > settings.TEMPLATE_MAX_TASKS:
+            await interaction.response.send_message(
+                f"❌ A template can have at most {settings.TEMPLATE_MAX_TASKS} tasks.", ephemeral=True
+            )
+            return
+
+        name = self.name.value.strip()
+        database.save_case_template(interaction.guild_id, name, tasks)
+        await interaction.response.send_message(
+            f"✅ Template **{name}** saved with {len(tasks)} tasks. Use it with `/create_case template:{name}`.",
+            ephemeral=True
+        )
+
+
+async def setup(bot):
+    @bot.tree.command(name="save_template", description="Create or edit a case template with its standard tasks.")
+    @app_commands.describe(template="Existing template to edit; leave empty for a new one")
+    @app_commands.autocomplete(template=template_autocomplete)
+    @permissions.guard("save_template")
+    async def save_template(interaction: discord.Interaction, template: str = None):
+        tasks = database.get_template_tasks(interaction.guild_id, template) if template else None
+        await interaction.response.send_modal(TemplateModal(template, tasks or ()))
+
+    @bot.tree.command(name="view_templates", description="List the case templates of this server.")
+    @permissions.guard("view_templates")
+    async def view_templates(interaction: discord.Interaction):
+        templates = database.get_case_templates(interaction.guild_id)
+        if not templates:
+            await interaction.response.send_message("No case templates yet. Create one with `/save_template`.", ephemeral=True)
+            return
+
+        composer = embeds.EmbedComposer(lambda number: discord.Embed(title="📋 Case Templates", color=discord.Color.blue()))
+        for template in templates:
+            tasks = database.get_template_tasks(interaction.guild_id, template.name) or []
+            composer.add_lines(f"{template.name} ({template.task_count} tasks)", [template_task_line(t) for t in tasks])
+        pages = composer.build()
+        await interaction.response.send_message(embed=pages[0], ephemeral=True)
+        for page in pages[1:]:
+            await interaction.followup.send(embed=page, ephemeral=True)
+
+    @bot.tree.command(name="delete_template", description="Delete a case template.")
+    @app_commands.describe(template="Template to delete")
+    @app_commands.autocomplete(template=template_autocomplete)
+    @permissions.guard("delete_template")
+    async def delete_template(interaction: discord.Interaction, template: str):
+        if not database.delete_case_template(interaction.guild_id, template):
+            await interaction.response.send_message(f"No template named `{template}`.", ephemeral=True)
+            return
+        await interaction.response.send_message(
+            f"🗑️ Template **{template}** deleted. Cases created from it are unchanged.", ephemeral=True
+        )
@@ -0,0 +1,65 @@
+import discord
+from discord import app_commands
+import guild_config
+
+# option name -> guild_settings column
+CONFIG_OPTIONS = {
+    "employee_role": "employee_role_id",
+    "manager_role": "manager_role_id",
+    "notification_channel": "notification_channel_id",
+    "case_forum": "case_forum_channel_id",
+    "contacts_forum": "contacts_forum_channel_id",
+}
+
+# ---- Helper Function to Build the Settings Embed ----
+def build_settings_embed(guild_id):
+    guild_settings = guild_config.get(guild_id)
+    embed = discord.Embed(title="⚙️ Server Settings", color=discord.Color.blurple())
+    for option, column in CONFIG_OPTIONS.items():
+        value = getattr(guild_settings, column, None) if guild_settings else None
+        if value:
+            value = f"<@&{value}>" if column.endswith("role_id") else f"<#{value}>"
+        embed.add_field(name=option.replace("_", " ").title(), value=value or "Not set", inline=False)
+    return embed
+
+
+async def setup(bot):
+    @bot.tree.command(name="configure", description="Set the roles and channels the bot uses on this server.")
+    @app_commands.describe(
+        employee_role="Role allowed to use the bot",
+        manager_role="Role allowed to delete, close and archive cases and take backups",
+        notification_channel="Channel for deadline reminders",
+        case_forum="Forum where case posts are created",
+        contacts_forum="Forum where contact posts are created",
+    )
+    @app_commands.guild_only()
+    @app_commands.default_permissions(manage_guild=True)
+    async def configure(
+        interaction: discord.Interaction,
+        employee_role: discord.Role = None,
+        manager_role: discord.Role = None,
+        notification_channel: discord.TextChannel = None,
+        case_forum: discord.ForumChannel = None,
+        contacts_forum: discord.ForumChannel = None,
+    ):
+        # Checked here rather than with permissions.guard: the roles it relies on are set by this command
+        if not interaction.user.guild_permissions.manage_guild:
+            await interaction.response.send_message("❌ You need the Manage Server permission.", ephemeral=True)
+            return
+
+        chosen = {
+            "employee_role": employee_role,
+            "manager_role": manager_role,
+            "notification_channel": notification_channel,
+            "case_forum": case_forum,
+            "contacts_forum": contacts_forum,
+        }
+        values = {CONFIG_OPTIONS[option]: item.id for option, item in chosen.items() if item is not None}
+        if values:
+            guild_config.save(interaction.guild_id, **values)
+
+        await interaction.response.send_message(
+            "✅ Settings saved." if values else None,
+            embed=build_settings_embed(interaction.guild_id),
+            ephemeral=True
+        )
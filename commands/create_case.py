@@ -1,8 +1,16 @@
 import discord
 from discord import app_commands
-from datetime import datetime
+from datetime import datetime, timedelta
 import database  # import your database module
 import settings   # import config with CASE_FORUM_CHANNEL_ID
+import permissions
+import outbound
+import audit
+import guild_config
+import idempotency
+import temporal
+from commands.case_templates import template_autocomplete
+from commands.view_case import build_case_embed
 
 class CaseModal(discord.ui.Modal, title="Create Case"):
     case_name = discord.ui.TextInput(
@@ -26,60 +34,88 @@ class CaseModal(discord.ui.Modal, title="Create Case"):
         max_length=4000
     )
 
-    async def on_submit(self, interaction: discord.Interaction):
-        # Generate unique case ID based on today's count
-        today = datetime.now().strftime("%d%m%Y")
-        count = database.count_cases_today(today)
-        case_id = f"{count+1}-{today}"
-        
-        name = self.case_name.value
-        summary = self.summary.value or ""
-        notes = self.notes.value or ""
+    def __init__(self, template=None, template_tasks=()):
+        super().__init__()
+        self.template = template
+        self.template_tasks = template_tasks
 
-        # --- Create forum post for this case ---
-        forum_channel = interaction.client.get_channel(settings.CASE_FORUM_CHANNEL_ID)
+    async def on_submit(self, interaction: discord.Interaction):
+        # --- Forum post for this case ---
+        forum_channel = guild_config.get_channel(interaction.client, interaction.guild_id, "case_forum_channel_id")
         if forum_channel is None:
             await interaction.response.send_message(
-                "⚠️ Forum channel not found. Please check settings.CASE_FORUM_CHANNEL_ID.",
+                "⚠️ Case forum channel not found. An admin can set it with `/configure`.",
                 ephemeral=True
             )
             return
 
-        embed = discord.Embed(
-            title=f"📂 Case {case_id}: {name}",
-            description=summary or "No summary provided",
-            color=discord.Color.blue(),
-            timestamp=datetime.now()
+        # Creating the thread waits its turn in the outbound queue, which can take longer
+        # than Discord allows before an interaction must be answered
+        await interaction.response.defer(ephemeral=True, thinking=True)
+
+        # A repeated submission gets the first reply instead of a second case and thread
+        payload = {
+            "name": self.case_name.value, "summary": self.summary.value,
+            "notes": self.notes.value, "template": self.template,
+        }
+        reply = await idempotency.run(
+            interaction, "create_case", payload, lambda: self.create_case(interaction, forum_channel)
         )
+        await interaction.followup.send(reply, ephemeral=True)
 
-        embed.add_field(name="Case ID", value=case_id, inline=False)
-        embed.add_field(name="Notes", value=notes or "N/A", inline=False)
-        embed.set_footer(text="Case created")
+    async def create_case(self, interaction: discord.Interaction, forum_channel):
+        """Stores the case and creates its forum thread; returns the confirmation to show the user."""
+        name = self.case_name.value
+        summary = self.summary.value or ""
+        notes = self.notes.value or ""
+
+        # Template deadlines count from now
+        now = temporal.now()
+        tasks = [
+            (t.task, temporal.to_storage(now + timedelta(minutes=t.deadline_offset)) if t.deadline_offset is not None else None)
+            for t in self.template_tasks
+        ]
+
+        # The case and all its tasks are stored in one transaction first, under the next
+        # free ID of today, so the forum post is rendered once with everything in it
+        today = datetime.now().strftime("%d%m%Y")
+        case_id = database.create_case(today, name, summary, notes, guild_id=interaction.guild_id, tasks=tasks)
+        embed = await build_case_embed(case_id)
 
         # Create a forum thread/post with embed instead of plain content
-        created = await forum_channel.create_thread(
-            name=f"[{case_id}] {name}",
-            embed=embed
-        )
+        try:
+            created = await outbound.submit(
+                outbound.INTERACTION,
+                f"channel:{forum_channel.id}",
+                lambda: forum_channel.create_thread(name=f"[{case_id}] {name}", embed=embed)
+            )
+        except Exception:
+            database.delete_case(case_id)
+            raise
 
         case_thread = created.thread
         starter_message_id = created.message.id
 
         # Store both thread and starter message ID
-        database.insert_case(case_id, name, summary, notes, str(case_thread.id), str(starter_message_id))
+        database.update_case(case_id, channel_id=str(case_thread.id), message_id=str(starter_message_id))
+        description = f"Case created: {name}" + (f" from template {self.template} ({len(tasks)} tasks)" if self.template else "")
+        audit.record("create", interaction.user.id, description, case_id=case_id, guild_id=interaction.guild_id)
 
         # Confirm to user
-        await interaction.response.send_message(
-            f"✅ Case created!\nID: `{case_id}`\nName: `{name}`\n🔗 Linked forum post: {case_thread.mention}",
-            ephemeral=True
-        )
+        return f"✅ Case created!\nID: `{case_id}`\nName: `{name}`\n🔗 Linked forum post: {case_thread.mention}"
 
 async def setup(bot):
     @bot.tree.command(name="create_case", description="Creates a new case with a form.")
-    async def create_case(interaction: discord.Interaction):
-        allowed_role = discord.utils.get(interaction.user.roles, id=settings.EMPLOYEE_ROLE_ID)
-        if not allowed_role:
-            # Not allowed
-            await interaction.response.send_message("❌ You do not have permission.", ephemeral=True)
-            return
-        await interaction.response.send_modal(CaseModal())
+    @app_commands.describe(template="Case template whose standard tasks are added to the new case")
+    @app_commands.autocomplete(template=template_autocomplete)
+    @permissions.guard("create_case")
+    async def create_case(interaction: discord.Interaction, template: str = None):
+        template_tasks = ()
+        if template:
+            template_tasks = database.get_template_tasks(interaction.guild_id, template)
+            if template_tasks is None:
+                await interaction.response.send_message(
+                    f"No template named `{template}`. See `/view_templates`.", ephemeral=True
+                )
+                return
+        await interaction.response.send_modal(CaseModal(template, template_tasks))
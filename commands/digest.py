@@ -0,0 +1,104 @@
+import discord
+from discord import app_commands
+from discord.ext import tasks
+import asyncio
+import json
+from datetime import time
+import database
+import embeds
+import metrics
+import settings
+import permissions
+import outbound
+import temporal
+
+_bot = None  # set in setup, the daily loop needs it to look up users
+
+# ---- Helper Function to Build a Digest Embed ----
+def build_digest_embed(digest):
+    def make_page(number):
+        embed = discord.Embed(
+            title="🗓️ Your Daily Task Digest",
+            description=(
+                f"**{digest.overdue_tasks}** overdue • **{digest.due_soon_tasks}** due soon • "
+                f"**{digest.open_tasks}** open in total"
+            ),
+            color=discord.Color.red() if digest.overdue_tasks else discord.Color.blue(),
+        )
+        embed.set_footer(text="Turn this off with /digest enabled:False")
+        return embed
+
+    urgent = sorted(json.loads(digest.tasks), key=lambda t: t[4] or "")
+    lines = [
+        f"- {temporal.format_deadline(deadline, 'R')} {task} (Case: {case_name} ID: {case_id})"
+        for _, case_id, case_name, task, deadline in urgent[:settings.DIGEST_MAX_TASKS]
+    ]
+    if len(urgent) > settings.DIGEST_MAX_TASKS:
+        lines.append(f"…and {len(urgent) - settings.DIGEST_MAX_TASKS} more")
+    # One DM, so whatever doesn't fit on the first page is counted in the footer
+    composer = embeds.EmbedComposer(make_page, max_pages=1)
+    composer.add_lines("Overdue and Due Soon", lines, empty="Nothing urgent 🎉")
+    return composer.build()[0]
+
+
+def digest_bounds():
+    now = temporal.now()
+    return temporal.to_storage(now), temporal.to_storage(now + settings.DUE_SOON_WINDOW)
+
+
+async def send_digest(bot, digest):
+    user_id = int(digest.discord_id)
+    try:
+        user = bot.get_user(user_id) or await outbound.submit(
+            outbound.BACKGROUND, "users", lambda: bot.fetch_user(user_id)
+        )
+        embed = build_digest_embed(digest)
+        await outbound.submit(outbound.BACKGROUND, f"dm:{user_id}", lambda: user.send(embed=embed))
+        return True
+    except discord.HTTPException as e:  # DMs closed, user gone, ...
+        print(f"[DIGEST] Could not send digest to {user_id}: {e}")
+        metrics.increment("digests_failed")
+        return False
+
+
+# ---- Daily Loop ----
+@tasks.loop(time=time(hour=settings.DIGEST_HOUR, tzinfo=temporal.get_timezone()))
+async def send_daily_digests():
+    today = temporal.now().date().isoformat()
+    now, due_soon = digest_bounds()
+
+    # One grouped query for all users, then one queued DM each
+    digests = await asyncio.to_thread(database.get_digests, now, due_soon, today)
+    results = await asyncio.gather(*(send_digest(_bot, digest) for digest in digests))
+
+    sent = [digest.discord_id for digest, ok in zip(digests, results) if ok]
+    await asyncio.to_thread(database.mark_digests_sent, sent, today)
+    metrics.increment("digests_sent", len(sent))
+    print(f"[DIGEST] Sent {len(sent)}/{len(digests)} daily digests")
+
+
+async def setup(bot):
+    global _bot
+    _bot = bot
+    if not send_daily_digests.is_running():
+        send_daily_digests.start()
+
+    @bot.tree.command(name="digest", description="Get one daily DM with your tasks instead of channel pings.")
+    @app_commands.describe(enabled="Turn the daily digest on or off; leave empty to preview it")
+    @permissions.guard("digest")
+    async def digest(interaction: discord.Interaction, enabled: bool = None):
+        if enabled is not None:
+            database.set_digest_enabled(interaction.user.id, enabled)
+            await interaction.response.send_message(
+                f"✅ Daily digest turned **{'on' if enabled else 'off'}**."
+                + (f" It is sent at {settings.DIGEST_HOUR:02d}:00 ({settings.FIRM_TIMEZONE})." if enabled else ""),
+                ephemeral=True
+            )
+            return
+
+        now, due_soon = digest_bounds()
+        digests = database.get_digests(now, due_soon, discord_id=interaction.user.id)
+        if not digests:
+            await interaction.response.send_message("You have no open tasks in linked cases.", ephemeral=True)
+            return
+        await interaction.response.send_message(embed=build_digest_embed(digests[0]), ephemeral=True)
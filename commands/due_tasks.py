@@ -1,31 +1,10 @@
 import discord
 from discord import app_commands
-from datetime import datetime, timedelta
+from datetime import timedelta
 import database
 import settings
-
-from datetime import datetime
-
-def parse_deadline(deadline_str):
-    """Parse deadline from user input or DB format.
-    
-    Accepts:
-    - DD.MM.YYYY
-    - DD.MM.YYYY HH:MM
-    - YYYY-MM-DD HH:MM (DB stored format)
-    """
-    if not deadline_str:
-        return None
-
-    for fmt in ("%d.%m.%Y %H:%M", "%d.%m.%Y", "%Y-%m-%d %H:%M"):
-        try:
-            return datetime.strptime(deadline_str.strip(), fmt)
-        except ValueError:
-            continue
-
-    return None  # malformed date
-
-
+import permissions
+import temporal
 
 async def setup(bot):
     @bot.tree.command(
@@ -36,50 +15,40 @@ async def setup(bot):
         start_date="Start date (DD.MM.YYYY) – optional, defaults to today",
         end_date="End date (DD.MM.YYYY) – optional, defaults to all future tasks"
     )
+    @permissions.guard("due_tasks")
     async def due_tasks(interaction: discord.Interaction, start_date: str = None, end_date: str = None):
-        allowed_role = discord.utils.get(interaction.user.roles, id=settings.EMPLOYEE_ROLE_ID)
-        if not allowed_role:
-            # Not allowed
-            await interaction.response.send_message("❌ You do not have permission.", ephemeral=True)
-            return
+        # Dates are read in the user's timezone
+        tz_name = database.get_user_timezone(interaction.user.id)
 
         # Parse input dates or set defaults
-        try:
-            start_dt = datetime.strptime(start_date, "%d.%m.%Y") if start_date else datetime.now() - timedelta(days=1)
-            end_dt = datetime.strptime(end_date, "%d.%m.%Y") if end_date else None
-        except ValueError:
+        start_dt = temporal.parse_deadline(start_date, tz_name) if start_date else temporal.now() - timedelta(days=1)
+        end_dt = temporal.parse_deadline(end_date, tz_name) if end_date else None
+        if not start_dt or (end_date and not end_dt):
             await interaction.response.send_message(
                 "Invalid date format. Please use DD.MM.YYYY",
                 ephemeral=True
             )
             return
 
-        # Convert to SQLite-compatible strings
-        start_str = start_dt.strftime("%Y-%m-%d %H:%M")
-        end_str = end_dt.strftime("%Y-%m-%d %H:%M") if end_dt else None
-
-        # Fetch tasks using new DB function
-        all_tasks = database.get_tasks_due_between(start=start_str, end=end_str)
+        # Fetch tasks using new DB function (stored deadlines are UTC strings)
+        all_tasks = database.get_tasks_due_between(
+            interaction.guild_id,
+            start=temporal.to_storage(start_dt),
+            end=temporal.to_storage(end_dt) if end_dt else None
+        )
 
         due_tasks_list = []
-        for task in all_tasks:
-            task_id, case_id, description, deadline, done = task
-            if done:  # Skip completed tasks
-                continue
-            if not deadline:
+        deadlines = temporal.parse_many(task.deadline for task in all_tasks)
+        for task, task_dt in zip(all_tasks, deadlines):
+            if task.done:  # Skip completed tasks
                 continue
-
-            task_dt = parse_deadline(deadline)
-            
             if not task_dt:
                 continue  # skip malformed dates
 
-            # Only include tasks whose deadline falls within the period
-            if start_dt <= task_dt <= (end_dt if end_dt else task_dt):
-                case = database.get_case_by_id(case_id)
-                due_tasks_list.append(
-                    f"- ❌ {description} (Case: {case[1]} ID: {case_id}, Due: {task_dt.strftime('%d.%m.%Y %H:%M')})"
-                )
+            case = database.get_case_by_id(task.case_id)
+            due_tasks_list.append(
+                f"- ❌ {task.task} (Case: {case.name} ID: {case.id}, Due: {temporal.discord_timestamp(task_dt)})"
+            )
 
         if not due_tasks_list:
             due_tasks_list = ["No tasks due in this period."]
@@ -0,0 +1,149 @@
+import discord
+from discord import app_commands
+import asyncio
+import io
+import os
+import tempfile
+import time
+import zipfile
+import audit
+import database
+import dossier
+import metrics
+import settings
+import permissions
+import temporal
+import thread_sync
+
+FORMAT_CHOICES = [
+    app_commands.Choice(name="Markdown", value="markdown"),
+    app_commands.Choice(name="HTML", value="html"),
+]
+STATUS_CHOICES = [
+    app_commands.Choice(name="Open", value="open"),
+    app_commands.Choice(name="Closed", value="closed"),
+    app_commands.Choice(name="Archived", value="archived"),
+    app_commands.Choice(name="All, archived included", value="all"),
+]
+
+
+# ---- Helper Functions Run on the Writer Thread ----
+def write_case_file(path, fmt, guild_id, loaded, tz_name):
+    with open(path, "w", encoding="utf-8") as out:
+        dossier.write_case(out, fmt, guild_id, loaded, tz_name)
+
+
+def write_case_zip(path, fmt, guild_id, case_ids, tz_name):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for case_id in case_ids:
+            loaded = dossier.load_case(guild_id, case_id)
+            if not loaded:  # deleted while the export ran
+                continue
+            name = f"case-{case_id}.{dossier.EXTENSIONS[fmt]}"
+            with io.TextIOWrapper(archive.open(name, "w"), encoding="utf-8") as out:
+                dossier.write_case(out, fmt, guild_id, loaded, tz_name)
+
+
+async def catch_up(client, guild_id, channel_ids):
+    """Copies messages the thread sync hasn't picked up yet, within one sync run's request budget."""
+    budget = settings.THREAD_SYNC_PAGES_PER_RUN
+    for channel_id in filter(None, channel_ids):
+        if budget <= 0:
+            break
+        try:
+            _, pages, _ = await thread_sync.sync_thread(client, channel_id, guild_id, max_pages=budget)
+            budget -= pages
+        except discord.HTTPException as e:
+            print(f"[EXPORT] Could not read thread {channel_id}: {e}")
+
+
+async def export(interaction, write, args, channel_ids, filename):
+    """
+    Brings the threads in `channel_ids` up to date, runs `write(path, *args, tz_name)`
+    on a worker thread and uploads the file. Returns True if the file was sent.
+    """
+    started = time.perf_counter()
+    await catch_up(interaction.client, interaction.guild_id, channel_ids)
+    await audit.flush()  # include events still waiting in the write buffer
+
+    tz_name = database.get_user_timezone(interaction.user.id)
+    fd, path = tempfile.mkstemp(suffix=os.path.splitext(filename)[1])
+    os.close(fd)
+    try:
+        await asyncio.to_thread(write, path, *args, tz_name)
+
+        size = os.path.getsize(path)
+        limit = interaction.guild.filesize_limit
+        if size > limit:
+            await interaction.followup.send(
+                f"❌ The export is {size / 1024 / 1024:.1f} MiB, more than the {limit / 1024 / 1024:.0f} MiB "
+                "this server allows for uploads.",
+                ephemeral=True
+            )
+            return False
+        await interaction.followup.send(file=discord.File(path, filename=filename), ephemeral=True)
+        metrics.observe("export_seconds", round(time.perf_counter() - started, 3))
+        metrics.observe("export_size_bytes", size)
+        return True
+    except Exception as e:
+        print(f"[EXPORT] {filename} failed: {e}")
+        await interaction.followup.send(f"❌ Export failed: {e}", ephemeral=True)
+        return False
+    finally:
+        os.remove(path)
+
+
+async def setup(bot):
+    @bot.tree.command(name="export_case", description="Export a case with its tasks, history and thread as a file.")
+    @app_commands.describe(case_id="ID of the case to export", format="File format (default Markdown)")
+    @app_commands.choices(format=FORMAT_CHOICES)
+    @permissions.guard("export_case")
+    async def export_case(interaction: discord.Interaction, case_id: str, format: str = "markdown"):
+        loaded = dossier.load_case(interaction.guild_id, case_id)
+        if not loaded:
+            await interaction.response.send_message("❌ Case not found.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        if await export(
+            interaction, write_case_file, (format, interaction.guild_id, loaded), [loaded[0].channel_id],
+            f"case-{case_id}.{dossier.EXTENSIONS[format]}"
+        ):
+            metrics.increment("cases_exported")
+
+    @bot.tree.command(name="export_cases", description="Export many cases as a zip of dossier files.")
+    @app_commands.describe(
+        status="Which cases to export (default closed)",
+        part=f"Which set of {settings.EXPORT_MAX_CASES} cases, in case ID order (default 1)",
+        format="File format (default Markdown)"
+    )
+    @app_commands.choices(status=STATUS_CHOICES, format=FORMAT_CHOICES)
+    @permissions.guard("export_cases")
+    async def export_cases(
+        interaction: discord.Interaction, status: str = "closed", part: app_commands.Range[int, 1] = 1,
+        format: str = "markdown"
+    ):
+        size = settings.EXPORT_MAX_CASES
+        cases, total = database.get_cases_for_export(interaction.guild_id, status, size, (part - 1) * size)
+        parts = -(-total // size)
+        if not cases:
+            await interaction.response.send_message(
+                f"No cases to export in part {part}; there are {parts}." if total else "No cases to export.",
+                ephemeral=True
+            )
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        exported = await export(
+            interaction, write_case_zip, (format, interaction.guild_id, [case_id for case_id, _ in cases]),
+            [channel_id for _, channel_id in cases],
+            f"cases-{status}-{part}-{temporal.now().strftime('%Y%m%d')}.zip"
+        )
+        if exported:
+            metrics.increment("cases_exported", len(cases))
+        if exported and parts > 1:
+            await interaction.followup.send(
+                f"ℹ️ This is part {part} of {parts} ({total} cases). "
+                f"Export the others with `/export_cases status:{status} part:<number>`.",
+                ephemeral=True
+            )
@@ -0,0 +1,30 @@
+import discord
+from discord import app_commands
+from zoneinfo import available_timezones
+import database
+import permissions
+import settings
+import temporal
+
+TIMEZONES = sorted(available_timezones())
+
+async def setup(bot):
+    async def timezone_autocomplete(interaction: discord.Interaction, current: str):
+        current = current.lower()
+        matches = [tz for tz in TIMEZONES if current in tz.lower()]
+        return [app_commands.Choice(name=tz, value=tz) for tz in matches[:25]]
+
+    @bot.tree.command(name="set_timezone", description="Set the timezone your deadlines are entered in.")
+    @app_commands.describe(timezone="e.g. Europe/Berlin; leave empty to use the firm's timezone")
+    @app_commands.autocomplete(timezone=timezone_autocomplete)
+    @permissions.guard("set_timezone")
+    async def set_timezone(interaction: discord.Interaction, timezone: str = None):
+        if timezone and not temporal.is_valid_timezone(timezone):
+            await interaction.response.send_message(f"❌ Unknown timezone `{timezone}`.", ephemeral=True)
+            return
+
+        database.set_user_timezone(interaction.user.id, timezone)
+        await interaction.response.send_message(
+            f"✅ Deadlines you enter are now read as `{timezone or settings.FIRM_TIMEZONE}` time.",
+            ephemeral=True
+        )
@@ -0,0 +1,37 @@
+import discord
+import database
+import permissions
+import temporal
+
+TOP_CASES = 10  # cases listed under "Most overdue"
+
+async def setup(bot):
+    @bot.tree.command(name="stats", description="Open, overdue and completed tasks across all open cases.")
+    @permissions.guard("stats")
+    async def stats(interaction: discord.Interaction):
+        # One row per case from case_task_stats; the task table itself is not read
+        cases = database.get_case_stats(interaction.guild_id, status="open")
+
+        open_tasks = sum(c.open_tasks for c in cases)
+        overdue_tasks = sum(c.overdue_tasks for c in cases)
+        done_tasks = sum(c.done_tasks for c in cases)
+
+        embed = discord.Embed(title="📊 Task Statistics", color=discord.Color.blue())
+        embed.add_field(name="Open Cases", value=len(cases), inline=True)
+        embed.add_field(name="Open Tasks", value=open_tasks, inline=True)
+        embed.add_field(name="Overdue Tasks", value=overdue_tasks, inline=True)
+        embed.add_field(name="Completed Tasks", value=done_tasks, inline=True)
+
+        overdue_cases = sorted((c for c in cases if c.overdue_tasks), key=lambda c: c.overdue_tasks, reverse=True)
+        overdue_lines = [
+            f"- `{c.case_id}` {c.case_name}: {c.overdue_tasks} overdue" for c in overdue_cases[:TOP_CASES]
+        ]
+        embed.add_field(name="Most Overdue", value="\n".join(overdue_lines) or "Nothing overdue 🎉", inline=False)
+
+        upcoming = sorted((c for c in cases if c.next_deadline), key=lambda c: c.next_deadline)
+        upcoming_lines = [
+            f"- `{c.case_id}` {c.case_name}: {temporal.format_deadline(c.next_deadline, 'R')}" for c in upcoming[:TOP_CASES]
+        ]
+        embed.add_field(name="Next Deadlines", value="\n".join(upcoming_lines) or "None", inline=False)
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
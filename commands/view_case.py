@@ -3,6 +3,13 @@ from discord import app_commands
 import database
 from datetime import datetime
 import settings
+import permissions
+import outbound
+import temporal
+import audit
+import conflicts
+import embeds
+import idempotency
 
 # ---- Helper Function to Build Case Embed ----
 async def build_case_embed(case_id):
@@ -10,58 +17,48 @@ async def build_case_embed(case_id):
     contacts = database.get_contacts_for_case(case_id)
     tasks = database.get_tasks_for_case(case_id)
 
-    contact_list = "\n".join([f"- *{c[5]}* {c[1]} (ID {c[0]})" for c in contacts]) or "None linked"
-
-    if tasks:
-        task_lines = []
-        for t in tasks:
-            task_id, task_desc, deadline, done = t
-            deadline_str = deadline or ""
-            task_lines.append(f"- *#{task_id}* [{'✅' if done else '❌'}] {task_desc} {f'(Due: {deadline_str})' if deadline else ''}")
-        task_list = "\n".join(task_lines)
-    else:
-        task_list = "No tasks."
-
-    embed = discord.Embed(
-        title=f"📂 Case {case[0]}: {case[1]}",
-        description=case[2] or "No summary",
-        color=discord.Color.blue(),
-        timestamp=datetime.now()
-    )
-    embed.add_field(name="Notes", value=case[3] or "None", inline=False)
-    embed.add_field(name="Contacts", value=contact_list, inline=False)
-    embed.add_field(name="Tasks", value=task_list, inline=False)
-    embed.set_footer(text=f"Created at {case[4]}")
+    def make_page(number):
+        embed = discord.Embed(
+            title=f"📂 Case {case.id}: {case.name}",
+            description=(case.summary or "No summary") if number == 1 else None,
+            color=discord.Color.blue(),
+            timestamp=datetime.now()
+        )
+        embed.set_footer(text=f"Created at {case.created_at}")
+        return embed
 
-    return embed
+    # The starter post is a single message; /view_case pages through the rest
+    composer = embeds.EmbedComposer(make_page, max_pages=1)
+    composer.add_field("Notes", case.notes or "None")
+    composer.add_lines("Contacts", [embeds.case_contact_line(c) for c in contacts], empty="None linked")
+    composer.add_lines("Tasks", [embeds.task_line(t) for t in tasks], empty="No tasks.")
+    return composer.build()[0]
 
 # ---- Helper Function to Build a case updated post ----
-async def update_case_post(interaction: discord.Interaction, case_id: str, action_description: str):
+async def update_case_post(interaction: discord.Interaction, case_id: str, action_description: str,
+                           action="update", diff=None, contact_id=None):
     """
-    Updates the starter embed of the case thread and logs an action message as a rich embed.
+    Records the action in the audit log, then updates the starter embed of the case thread
+    and logs an action message as a rich embed in the background.
     Includes who performed the action and timestamp.
+    Doesn't wait for the queued forum calls, so callers still answer within Discord's 3 seconds.
     """
+    audit.record(
+        action, interaction.user.id, action_description,
+        case_id=case_id, contact_id=contact_id, diff=diff, guild_id=interaction.guild_id
+    )
+
     case = database.get_case_by_id(case_id)
     
-    if not case or not case[4] or not case[5]:
-        print(f"Error updating case post: no thread/message link")
+    if not case or not case.channel_id or not case.message_id:
+        print(f"Error updating case post {case_id}: no thread/message link")
         return  # missing thread/message link
-    thread_id = int(case[4])
-    starter_message_id = int(case[5])
-
-    thread = interaction.client.get_channel(thread_id)
+    thread = interaction.client.get_channel(int(case.channel_id))
     if not thread:
         return
 
-    # --- Update the starter embed ---
-    try:
-        starter_message = await thread.fetch_message(starter_message_id)
-        embed = await build_case_embed(case_id)
-        await starter_message.edit(embed=embed)
-    except Exception as e:
-        print(f"Error updating case post: {e}")
-
-    # --- Log action as an embed ---
+    # Rendered now, so the post shows the case as it was when the action happened
+    embed = await build_case_embed(case_id)
     log_embed = discord.Embed(
         title="📝 Case Log",
         description=action_description,
@@ -71,24 +68,24 @@ async def update_case_post(interaction: discord.Interaction, case_id: str, actio
     log_embed.set_author(name=str(interaction.user), icon_url=interaction.user.display_avatar.url)
     log_embed.set_footer(text=f"Case ID: {case_id}")
 
-    await thread.send(embed=log_embed)
+    outbound.in_background(outbound.refresh_thread(thread, int(case.message_id), embed, log_embed))
 
 # ---- Modal for Editing a Case ----
 class EditCaseModal(discord.ui.Modal, title="Edit Case"):
     def __init__(self, case_id, case):
         super().__init__()
         self.case_id = case_id
-        # case = (id, name, summary, notes, created_at)
+        self.case = case
 
         self.name = discord.ui.TextInput(
-            label="Name", default=case[1], required=True, max_length=100
+            label="Name", default=case.name, required=True, max_length=100
         )
         self.summary = discord.ui.TextInput(
-            label="Summary", default=case[2] or "", 
+            label="Summary", default=case.summary or "", 
              style=discord.TextStyle.paragraph, max_length=4000
         )
         self.notes = discord.ui.TextInput(
-            label="Notes", default=case[3] or "", required=False,
+            label="Notes", default=case.notes or "", required=False,
             style=discord.TextStyle.paragraph, max_length=4000
         )
 
@@ -113,8 +110,10 @@ class EditCaseModal(discord.ui.Modal, title="Edit Case"):
             f"• **Notes:** {self.notes.value or 'N/A'}"
         )
 
-        # Update the case thread post + log action
-        await update_case_post(interaction, self.case_id, action_description)
+        diff = audit.changes(
+            self.case._asdict(),
+            {"name": self.name.value, "summary": self.summary.value, "notes": self.notes.value}
+        )
 
         # Confirm to user
         await interaction.response.send_message(
@@ -122,6 +121,9 @@ class EditCaseModal(discord.ui.Modal, title="Edit Case"):
             ephemeral=True
         )
 
+        # Update the case thread post + log action
+        await update_case_post(interaction, self.case_id, action_description, action="edit", diff=diff)
+
 # ---- Modal for Linking a Contact ----
 class LinkContactModal(discord.ui.Modal, title="Link Contact to Case"):
     def __init__(self, case_id):
@@ -154,7 +156,7 @@ class LinkContactModal(discord.ui.Modal, title="Link Contact to Case"):
             )
             return
 
-        contact = database.get_contact_by_id(contact_id)
+        contact = database.get_contact_by_id(contact_id, interaction.guild_id)
         if not contact:
             await interaction.response.send_message(
                 f"No contact found with ID `{contact_id}`.",
@@ -162,12 +164,76 @@ class LinkContactModal(discord.ui.Modal, title="Link Contact to Case"):
             )
             return
 
+        # Warn before linking if the party already appears in other cases
+        found = conflicts.check(interaction.guild_id, contact, self.role.value, exclude_case=self.case_id)
+        if found:
+            await interaction.response.send_message(
+                embed=build_conflicts_embed(contact, self.role.value, found),
+                view=ConfirmLinkView(self, contact_id),
+                ephemeral=True
+            )
+            return
+
+        await interaction.response.send_message(await self.link(interaction, contact_id), ephemeral=True)
+
+    async def link(self, interaction: discord.Interaction, contact_id):
+        """Links the contact and updates the case post; returns the confirmation to show the user."""
         database.link_contact_to_case(self.case_id, contact_id, self.role.value)
-        await update_case_post(interaction, self.case_id, f"Linked contact {contact_id} as {self.role.value}")
-        await interaction.response.send_message(
-            f"Linked contact `{contact_id}` to case `{self.case_id}` as **{self.role.value}**.",
-            ephemeral=True
+        conflicts.link(interaction.guild_id, self.case_id, contact_id, self.role.value)
+        await update_case_post(
+            interaction, self.case_id, f"Linked contact {contact_id} as {self.role.value}",
+            action="link_contact", contact_id=contact_id
         )
+        return f"Linked contact `{contact_id}` to case `{self.case_id}` as **{self.role.value}**."
+
+# ---- Conflict Check ----
+def conflict_line(conflict, contact):
+    case = database.get_case_by_id(conflict.case_id)
+    case_text = f"`{conflict.case_id}` {case.name if case else '(archived)'}"
+    if conflict.hops == 1 and conflict.contact_id == contact.id:
+        return f"{'⚔️' if conflict.opposing else '•'} {case_text}: *{conflict.role}*"
+    party = database.get_contact_by_id(conflict.contact_id)
+    party_text = f"**{party.name if party else '?'}** (ID {conflict.contact_id}) as *{conflict.role}*"
+    if conflict.hops == 1:
+        return f"{'⚔️' if conflict.opposing else '•'} {case_text}: similar contact {party_text}"
+    return f"↪ {case_text}: {party_text}, a party in `{conflict.via_case}`"
+
+
+def build_conflicts_embed(contact, role, found):
+    embed = discord.Embed(
+        title="⚠️ Possible conflict of interest",
+        description=(
+            f"**{contact.name}** (ID {contact.id}) is about to be linked as *{role}*. They, a contact with "
+            f"matching name or details, or parties connected to them appear in these cases (⚔️ = other side)."
+        ),
+        color=discord.Color.red()
+    )
+    lines = [conflict_line(c, contact) for c in found[:settings.CONFLICTS_SHOWN]]
+    if len(found) > settings.CONFLICTS_SHOWN:
+        lines.append(f"…and {len(found) - settings.CONFLICTS_SHOWN} more")
+    composer = embeds.EmbedComposer(lambda number: embed, max_pages=1)
+    composer.add_lines("Related cases", lines)
+    return composer.build()[0]
+
+
+class ConfirmLinkView(discord.ui.View):
+    """Link the contact despite the conflict warning, or cancel. Only lives for this prompt."""
+    def __init__(self, modal, contact_id):
+        super().__init__(timeout=300)
+        self.modal = modal
+        self.contact_id = contact_id
+
+    @discord.ui.button(label="Link anyway", style=discord.ButtonStyle.danger)
+    async def link_anyway(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.stop()
+        await interaction.response.defer()
+        confirmation = await self.modal.link(interaction, self.contact_id)
+        await interaction.edit_original_response(content=confirmation, embed=None, view=None)
+
+    @discord.ui.button(label="Cancel", style=discord.ButtonStyle.secondary)
+    async def cancel(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.stop()
+        await interaction.response.edit_message(content="Nothing was linked.", embed=None, view=None)
 
 # ---- Modal for adding a task ----
 class AddTaskModal(discord.ui.Modal, title="Add Task to Case"):
@@ -196,16 +262,10 @@ class AddTaskModal(discord.ui.Modal, title="Add Task to Case"):
     async def on_submit(self, interaction: discord.Interaction):
         deadline_value = None
         if self.deadline.value.strip():
-            # Try parsing input
-            formats = ["%d.%m.%Y %H:%M", "%d.%m.%Y"]
-            parsed_deadline = None
-            for fmt in formats:
-                try:
-                    parsed_deadline = datetime.strptime(self.deadline.value.strip(), fmt)
-                    break
-                except ValueError:
-                    continue
-
+            # Parsed in the user's timezone, stored in UTC
+            parsed_deadline = temporal.parse_deadline(
+                self.deadline.value, database.get_user_timezone(interaction.user.id)
+            )
             if not parsed_deadline:
                 await interaction.response.send_message(
                     "❌ Invalid deadline format. Please use **DD.MM.YYYY** or **DD.MM.YYYY HH:MM**.",
@@ -213,68 +273,140 @@ class AddTaskModal(discord.ui.Modal, title="Add Task to Case"):
                 )
                 return
 
-            # Save deadline in a standard format (e.g. ISO)
-            deadline_value = parsed_deadline.strftime("%Y-%m-%d %H:%M")
+            deadline_value = temporal.to_storage(parsed_deadline)
 
-        # Store in DB
-        database.add_task(self.case_id, self.task_description.value, deadline_value)
-        await update_case_post(interaction, self.case_id, f"New task added: {self.task_description.value}")
-        await interaction.response.send_message(
-            f"✅ Task added to case `{self.case_id}`.",
-            ephemeral=True
+        async def add_task():
+            database.add_task(self.case_id, self.task_description.value, deadline_value)
+            await update_case_post(
+                interaction, self.case_id, f"New task added: {self.task_description.value}",
+                action="add_task", diff={"deadline": [None, deadline_value]} if deadline_value else None
+            )
+            return f"✅ Task added to case `{self.case_id}`."
+
+        # A repeated submission gets the first reply instead of adding the task twice
+        payload = {"case_id": self.case_id, "task": self.task_description.value, "deadline": deadline_value}
+        reply = await idempotency.run(interaction, "add_task", payload, add_task)
+        await interaction.response.send_message(reply, ephemeral=True)
+
+# ---- Menu for updating several tasks at once ----
+# action: (button label, button style, log title, audit diff)
+BULK_TASK_ACTIONS = {
+    "done": ("Mark Done", discord.ButtonStyle.success, "Tasks marked as done ✅", {"done": [0, 1]}),
+    "reopen": ("Reopen", discord.ButtonStyle.secondary, "Tasks reopened", {"done": [1, 0]}),
+    "delete": ("Delete", discord.ButtonStyle.danger, "Tasks deleted 🗑️", None),
+}
+MAX_SELECT_OPTIONS = 25  # Discord's limit for one select menu
+
+def due_in(deadline, tz_name):
+    # Select options can't show Discord timestamps, so the deadline is converted here
+    dt = temporal.parse_stored(deadline)
+    return f" • due {dt.astimezone(temporal.get_timezone(tz_name)).strftime('%d.%m.%Y %H:%M')}" if dt else ""
+
+class BulkTaskView(discord.ui.View):
+    """Select several tasks of a case and mark them done, reopen or delete them at once. Only lives for this prompt."""
+    def __init__(self, case_id, tasks, tz_name=None):
+        super().__init__(timeout=300)
+        self.case_id = case_id
+        self.selected = []
+
+        # Open tasks first, soonest deadline first
+        tasks = sorted(tasks, key=lambda t: (t.done, t.deadline is None, t.deadline or "", t.id))
+        self.select = discord.ui.Select(
+            placeholder="Select tasks",
+            min_values=1,
+            max_values=min(len(tasks), MAX_SELECT_OPTIONS),
+            options=[
+                discord.SelectOption(
+                    label=embeds.clip(f"#{t.id} {t.task}", 100),
+                    value=str(t.id),
+                    description=f"{'Done' if t.done else 'Open'}{due_in(t.deadline, tz_name)}",
+                    emoji="✅" if t.done else "❌"
+                )
+                for t in tasks[:MAX_SELECT_OPTIONS]
+            ]
         )
+        self.select.callback = self.on_select
+        self.add_item(self.select)
+
+        for action, (label, style, _, _) in BULK_TASK_ACTIONS.items():
+            button = discord.ui.Button(label=label, style=style)
+            button.callback = permissions.guard(f"case:tasks_{action}")(self.apply(action))
+            self.add_item(button)
+
+    async def on_select(self, interaction: discord.Interaction):
+        self.selected = [int(value) for value in self.select.values]
+        await interaction.response.defer()
+
+    def apply(self, action):
+        async def callback(interaction: discord.Interaction):
+            if not self.selected:
+                await interaction.response.send_message("Select one or more tasks first.", ephemeral=True)
+                return
 
-# ---- Modal for marking a task as done----
-class MarkTaskDoneModal(discord.ui.Modal, title="Mark Task Done"):
-    def __init__(self, case_id):
-        super().__init__()
+            # One statement for all selected tasks; tasks of other cases are never touched
+            tasks = database.update_tasks(self.case_id, self.selected, action)
+            self.stop()
+            _, _, title, diff = BULK_TASK_ACTIONS[action]
+            if not tasks:
+                await interaction.response.edit_message(
+                    content="Nothing changed; the selected tasks were already updated.", view=None
+                )
+                return
+
+            lines = "\n".join(f"- #{t.id} {embeds.clip(t.task, 100)}" for t in tasks)
+            await interaction.response.edit_message(
+                content=f"{title}: {', '.join(f'`#{t.id}`' for t in tasks)}", view=None
+            )
+            await update_case_post(interaction, self.case_id, f"{title}\n{lines}", action=f"tasks_{action}", diff=diff)
+        return callback
+
+# ---- Persistent Buttons ----
+# action: (label, style)
+CASE_ACTIONS = {
+    "edit": ("Edit Case", discord.ButtonStyle.primary),
+    "delete": ("Delete Case", discord.ButtonStyle.danger),
+    "close": ("Close Case", discord.ButtonStyle.secondary),
+    "link": ("Link Contact", discord.ButtonStyle.secondary),
+    "add_task": ("Add Task", discord.ButtonStyle.success),
+    "tasks": ("Update Tasks", discord.ButtonStyle.secondary),
+}
+
+class CaseButton(
+    discord.ui.DynamicItem[discord.ui.Button, discord.ui.View],
+    template=rf"case:(?P<action>{'|'.join(CASE_ACTIONS)}):(?P<case_id>[\w-]+)"
+):
+    """
+    A case button that carries its action and case ID in the custom_id.
+    Registered once via bot.add_dynamic_items, so it survives restarts and
+    nothing has to stay in memory for each case view that was opened.
+    """
+    def __init__(self, action, case_id):
+        label, style = CASE_ACTIONS[action]
+        super().__init__(discord.ui.Button(label=label, style=style, custom_id=f"case:{action}:{case_id}"))
+        self.action = action
         self.case_id = case_id
 
-        self.task_id = discord.ui.TextInput(
-            label="Task ID",
-            placeholder="Enter the Task ID to mark as done",
-            required=True,
-            max_length=10
-        )
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["action"], match["case_id"])
 
-        self.add_item(self.task_id)
+    async def callback(self, interaction: discord.Interaction):
+        await getattr(self, f"on_{self.action}")(interaction)
 
-    async def on_submit(self, interaction: discord.Interaction):
-        try:
-            task_id = int(self.task_id.value)
-        except ValueError:
+    @permissions.guard("case:edit")
+    async def on_edit(self, interaction: discord.Interaction):
+        case = database.get_case_by_id(self.case_id, interaction.guild_id)
+        if not case:
             await interaction.response.send_message(
-                "Invalid Task ID. Must be a number.",
+                f"No case found with ID `{self.case_id}`.",
                 ephemeral=True
             )
             return
+        await interaction.response.send_modal(EditCaseModal(self.case_id, case))
 
-        database.mark_task_done(task_id)
-        await update_case_post(interaction, self.case_id, f"Task #{task_id} marked as done ✅")
-        await interaction.response.send_message(
-            f"Task `{task_id}` marked as done.",
-            ephemeral=True
-        )
-
-# ---- Buttons View ----
-class CaseView(discord.ui.View):
-    def __init__(self, case_id, case):
-        super().__init__(timeout=None)
-        self.case_id = case_id
-        self.case = case
-
-    @discord.ui.button(label="Edit Case", style=discord.ButtonStyle.primary)
-    async def edit_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await interaction.response.send_modal(EditCaseModal(self.case_id, self.case))
-
-    @discord.ui.button(label="Delete Case", style=discord.ButtonStyle.danger)
-    async def delete_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        allowed_role = discord.utils.get(interaction.user.roles, id=settings.MANAGER_ROLE_ID)
-        if not allowed_role:
-            # Not allowed
-            await interaction.response.send_message("❌ You do not have permission.", ephemeral=True)
-            return
-        case = database.get_case_by_id(self.case_id)
+    @permissions.guard("case:delete")
+    async def on_delete(self, interaction: discord.Interaction):
+        case = database.get_case_by_id(self.case_id, interaction.guild_id)
         if not case:
             await interaction.response.send_message(
                 f"No case found with ID `{self.case_id}`.",
@@ -282,85 +414,135 @@ class CaseView(discord.ui.View):
             )
             return
         
-        await update_case_post(interaction, self.case_id, "❌ Case deleted")
+        await update_case_post(interaction, self.case_id, "❌ Case deleted", action="delete")
 
         database.delete_case(self.case_id)
+        conflicts.forget_case(interaction.guild_id, self.case_id)
         
         await interaction.response.send_message(
             f"Case `{self.case_id}` deleted.",
             ephemeral=True
         )
 
-    @discord.ui.button(label="Link Contact", style=discord.ButtonStyle.secondary)
-    async def link_contact_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await interaction.response.send_modal(LinkContactModal(self.case_id))
-
-    @discord.ui.button(label="Add Task", style=discord.ButtonStyle.success)
-    async def add_task_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await interaction.response.send_modal(AddTaskModal(self.case_id))
-
-    @discord.ui.button(label="Mark Task Done", style=discord.ButtonStyle.secondary)
-    async def mark_task_done_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await interaction.response.send_modal(MarkTaskDoneModal(self.case_id))
-
-# ---- Command Setup ----
-async def setup(bot):
-    @bot.tree.command(name="view_case", description="View details of a specific case by ID.")
-    @app_commands.describe(case_id="The ID of the case to view")
-    async def view_case(interaction: discord.Interaction, case_id: str):
-        allowed_role = discord.utils.get(interaction.user.roles, id=settings.EMPLOYEE_ROLE_ID)
-        if not allowed_role:
-            # Not allowed
-            await interaction.response.send_message("❌ You do not have permission.", ephemeral=True)
-            return
-        case = database.get_case_by_id(case_id)
+    @permissions.guard("case:close")
+    async def on_close(self, interaction: discord.Interaction):
+        case = database.get_case_by_id(self.case_id, interaction.guild_id)
         if not case:
             await interaction.response.send_message(
-                f"No case found with ID `{case_id}`.",
+                f"No case found with ID `{self.case_id}`.",
                 ephemeral=True
             )
             return
 
-        contacts = database.get_contacts_for_case(case_id)
-        contact_list = "\n".join([f"- *{c[5]}* {c[1]} (ID {c[0]})" for c in contacts]) or "None linked"
+        database.close_case(self.case_id)
+        await interaction.response.send_message(
+            f"Case `{self.case_id}` closed. It will be moved to the archive by `/archive_cases`.",
+            ephemeral=True
+        )
 
-        # Fetch tasks for this case
-        tasks = database.get_tasks_for_case(case_id)
+        await update_case_post(interaction, self.case_id, "🔒 Case closed", action="close")
 
-        if tasks:
-            task_list_lines = []
-            for t in tasks:
-                task_id, task_desc, deadline, done = t
+    @permissions.guard("case:link")
+    async def on_link(self, interaction: discord.Interaction):
+        if not database.get_case_by_id(self.case_id, interaction.guild_id):
+            await interaction.response.send_message(
+                f"No case found with ID `{self.case_id}`.",
+                ephemeral=True
+            )
+            return
+        await interaction.response.send_modal(LinkContactModal(self.case_id))
 
-                if deadline:
-                    try:
-                        dt = datetime.strptime(deadline, "%Y-%m-%d %H:%M")
-                        deadline_str = dt.strftime("%d.%m.%Y %H:%M")
-                    except ValueError:
-                        deadline_str = deadline
-                else:
-                    deadline_str = None
+    @permissions.guard("case:add_task")
+    async def on_add_task(self, interaction: discord.Interaction):
+        if not database.get_case_by_id(self.case_id, interaction.guild_id):
+            await interaction.response.send_message(
+                f"No case found with ID `{self.case_id}`.",
+                ephemeral=True
+            )
+            return
+        await interaction.response.send_modal(AddTaskModal(self.case_id))
 
-                task_line = f"- *#{task_id}* [{'✅' if done else '❌'}] {task_desc}"
-                if deadline_str:
-                    task_line += f" (Due: {deadline_str})"
+    @permissions.guard("case:tasks")
+    async def on_tasks(self, interaction: discord.Interaction):
+        if not database.get_case_by_id(self.case_id, interaction.guild_id):
+            await interaction.response.send_message(
+                f"No case found with ID `{self.case_id}`.",
+                ephemeral=True
+            )
+            return
+        tasks = database.get_tasks_for_case(self.case_id)
+        if not tasks:
+            await interaction.response.send_message(f"Case `{self.case_id}` has no tasks.", ephemeral=True)
+            return
+        note = f" (first {MAX_SELECT_OPTIONS} shown)" if len(tasks) > MAX_SELECT_OPTIONS else ""
+        await interaction.response.send_message(
+            f"Select tasks of case `{self.case_id}`{note}, then choose what to do with them.",
+            view=BulkTaskView(self.case_id, tasks, database.get_user_timezone(interaction.user.id)),
+            ephemeral=True
+        )
 
-                task_list_lines.append(task_line)
 
-            task_list = "\n".join(task_list_lines)
-        else:
-            task_list = "No tasks added."
+def build_case_view(case_id):
+    view = discord.ui.View(timeout=None)
+    for action in CASE_ACTIONS:
+        view.add_item(CaseButton(action, case_id))
+    # A stopped view is not stored by discord.py; clicks are routed to the
+    # registered CaseButton instead, so sending it keeps no per-message state
+    view.stop()
+    return view
 
+# ---- Helper Function to Build the /view_case Pages ----
+def build_case_details_pages(case, contacts, tasks, archived=False):
+    def make_page(number):
         embed = discord.Embed(
-            title=f"Case Details: {case[1]}",
+            title=f"Case Details: {case.name}",
             color=discord.Color.green()
         )
-        embed.add_field(name="ID", value=case[0], inline=False)
-        embed.add_field(name="Summary", value=case[2] or "None", inline=False)
-        embed.add_field(name="Notes", value=case[3] or "None", inline=False)
-        embed.add_field(name="Linked Contacts", value=contact_list, inline=False)
-        embed.add_field(name="Tasks / TODOs", value=task_list, inline=False)
-        embed.add_field(name="Created At", value=case[6], inline=False)
-
-        view = CaseView(case_id, case)
-        await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
+        if archived:
+            embed.description = "🗄️ Archived case (read-only)"
+        elif case.status == "closed":
+            embed.description = "🔒 Closed case"
+        return embed
+
+    composer = embeds.EmbedComposer(make_page)
+    composer.add_field("ID", case.id)
+    composer.add_field("Summary", case.summary or "None")
+    composer.add_field("Notes", case.notes or "None")
+    composer.add_lines("Linked Contacts", [embeds.case_contact_line(c) for c in contacts], empty="None linked")
+    composer.add_lines("Tasks / TODOs", [embeds.task_line(t) for t in tasks], empty="No tasks added.")
+    composer.add_field("Created At", case.created_at)
+    return composer.build()
+
+# ---- Command Setup ----
+async def setup(bot):
+    bot.add_dynamic_items(CaseButton)
+
+    @bot.tree.command(name="view_case", description="View details of a specific case by ID.")
+    @app_commands.describe(case_id="The ID of the case to view")
+    @permissions.guard("view_case")
+    async def view_case(interaction: discord.Interaction, case_id: str):
+        case = database.get_case_by_id(case_id, interaction.guild_id)
+        if not case:
+            # Closed cases may have been moved to the archive
+            archived = database.get_archived_case_details(case_id, interaction.guild_id)
+            if not archived:
+                await interaction.response.send_message(
+                    f"No case found with ID `{case_id}`.",
+                    ephemeral=True
+                )
+                return
+
+            case, contacts, tasks = archived
+            pages = build_case_details_pages(case, contacts, tasks, archived=True)
+            await interaction.response.send_message(embed=pages[0], ephemeral=True)
+            for page in pages[1:]:
+                await interaction.followup.send(embed=page, ephemeral=True)
+            return
+
+        contacts = database.get_contacts_for_case(case_id)
+        tasks = database.get_tasks_for_case(case_id)
+        pages = build_case_details_pages(case, contacts, tasks)
+
+        await interaction.response.send_message(embed=pages[0], view=build_case_view(case_id), ephemeral=True)
+        for page in pages[1:]:
+            await interaction.followup.send(embed=page, ephemeral=True)
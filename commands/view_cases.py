@@ -2,28 +2,39 @@ import discord
 from discord import app_commands
 import database
 import settings
+import permissions
+import temporal
 
 MAX_DESCRIPTION_LENGTH = 4000  # Slightly below Discord limit
 
+def format_task_counts(stats):
+    parts = []
+    if stats.status == "closed":
+        parts.append("closed")
+    if stats.open_tasks:
+        parts.append(f"{stats.open_tasks} open")
+    if stats.overdue_tasks:
+        parts.append(f"⚠️ {stats.overdue_tasks} overdue")
+    if stats.next_deadline:
+        parts.append(f"next {temporal.format_deadline(stats.next_deadline, 'R')}")
+    return f" — {' · '.join(parts)}" if parts else ""
+
 async def setup(bot):
     @bot.tree.command(
         name="view_cases",
         description="View all current cases (ID and Name only)."
     )
+    @permissions.guard("view_cases")
     async def view_cases(interaction: discord.Interaction):
-        allowed_role = discord.utils.get(interaction.user.roles, id=settings.EMPLOYEE_ROLE_ID)
-        if not allowed_role:
-            # Not allowed
-            await interaction.response.send_message("❌ You do not have permission.", ephemeral=True)
-            return
 
-        cases = database.get_all_cases()
+        # Task counts come from case_task_stats, so this stays one row per case
+        cases = database.get_case_stats(interaction.guild_id)
         if not cases:
             await interaction.response.send_message("No cases found.", ephemeral=True)
             return
 
-        # Format: `ID` `Name`
-        case_lines = [f"`{case[0]}` `{case[1]}`" for case in cases]
+        # Format: `ID` `Name` followed by the task counts
+        case_lines = [f"`{case.case_id}` `{case.case_name}`{format_task_counts(case)}" for case in cases]
 
         embeds = []
         current_desc = ""
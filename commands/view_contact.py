@@ -3,57 +3,58 @@ from discord import app_commands
 import database
 from datetime import datetime
 import settings
+import permissions
+import outbound
+import audit
+import conflicts
+import embeds
 
 # ---- Helper Function to Build Contact Embed ----
 async def build_contact_embed(contact_id):
     contact = database.get_contact_by_id(contact_id)
     cases = database.get_cases_for_contact(contact_id)
 
-    case_list = "\n".join([f"- {c[1]} (ID {c[0]}) as **{c[2]}**" for c in cases]) or "None linked"
-
-    embed = discord.Embed(
-        title=f"📇 Contact {contact[0]}: {contact[1]}",
-        color=discord.Color.purple(),
-        timestamp=datetime.now()
-    )
-    embed.add_field(name="Contact", value=contact[2] or "None", inline=False)
-    embed.add_field(name="Notes", value=contact[3] or "None", inline=False)
-    embed.add_field(name="Status", value=contact[4] or "None", inline=False)
-    embed.add_field(name="Discord User", value=f"<@{contact[5]}>" if contact[5] else "None", inline=False)
-    embed.add_field(name="Cases Linked", value=case_list, inline=False)
-    embed.set_footer(text=f"Created at {contact[6]}")
+    def make_page(number):
+        embed = discord.Embed(
+            title=f"📇 Contact {contact.id}: {contact.name}",
+            color=discord.Color.purple(),
+            timestamp=datetime.now()
+        )
+        embed.set_footer(text=f"Created at {contact.created_at}")
+        return embed
 
-    return embed
+    # The starter post is a single message; /view_contact pages through the rest
+    composer = embeds.EmbedComposer(make_page, max_pages=1)
+    composer.add_field("Contact", contact.contact or "None")
+    composer.add_field("Notes", contact.notes or "None")
+    composer.add_field("Status", contact.status or "None")
+    composer.add_field("Discord User", f"<@{contact.discord_id}>" if contact.discord_id else "None")
+    composer.add_lines("Cases Linked", [embeds.contact_case_line(c) for c in cases], empty="None linked")
+    return composer.build()[0]
 
 
 # ---- Helper Function to Update Forum Post + Log ----
-async def update_contact_post(interaction: discord.Interaction, contact_id: str, action_description: str):
+async def update_contact_post(interaction: discord.Interaction, contact_id: str, action_description: str,
+                              action="update", diff=None):
     """
-    Updates the starter embed of the contact thread and logs an action message.
+    Records the action in the audit log, then updates the starter embed of the contact
+    thread and logs an action message in the background.
     """
+    audit.record(
+        action, interaction.user.id, action_description,
+        contact_id=int(contact_id), diff=diff, guild_id=interaction.guild_id
+    )
+
     contact = database.get_contact_by_id(contact_id)
-    if not contact or not contact[6] or not contact[7]:
-        print(f"Error updating contact post: no thread/message link")
+    if not contact or not contact.channel_id or not contact.message_id:
+        print(f"Error updating contact post {contact_id}: no thread/message link")
         return  # missing forum thread link
 
-    print(contact)
-    print(contact[6], contact[7])
-    thread_id = int(contact[6])
-    starter_message_id = int(contact[7])
-
-    thread = interaction.client.get_channel(thread_id)
+    thread = interaction.client.get_channel(int(contact.channel_id))
     if not thread:
         return
 
-    # --- Update starter embed ---
-    try:
-        starter_message = await thread.fetch_message(starter_message_id)
-        embed = await build_contact_embed(contact_id)
-        await starter_message.edit(embed=embed)
-    except Exception as e:
-        print(f"Error updating contact post: {e}")
-
-    # --- Log action in the thread ---
+    embed = await build_contact_embed(contact_id)
     log_embed = discord.Embed(
         title="📝 Contact Log",
         description=action_description,
@@ -63,7 +64,7 @@ async def update_contact_post(interaction: discord.Interaction, contact_id: str,
     log_embed.set_author(name=str(interaction.user), icon_url=interaction.user.display_avatar.url)
     log_embed.set_footer(text=f"Contact ID: {contact_id}")
 
-    await thread.send(embed=log_embed)
+    outbound.in_background(outbound.refresh_thread(thread, int(contact.message_id), embed, log_embed))
 
 
 # ---- Modal for Editing Contact ----
@@ -71,24 +72,25 @@ class EditContactModal(discord.ui.Modal, title="Edit Contact"):
     def __init__(self, contact_id, contact):
         super().__init__()
         self.contact_id = contact_id
+        self.contact_record = contact  # values before the edit, for the audit diff
 
         self.name = discord.ui.TextInput(
-            label="Name", default=contact[1], required=True, max_length=100
+            label="Name", default=contact.name, required=True, max_length=100
         )
         self.contact = discord.ui.TextInput(
-            label="Contact", default=contact[2] or "", required=False,
+            label="Contact", default=contact.contact or "", required=False,
             style=discord.TextStyle.paragraph, max_length=200
         )
         self.notes = discord.ui.TextInput(
-            label="Notes", default=contact[3] or "", required=False,
+            label="Notes", default=contact.notes or "", required=False,
             style=discord.TextStyle.paragraph, max_length=500
         )
         self.status = discord.ui.TextInput(
-            label="Status", default=contact[4], required=True, max_length=50
+            label="Status", default=contact.status, required=True, max_length=50
         )
         self.discord_id = discord.ui.TextInput(
             label="Discord User ID (optional)",
-            default=contact[5] if contact[5] else "",
+            default=contact.discord_id or "",
             required=False,
             placeholder="Enter Discord user ID to link this contact"
         )
@@ -120,33 +122,67 @@ class EditContactModal(discord.ui.Modal, title="Edit Contact"):
             f"• **Discord:** {f'<@{discord_user_id}>' if discord_user_id else 'None'}"
         )
 
-        await update_contact_post(interaction, self.contact_id, action_description)
-
+        diff = audit.changes(
+            self.contact_record._asdict(),
+            {
+                "name": self.name.value,
+                "contact": self.contact.value,
+                "notes": self.notes.value,
+                "status": self.status.value,
+                "discord_id": discord_user_id,
+            }
+        )
         await interaction.response.send_message(
             f"✅ Contact `{self.contact_id}` updated!",
             ephemeral=True
         )
+        await update_contact_post(interaction, self.contact_id, action_description, action="edit", diff=diff)
 
 
-# ---- Buttons View ----
-class ContactView(discord.ui.View):
-    def __init__(self, contact_id, contact):
-        super().__init__(timeout=None)
+# ---- Persistent Buttons ----
+# action: (label, style)
+CONTACT_ACTIONS = {
+    "edit": ("Edit Contact", discord.ButtonStyle.primary),
+    "delete": ("Delete Contact", discord.ButtonStyle.danger),
+}
+
+class ContactButton(
+    discord.ui.DynamicItem[discord.ui.Button, discord.ui.View],
+    template=rf"contact:(?P<action>{'|'.join(CONTACT_ACTIONS)}):(?P<contact_id>[0-9]+)"
+):
+    """
+    A contact button that carries its action and contact ID in the custom_id.
+    Registered once via bot.add_dynamic_items, so it survives restarts and
+    nothing has to stay in memory for each contact view that was opened.
+    """
+    def __init__(self, action, contact_id):
+        label, style = CONTACT_ACTIONS[action]
+        super().__init__(discord.ui.Button(label=label, style=style, custom_id=f"contact:{action}:{contact_id}"))
+        self.action = action
         self.contact_id = contact_id
-        self.contact = contact
 
-    @discord.ui.button(label="Edit Contact", style=discord.ButtonStyle.primary)
-    async def edit_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await interaction.response.send_modal(EditContactModal(self.contact_id, self.contact))
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["action"], int(match["contact_id"]))
 
-    @discord.ui.button(label="Delete Contact", style=discord.ButtonStyle.danger)
-    async def delete_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        allowed_role = discord.utils.get(interaction.user.roles, id=settings.MANAGER_ROLE_ID)
-        if not allowed_role:
-            await interaction.response.send_message("❌ You do not have permission.", ephemeral=True)
+    async def callback(self, interaction: discord.Interaction):
+        await getattr(self, f"on_{self.action}")(interaction)
+
+    @permissions.guard("contact:edit")
+    async def on_edit(self, interaction: discord.Interaction):
+        contact = database.get_contact_by_id(self.contact_id, interaction.guild_id)
+        if not contact:
+            await interaction.response.send_message(
+                f"No contact found with ID `{self.contact_id}`.",
+                ephemeral=True
+            )
             return
+        await interaction.response.send_modal(EditContactModal(self.contact_id, contact))
+
+    @permissions.guard("contact:delete")
+    async def on_delete(self, interaction: discord.Interaction):
 
-        contact = database.get_contact_by_id(self.contact_id)
+        contact = database.get_contact_by_id(self.contact_id, interaction.guild_id)
         if not contact:
             await interaction.response.send_message(
                 f"No contact found with ID `{self.contact_id}`.",
@@ -155,10 +191,14 @@ class ContactView(discord.ui.View):
             return
 
         # Log deletion in the thread
-        await update_contact_post(interaction, self.contact_id, f"❌ Contact `{contact[1]}` deleted by {interaction.user.mention}")
+        await update_contact_post(
+            interaction, self.contact_id, f"❌ Contact `{contact.name}` deleted by {interaction.user.mention}",
+            action="delete"
+        )
 
         # Delete contact in DB
         database.delete_contact(self.contact_id)
+        conflicts.forget_contact(interaction.guild_id, int(self.contact_id))
 
         await interaction.response.send_message(
             f"Contact `{self.contact_id}` deleted.",
@@ -166,18 +206,25 @@ class ContactView(discord.ui.View):
         )
 
 
+def build_contact_view(contact_id):
+    view = discord.ui.View(timeout=None)
+    for action in CONTACT_ACTIONS:
+        view.add_item(ContactButton(action, contact_id))
+    # A stopped view is not stored by discord.py; clicks are routed to the
+    # registered ContactButton instead, so sending it keeps no per-message state
+    view.stop()
+    return view
+
 
 # ---- Command Setup ----
 async def setup(bot):
+    bot.add_dynamic_items(ContactButton)
+
     @bot.tree.command(name="view_contact", description="View details of a contact/party by ID.")
     @app_commands.describe(contact_id="The ID of the contact to view")
+    @permissions.guard("view_contact")
     async def view_contact(interaction: discord.Interaction, contact_id: str):
-        allowed_role = discord.utils.get(interaction.user.roles, id=settings.EMPLOYEE_ROLE_ID)
-        if not allowed_role:
-            # Not allowed
-            await interaction.response.send_message("❌ You do not have permission.", ephemeral=True)
-            return
-        contact = database.get_contact_by_id(contact_id)
+        contact = database.get_contact_by_id(contact_id, interaction.guild_id)
         if not contact:
             await interaction.response.send_message(
                 f"No contact found with ID `{contact_id}`.",
@@ -186,19 +233,22 @@ async def setup(bot):
             return
 
         cases = database.get_cases_for_contact(contact_id)
-        case_list = "\n".join([f"- {c[1]} (ID {c[0]}) as **{c[2]}**" for c in cases]) or "None linked"
 
-        embed = discord.Embed(
-            title=f"Contact Details: {contact[1]}",
+        composer = embeds.EmbedComposer(lambda number: discord.Embed(
+            title=f"Contact Details: {contact.name}",
             color=discord.Color.purple()
-        )
-        embed.add_field(name="ID", value=contact[0], inline=False)
-        embed.add_field(name="Contact", value=contact[2] or "None", inline=False)
-        embed.add_field(name="Notes", value=contact[3] or "None", inline=False)
-        embed.add_field(name="Status", value=contact[4] or "None", inline=False)
-        embed.add_field(name="Discord User", value=f"<@{contact[5]}>" if contact[5] else "None", inline=False)
-        embed.add_field(name="Created At", value=contact[6], inline=False)
-        embed.add_field(name="Cases Linked", value=case_list, inline=False)
-
-        view = ContactView(contact_id, contact)
-        await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
+        ))
+        composer.add_field("ID", contact.id)
+        composer.add_field("Contact", contact.contact or "None")
+        composer.add_field("Notes", contact.notes or "None")
+        composer.add_field("Status", contact.status or "None")
+        composer.add_field("Discord User", f"<@{contact.discord_id}>" if contact.discord_id else "None")
+        composer.add_field("Created At", contact.created_at)
+        open_tasks, done_tasks, overdue_tasks = database.get_contact_task_stats(contact.id)
+        composer.add_field("Tasks in Linked Cases", f"{open_tasks} open • {overdue_tasks} overdue • {done_tasks} done")
+        composer.add_lines("Cases Linked", [embeds.contact_case_line(c) for c in cases], empty="None linked")
+
+        pages = composer.build()
+        await interaction.response.send_message(embed=pages[0], view=build_contact_view(contact.id), ephemeral=True)
+        for page in pages[1:]:
+            await interaction.followup.send(embed=page, ephemeral=True)
@@ -2,25 +2,22 @@ import discord
 from discord import app_commands
 import database
 import settings
+import permissions
 
 MAX_DESCRIPTION_LENGTH = 4000  # Slightly less than 4096 to be safe
 
 async def setup(bot):
     @bot.tree.command(name="view_contacts", description="View all contacts/parties.")
+    @permissions.guard("view_contacts")
     async def view_contacts(interaction: discord.Interaction):
-        allowed_role = discord.utils.get(interaction.user.roles, id=settings.EMPLOYEE_ROLE_ID)
-        if not allowed_role:
-            # Not allowed
-            await interaction.response.send_message("❌ You do not have permission.", ephemeral=True)
-            return
         
-        contacts = database.get_all_contacts()
+        contacts = database.get_all_contacts(interaction.guild_id)
         if not contacts:
             await interaction.response.send_message("No contacts found.", ephemeral=True)
             return
 
         # Format each line: `ID` `Name` (`Status`)
-        lines = [f"`{c[0]}` `{c[1]} ({c[4]})`" for c in contacts]
+        lines = [f"`{c.id}` `{c.name} ({c.status})`" for c in contacts]
 
         embeds = []
         current_desc = ""
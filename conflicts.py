@@ -0,0 +1,135 @@
+"""
+Conflict-of-interest checks over the case–contact graph.
+
+Each guild's case_contacts links, from live and archived cases alike since past
+matters count most, are loaded once into an in-memory adjacency index
+(contact -> cases with roles, case -> contacts with roles) and kept current by
+link(), unlink() and the forget_* functions as the bot changes links. check()
+walks the index from a contact and every contact with a similar name or the
+same email or phone (database.find_similar_contacts) to find the cases they
+touch within settings.CONFLICT_HOPS, without querying case_contacts again.
+"""
+import time
+from collections import defaultdict
+from typing import NamedTuple, Optional
+import database
+import metrics
+import settings
+
+
+class Conflict(NamedTuple):
+    case_id: str
+    contact_id: int  # the party on that case
+    role: Optional[str]
+    hops: int  # 1: the party is the checked contact or a namesake; 2+: reached through other parties
+    opposing: bool  # the party's side there differs from the side of the new role
+    via_case: Optional[str]  # for hops 2+, the case the party shares with the previous hop
+
+
+class GuildIndex:
+    def __init__(self, links):
+        self.contact_cases = defaultdict(dict)  # contact_id -> {case_id: role}
+        self.case_contacts = defaultdict(dict)  # case_id -> {contact_id: role}
+        for case_id, contact_id, role in links:
+            self.add(case_id, contact_id, role)
+
+    def add(self, case_id, contact_id, role):
+        self.contact_cases[contact_id][case_id] = role
+        self.case_contacts[case_id][contact_id] = role
+
+    def remove(self, case_id, contact_id):
+        self.contact_cases.get(contact_id, {}).pop(case_id, None)
+        self.case_contacts.get(case_id, {}).pop(contact_id, None)
+
+    def remove_case(self, case_id):
+        for contact_id in self.case_contacts.pop(case_id, {}):
+            self.contact_cases.get(contact_id, {}).pop(case_id, None)
+
+    def remove_contact(self, contact_id):
+        for case_id in self.contact_cases.pop(contact_id, {}):
+            self.case_contacts.get(case_id, {}).pop(contact_id, None)
+
+    def reach(self, seeds, hops, exclude_case=None):
+        """
+        Breadth-first walk from the `seeds` contacts: yields (case_id, contact_id, role, hop, via_case)
+        for every case within `hops`, each case once at its nearest distance.
+        """
+        seen_cases = {exclude_case}
+        seen_contacts = set(seeds)
+        frontier = dict.fromkeys(seeds)  # contact -> case it was reached through
+        for hop in range(1, hops + 1):
+            next_frontier = {}
+            for contact_id, via in frontier.items():
+                for case_id, role in self.contact_cases.get(contact_id, {}).items():
+                    if case_id in seen_cases:
+                        continue
+                    seen_cases.add(case_id)
+                    yield case_id, contact_id, role, hop, via
+                    for other_id in self.case_contacts[case_id]:
+                        if other_id not in seen_contacts:
+                            seen_contacts.add(other_id)
+                            next_frontier[other_id] = case_id
+            frontier = next_frontier
+
+
+_indexes = {}  # guild_id -> GuildIndex
+
+
+def _index(guild_id):
+    index = _indexes.get(guild_id)
+    if index is None:
+        metrics.increment("conflict_index_loads")
+        index = _indexes[guild_id] = GuildIndex(database.get_guild_links(guild_id))
+    return index
+
+
+def side(role):
+    role = (role or "").lower()
+    return next((side for word, side in settings.CONFLICT_SIDES.items() if word in role), None)
+
+
+def check(guild_id, contact, role=None, exclude_case=None, hops=None):
+    """
+    Cases that `contact` or a contact matching its name or details is involved in,
+    directly or through other parties, nearest and opposing ones first.
+    - role: the role the contact is about to get, to tell which parties are on the other side
+    - exclude_case: the case the contact is being linked to
+    """
+    started = time.perf_counter()
+    seeds = {contact.id} | {similar.id for _, similar in database.find_similar_contacts(guild_id, contact.name, contact.contact)}
+
+    new_side = side(role)
+    conflicts = []
+    for case_id, party_id, party_role, hop, via_case in _index(guild_id).reach(seeds, hops or settings.CONFLICT_HOPS, exclude_case):
+        party_side = side(party_role)
+        opposing = hop == 1 and None not in (new_side, party_side) and new_side != party_side
+        conflicts.append(Conflict(case_id, party_id, party_role, hop, opposing, via_case))
+    conflicts.sort(key=lambda c: (c.hops, not c.opposing, c.contact_id != contact.id))
+
+    metrics.observe("conflict_check_ms", round((time.perf_counter() - started) * 1000, 2))
+    return conflicts
+
+
+def link(guild_id, case_id, contact_id, role):
+    if guild_id in _indexes:
+        _indexes[guild_id].add(case_id, contact_id, role)
+
+
+def unlink(guild_id, case_id, contact_id):
+    if guild_id in _indexes:
+        _indexes[guild_id].remove(case_id, contact_id)
+
+
+def forget_case(guild_id, case_id):
+    if guild_id in _indexes:
+        _indexes[guild_id].remove_case(case_id)
+
+
+def forget_contact(guild_id, contact_id):
+    if guild_id in _indexes:
+        _indexes[guild_id].remove_contact(contact_id)
+
+
+def invalidate(guild_id):
+    """Drops a guild's index, e.g. after cases were archived in bulk; it is reloaded on the next check."""
+    _indexes.pop(guild_id, None)
@@ -0,0 +1,54 @@
+"""
+Name trigrams and contact-detail tokens for finding likely duplicate contacts.
+
+Names are normalized (case, accents, punctuation) and split into space-padded
+word trigrams, so "Müller, Hans" and "hans muller" share nearly all of them. Emails
+and phone numbers in the contact details become exact tokens; a shared one
+marks a duplicate regardless of the name. Both are stored in contact_trigrams
+and looked up through its (guild_id, trigram) index by database.find_similar_contacts.
+"""
+import re
+import unicodedata
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+PHONE_RE = re.compile(r"\+?\d[\d ()-]{5,}\d")
+PHONE_DIGITS = 9  # trailing digits compared, so +49 151 ... and 0151 ... match
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    return " ".join(re.sub(r"[\W_]+", " ", text).split())
+
+
+def name_trigrams(name):
+    trigrams = set()
+    for word in normalize(name).split():
+        # One space of padding rather than two: "  h"-style trigrams match a large
+        # share of all names, which makes lookups slow without helping the score
+        padded = f" {word} "
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+def detail_tokens(contact):
+    """Emails ("@...") and phone numbers ("#...") found in free-text contact details."""
+    contact = contact or ""
+    tokens = {"@" + email.casefold() for email in EMAIL_RE.findall(contact)}
+    for phone in PHONE_RE.findall(contact):
+        digits = re.sub(r"\D", "", phone)
+        if len(digits) >= 6:
+            tokens.add("#" + digits[-PHONE_DIGITS:])
+    return tokens
+
+
+def index_terms(name, contact):
+    return name_trigrams(name) | detail_tokens(contact)
+
+
+def similarity(name_a, name_b):
+    """Jaccard similarity of the name trigrams, from 0 to 1."""
+    a, b = name_trigrams(name_a), name_trigrams(name_b)
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
@@ -1,42 +1,106 @@
 import sqlite3
 import os
+import math
+import time
+import threading
+from datetime import datetime
 import settings
+import models
+import contact_index
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MEMORY = ":memory:"
 
-def get_connection():
-    return sqlite3.connect(f"{BASE_DIR}\\database.db")
+# Column lists in the field order of the row types in models.py
+CASE_COLUMNS = ", ".join(models.Case._fields)
+CONTACT_COLUMNS = ", ".join(models.Contact._fields)
+TASK_COLUMNS = ", ".join(models.Task._fields)
+EVENT_COLUMNS = ", ".join(models.CaseEvent._fields)
+THREAD_MESSAGE_COLUMNS = ", ".join(models.ThreadMessage._fields)
+DOCUMENT_COLUMNS = ", ".join(models.CaseDocument._fields)
 
-def create_table(table_name, schema):
-    connection = get_connection()
-    cursor = connection.cursor()
+_memory_keeper = None  # holds the shared in-memory databases open for the life of the process
+_memory_lock = threading.Lock()
+
+def memory_uri(suffix=""):
+    """URI of the named in-memory database every connection of this process shares."""
+    return f"file:{settings.DATABASE_MEMORY_NAME}{suffix}?mode=memory&cache=shared"
+
+def archive_location():
+    return memory_uri("-archive") if settings.ARCHIVE_DATABASE_PATH == MEMORY else settings.ARCHIVE_DATABASE_PATH
+
+def has_archive():
+    """Whether the archive database exists, i.e. /archive_cases has run at least once."""
+    return settings.ARCHIVE_DATABASE_PATH == MEMORY or os.path.exists(settings.ARCHIVE_DATABASE_PATH)
+
+def _keep_memory_database():
+    # A shared in-memory database is freed when its last connection closes,
+    # and every helper here closes its connection when done
+    global _memory_keeper
+    with _memory_lock:
+        if _memory_keeper is None:
+            keeper = sqlite3.connect(memory_uri(), uri=True, check_same_thread=False)
+            if settings.ARCHIVE_DATABASE_PATH == MEMORY:
+                keeper.execute("ATTACH DATABASE ? AS archive", (archive_location(),))
+            _memory_keeper = keeper
 
-    # Build CREATE TABLE statement
+def get_connection():
+    if settings.DATABASE_PATH == MEMORY:
+        _keep_memory_database()
+        connection = sqlite3.connect(memory_uri(), uri=True, timeout=settings.DATABASE_TIMEOUT)
+    else:
+        connection = sqlite3.connect(settings.DATABASE_PATH, timeout=settings.DATABASE_TIMEOUT)
+    # Foreign keys are off by default in SQLite and must be enabled per connection
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.execute(f"PRAGMA synchronous = {settings.DATABASE_SYNCHRONOUS}")
+    return connection
+
+def build_create_table_sql(table_name, schema):
     columns_sql = ",\n    ".join([f"{col} {definition}" for col, definition in schema.items()])
-    cursor.execute(
-        f"""
+    return f"""
         CREATE TABLE IF NOT EXISTS {table_name} (
             {columns_sql}
         )
         """
+
+def _insert_case(cursor, case_id, name, summary, notes, channel_id, message_id, guild_id, tasks):
+    guild_id = str(guild_id) if guild_id else None
+    cursor.execute(
+        "INSERT INTO cases (id, name, summary, notes, channel_id, message_id, guild_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (case_id, name, summary, notes, channel_id, message_id, guild_id)
+    )
+    cursor.executemany(
+        "INSERT INTO case_tasks (case_id, task, deadline, guild_id) VALUES (?, ?, ?, ?)",
+        [(case_id, task, deadline, guild_id) for task, deadline in tasks]
     )
 
+def insert_case(case_id, name, summary, notes, channel_id=None, message_id=None, guild_id=None, tasks=()):
+    """Inserts a case together with its initial `tasks`, a list of (task, deadline), in one transaction."""
+    connection = get_connection()
+    cursor = connection.cursor()
+    _insert_case(cursor, case_id, name, summary, notes, channel_id, message_id, guild_id, tasks)
     connection.commit()
     connection.close()
 
-def create_all_tables():
-    for table, schema in settings.DATABASE_SCHEMA.items():
-        create_table(table, schema)
-
-def insert_case(case_id, name, summary, notes, channel_id=None, message_id=None):
+def create_case(today, name, summary, notes, guild_id=None, tasks=()):
+    """
+    Inserts a new case with the next free ID of `today` ("DDMMYYYY"), e.g. "3-01022025",
+    and its initial `tasks`; returns the ID. The ID is taken and used in one write
+    transaction, so concurrent submissions never get the same one.
+    """
     connection = get_connection()
+    connection.isolation_level = None  # transaction is handled explicitly below
     cursor = connection.cursor()
-    cursor.execute(
-        "INSERT INTO cases (id, name, summary, notes, channel_id, message_id) VALUES (?, ?, ?, ?, ?, ?)",
-        (case_id, name, summary, notes, channel_id, message_id)
-    )
-    connection.commit()
-    connection.close()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        case_id = f"{count_cases_today(today, cursor) + 1}-{today}"
+        _insert_case(cursor, case_id, name, summary, notes, None, None, guild_id, tasks)
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+    finally:
+        connection.close()
+    return case_id
 
 
 def update_case(case_id, name=None, summary=None, notes=None, channel_id=None, message_id=None):
@@ -75,73 +139,112 @@ def update_case(case_id, name=None, summary=None, notes=None, channel_id=None, m
     connection.close()
 
 
-def count_cases_today(today):
-    connection = get_connection()
-    cursor = connection.cursor()
+def count_cases_today(today, cursor=None):
+    # Highest sequence number used today rather than COUNT(*), so deleting a case
+    # never hands out an ID that is still taken (case IDs are unique across all guilds)
+    connection = None
+    if cursor is None:
+        connection = get_connection()
+        cursor = connection.cursor()
     cursor.execute(
-        "SELECT COUNT(*) FROM cases WHERE strftime('%d%m%Y', created_at) = ?", (today,)
+        "SELECT COALESCE(MAX(CAST(substr(id, 1, instr(id, '-') - 1) AS INTEGER)), 0) FROM cases WHERE id LIKE ?",
+        (f"%-{today}",)
     )
     count = cursor.fetchone()[0]
-    connection.close()
+    if connection:
+        connection.close()
     return count
 
-def get_all_cases():
+def get_all_cases(guild_id):
     connection = get_connection()
     cursor = connection.cursor()
-    cursor.execute("SELECT id, name, summary, notes, channel_id, message_id, created_at FROM cases")
+    cursor.row_factory = models.row_factory(models.Case)
+    cursor.execute(f"SELECT {CASE_COLUMNS} FROM cases WHERE guild_id = ?", (str(guild_id),))
     cases = cursor.fetchall()
     connection.close()
     return cases
 
 
-def get_case_by_id(case_id):
+def get_case_by_id(case_id, guild_id=None):
+    """The case with `case_id`; with `guild_id`, only if it belongs to that guild."""
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.row_factory = models.row_factory(models.Case)
+    query = f"SELECT {CASE_COLUMNS} FROM cases WHERE id = ?"
+    params = [case_id]
+    if guild_id is not None:
+        query += " AND guild_id = ?"
+        params.append(str(guild_id))
+    cursor.execute(query, params)
+    case = cursor.fetchone()
+    connection.close()
+    return case
+
+def get_case_by_thread(thread_id, guild_id):
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.row_factory = models.row_factory(models.Case)
+    cursor.execute(f"SELECT {CASE_COLUMNS} FROM cases WHERE channel_id = ? AND guild_id = ?", (str(thread_id), str(guild_id)))
+    case = cursor.fetchone()
+    connection.close()
+    return case
+
+def close_case(case_id):
     connection = get_connection()
     cursor = connection.cursor()
     cursor.execute(
-        "SELECT id, name, summary, notes, channel_id, message_id, created_at FROM cases WHERE id = ?",
+        "UPDATE cases SET status = 'closed', closed_at = CURRENT_TIMESTAMP WHERE id = ?",
         (case_id,)
     )
-    case = cursor.fetchone()
+    connection.commit()
     connection.close()
-    return case
 
 def delete_case(case_id):
+    # Linked contacts and tasks are removed by ON DELETE CASCADE, the thread's message copies here
     connection = get_connection()
     cursor = connection.cursor()
+    cursor.execute("SELECT channel_id FROM cases WHERE id=?", (case_id,))
+    row = cursor.fetchone()
+    _forget_thread(cursor, row and row[0])
+    cursor.execute("DELETE FROM case_documents WHERE case_id=?", (case_id,))  # files go with the next maintenance
     cursor.execute("DELETE FROM cases  WHERE id=?", (case_id,))
     connection.commit()
     connection.close()
 
-def insert_contact(name, contact, notes, status, discord_id=None, channel_id=None, message_id=None):
+def insert_contact(name, contact, notes, status, discord_id=None, channel_id=None, message_id=None, guild_id=None):
     connection = get_connection()
     cursor = connection.cursor()
     cursor.execute(
-        "INSERT INTO contacts (name, contact, notes, status, discord_id, channel_id, message_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
-        (name, contact, notes, status, discord_id, channel_id, message_id)
+        "INSERT INTO contacts (name, contact, notes, status, discord_id, channel_id, message_id, guild_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (name, contact, notes, status, discord_id, channel_id, message_id, str(guild_id) if guild_id else None)
     )
-    connection.commit()
     contact_id = cursor.lastrowid
+    index_contact(cursor, contact_id)
+    connection.commit()
     connection.close()
     return contact_id
 
-def get_all_contacts():
+def get_all_contacts(guild_id):
     connection = get_connection()
     cursor = connection.cursor()
-    cursor.execute(
-        "SELECT id, name, contact, notes, status, discord_id, channel_id, message_id, created_at FROM contacts"
-    )
+    cursor.row_factory = models.row_factory(models.Contact)
+    cursor.execute(f"SELECT {CONTACT_COLUMNS} FROM contacts WHERE guild_id = ?", (str(guild_id),))
     contacts = cursor.fetchall()
     connection.close()
     return contacts
 
 
-def get_contact_by_id(contact_id):
+def get_contact_by_id(contact_id, guild_id=None):
+    """The contact with `contact_id`; with `guild_id`, only if it belongs to that guild."""
     connection = get_connection()
     cursor = connection.cursor()
-    cursor.execute(
-        "SELECT id, name, contact, notes, status, discord_id, channel_id, message_id, created_at FROM contacts WHERE id = ?",
-        (contact_id,)
-    )
+    cursor.row_factory = models.row_factory(models.Contact)
+    query = f"SELECT {CONTACT_COLUMNS} FROM contacts WHERE id = ?"
+    params = [contact_id]
+    if guild_id is not None:
+        query += " AND guild_id = ?"
+        params.append(str(guild_id))
+    cursor.execute(query, params)
     contact = cursor.fetchone()
     connection.close()
     return contact
@@ -179,13 +282,80 @@ def update_contact(contact_id, name=None, contact=None, notes=None, status=None,
         sql = f"UPDATE contacts SET {', '.join(updates)} WHERE id=?"
         values.append(contact_id)
         cursor.execute(sql, tuple(values))
+        if name is not None or contact is not None:
+            index_contact(cursor, contact_id)
         connection.commit()
 
     connection.close()
 
+def index_contact(cursor, contact_id):
+    """Rewrites the contact_trigrams rows of a contact; runs inside the caller's transaction."""
+    cursor.execute("SELECT guild_id, name, contact FROM contacts WHERE id = ?", (contact_id,))
+    guild_id, name, contact = cursor.fetchone()
+    cursor.execute("DELETE FROM contact_trigrams WHERE contact_id = ?", (contact_id,))
+    cursor.executemany(
+        "INSERT INTO contact_trigrams (guild_id, trigram, contact_id) VALUES (?, ?, ?)",
+        [(guild_id, term, contact_id) for term in contact_index.index_terms(name, contact)]
+    )
+
+def find_similar_contacts(guild_id, name, contact=None):
+    """
+    Likely duplicates of a new contact in a guild, as (score, Contact) best first.
+    Candidates are the contacts sharing the most index terms; a shared email or phone
+    number scores 1, otherwise the score is the name similarity.
+    """
+    name_terms = contact_index.name_trigrams(name)
+    detail_terms = contact_index.detail_tokens(contact)
+    terms = list(name_terms | detail_terms)
+    if not terms:
+        return []
+
+    # A name similarity of at least the threshold needs at least this many shared trigrams
+    min_shared = math.ceil(settings.DUPLICATE_THRESHOLD * len(name_terms))
+
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.execute(
+        f"""
+        SELECT contact_id FROM contact_trigrams
+        WHERE guild_id = ? AND trigram IN ({", ".join("?" for _ in terms)})
+        GROUP BY contact_id
+        HAVING COUNT(*) >= ? OR MAX(substr(trigram, 1, 1) IN ('@', '#'))
+        ORDER BY MAX(substr(trigram, 1, 1) IN ('@', '#')) DESC, COUNT(*) DESC
+        LIMIT ?
+        """,
+        (str(guild_id), *terms, min_shared, settings.DUPLICATE_CANDIDATES)
+    )
+    candidate_ids = [row[0] for row in cursor.fetchall()]
+    if not candidate_ids:
+        connection.close()
+        return []
+    cursor.row_factory = models.row_factory(models.Contact)
+    cursor.execute(
+        f"SELECT {CONTACT_COLUMNS} FROM contacts WHERE id IN ({', '.join('?' for _ in candidate_ids)})",
+        candidate_ids
+    )
+    candidates = cursor.fetchall()
+    connection.close()
+
+    matches = []
+    for candidate in candidates:
+        if detail_terms & contact_index.detail_tokens(candidate.contact):
+            score = 1.0
+        else:
+            score = contact_index.similarity(name, candidate.name)
+        if score >= settings.DUPLICATE_THRESHOLD:
+            matches.append((score, candidate))
+    matches.sort(key=lambda match: match[0], reverse=True)
+    return matches
+
 def delete_contact(contact_id):
+    # Case links are removed by ON DELETE CASCADE, the thread's message copies here
     connection = get_connection()
     cursor = connection.cursor()
+    cursor.execute("SELECT channel_id FROM contacts WHERE id=?", (contact_id,))
+    row = cursor.fetchone()
+    _forget_thread(cursor, row and row[0])
     cursor.execute("DELETE FROM contacts WHERE id=?", (contact_id,))
     connection.commit()
     connection.close()
@@ -194,7 +364,10 @@ def link_contact_to_case(case_id, contact_id, role):
     connection = get_connection()
     cursor = connection.cursor()
     cursor.execute(
-        "INSERT OR REPLACE INTO case_contacts (case_id, contact_id, role) VALUES (?, ?, ?)",
+        """
+        INSERT INTO case_contacts (case_id, contact_id, role) VALUES (?, ?, ?)
+        ON CONFLICT(case_id, contact_id) DO UPDATE SET role = excluded.role
+        """,
         (case_id, contact_id, role)
     )
     connection.commit()
@@ -203,11 +376,13 @@ def link_contact_to_case(case_id, contact_id, role):
 def get_contacts_for_case(case_id):
     connection = get_connection()
     cursor = connection.cursor()
+    cursor.row_factory = models.row_factory(models.CaseLink)
     cursor.execute(
         """
-        SELECT c.id, c.name, c.contact, c.notes, c.status,  cc.role, c.created_at, c.discord_id
-        FROM contacts c
-        INNER JOIN case_contacts cc ON c.id = cc.contact_id
+        SELECT ca.id, ca.name, c.id, c.name, cc.role, c.discord_id
+        FROM case_contacts cc
+        INNER JOIN contacts c ON c.id = cc.contact_id
+        INNER JOIN cases ca ON ca.id = cc.case_id
         WHERE cc.case_id = ?
         """,
         (case_id,)
@@ -219,11 +394,13 @@ def get_contacts_for_case(case_id):
 def get_cases_for_contact(contact_id):
     connection = get_connection()
     cursor = connection.cursor()
+    cursor.row_factory = models.row_factory(models.CaseLink)
     cursor.execute(
         """
-        SELECT ca.id, ca.name, cc.role
-        FROM cases ca
-        INNER JOIN case_contacts cc ON ca.id = cc.case_id
+        SELECT ca.id, ca.name, c.id, c.name, cc.role, c.discord_id
+        FROM case_contacts cc
+        INNER JOIN cases ca ON ca.id = cc.case_id
+        INNER JOIN contacts c ON c.id = cc.contact_id
         WHERE cc.contact_id = ?
         """,
         (contact_id,)
@@ -232,6 +409,37 @@ def get_cases_for_contact(contact_id):
     connection.close()
     return cases
 
+def get_guild_links(guild_id):
+    """Every (case_id, contact_id, role) link of a guild's cases, archived ones included."""
+    live_query = """
+        SELECT cc.case_id, cc.contact_id, cc.role
+        FROM main.case_contacts cc
+        INNER JOIN main.cases ca ON ca.id = cc.case_id
+        WHERE ca.guild_id = ?
+        """
+    if not has_archive():
+        connection = get_connection()  # nothing archived yet
+        cursor = connection.cursor()
+        cursor.execute(live_query, (str(guild_id),))
+    else:
+        connection = get_archive_connection()
+        cursor = connection.cursor()
+        cursor.execute(
+            f"""
+            {live_query}
+            UNION ALL
+            SELECT cc.case_id, cc.contact_id, cc.role
+            FROM archive.case_contacts cc
+            INNER JOIN archive.cases ca ON ca.id = cc.case_id
+            INNER JOIN main.contacts c ON c.id = cc.contact_id
+            WHERE ca.guild_id = ?
+            """,
+            (str(guild_id), str(guild_id))
+        )
+    links = cursor.fetchall()
+    connection.close()
+    return links
+
 def unlink_contact_from_case(case_id, contact_id):
     connection = get_connection()
     cursor = connection.cursor()
@@ -243,35 +451,43 @@ def unlink_contact_from_case(case_id, contact_id):
     connection.close()
 
 def add_task(case_id, task, deadline=None):
+    """Returns the new task's id."""
     connection = get_connection()
     cursor = connection.cursor()
+    # The task belongs to the guild of its case
     cursor.execute(
-        "INSERT INTO case_tasks (case_id, task, deadline) VALUES (?, ?, ?)",
-        (case_id, task, deadline)
+        "INSERT INTO case_tasks (case_id, task, deadline, guild_id) SELECT ?, ?, ?, guild_id FROM cases WHERE id = ?",
+        (case_id, task, deadline, case_id)
     )
+    task_id = cursor.lastrowid
     connection.commit()
     connection.close()
+    return task_id
 
 def get_tasks_for_case(case_id):
     connection = get_connection()
     cursor = connection.cursor()
+    cursor.row_factory = models.row_factory(models.Task)
     cursor.execute(
-        "SELECT id, task, deadline, done FROM case_tasks WHERE case_id = ?",
+        f"SELECT {TASK_COLUMNS} FROM case_tasks WHERE case_id = ?",
         (case_id,)
     )
     tasks = cursor.fetchall()
     connection.close()
     return tasks
 
-def mark_task_done(task_id):
+def mark_task_done(task_id, case_id):
+    """Returns whether the task was found in `case_id`."""
     connection = get_connection()
     cursor = connection.cursor()
     cursor.execute(
-        "UPDATE case_tasks SET done = 1 WHERE id = ?",
-        (task_id,)
+        "UPDATE case_tasks SET done = 1 WHERE id = ? AND case_id = ?",
+        (task_id, case_id)
     )
+    updated = cursor.rowcount > 0
     connection.commit()
     connection.close()
+    return updated
 
 def delete_task(task_id):
     connection = get_connection()
@@ -283,28 +499,57 @@ def delete_task(task_id):
     connection.commit()
     connection.close()
 
-def get_all_tasks():
+# action: statement applied to the selected tasks, and the state a task must be in for it
+TASK_BULK_ACTIONS = {
+    "done": ("UPDATE case_tasks SET done = 1", "done = 0"),
+    "reopen": ("UPDATE case_tasks SET done = 0, notified_at = NULL", "done = 1"),  # reminded again if still due
+    "delete": ("DELETE FROM case_tasks", "1"),
+}
+
+def update_tasks(case_id, task_ids, action):
+    """
+    Applies `action` ("done", "reopen" or "delete") to the listed tasks of `case_id`
+    with one statement; IDs of other cases and tasks already in that state are skipped.
+    Returns the tasks that changed.
+    """
+    if not task_ids:
+        return []
+    statement, state = TASK_BULK_ACTIONS[action]
+    placeholders = ", ".join("?" * len(task_ids))
     connection = get_connection()
     cursor = connection.cursor()
+    cursor.row_factory = models.row_factory(models.Task)
     cursor.execute(
-        "SELECT id, case_id, task, deadline, done FROM case_tasks"
+        f"{statement} WHERE case_id = ? AND id IN ({placeholders}) AND {state} RETURNING {TASK_COLUMNS}",
+        (case_id, *task_ids)
     )
     tasks = cursor.fetchall()
+    connection.commit()
+    connection.close()
+    return sorted(tasks, key=lambda task: task.id)
+
+def get_all_tasks(guild_id):
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.row_factory = models.row_factory(models.Task)
+    cursor.execute(f"SELECT {TASK_COLUMNS} FROM case_tasks WHERE guild_id = ?", (str(guild_id),))
+    tasks = cursor.fetchall()
     connection.close()
     return tasks
 
-def get_tasks_due_between(start: str = None, end: str = None): # maybe I need to switch to timestamps here
+def get_tasks_due_between(guild_id, start: str = None, end: str = None): # maybe I need to switch to timestamps here
     """
-    Returns all tasks with deadlines between start and end.
-    - start and end are strings in "YYYY-MM-DD HH:MM" format.
+    Returns all tasks of a guild with deadlines between start and end.
+    - start and end are UTC strings in "YYYY-MM-DD HH:MM" format.
     - If start is None, defaults to now.
     - If end is None, fetches all future tasks.
     """
     connection = get_connection()
     cursor = connection.cursor()
+    cursor.row_factory = models.row_factory(models.Task)
 
-    query = "SELECT id, case_id, task, deadline, done FROM case_tasks WHERE deadline IS NOT NULL"
-    params = []
+    query = f"SELECT {TASK_COLUMNS} FROM case_tasks WHERE guild_id = ? AND deadline IS NOT NULL"
+    params = [str(guild_id)]
 
     if start:
         query += " AND deadline >= ?"
@@ -318,30 +563,937 @@ def get_tasks_due_between(start: str = None, end: str = None): # maybe I need to
     connection.close()
     return tasks
 
+#------ GUILD SETTINGS
+
+GUILD_SETTINGS_COLUMNS = ", ".join(models.GuildSettings._fields)
+
+def get_guild_settings(guild_id):
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.row_factory = models.row_factory(models.GuildSettings)
+    cursor.execute(f"SELECT {GUILD_SETTINGS_COLUMNS} FROM guild_settings WHERE guild_id = ?", (str(guild_id),))
+    guild_settings = cursor.fetchone()
+    connection.close()
+    return guild_settings
+
+def get_configured_guild_ids():
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.execute("SELECT guild_id FROM guild_settings")
+    guild_ids = [int(row[0]) for row in cursor.fetchall()]
+    connection.close()
+    return guild_ids
+
+def save_guild_settings(guild_id, **values):
+    """Creates or updates the settings of a guild; only the given columns change."""
+    values = {col: str(value) for col, value in values.items() if value is not None}
+    columns = ", ".join(["guild_id", *values])
+    placeholders = ", ".join("?" for _ in range(len(values) + 1))
+    updates = ", ".join([f"{col} = excluded.{col}" for col in values] + ["updated_at = CURRENT_TIMESTAMP"])
+
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.execute(
+        f"""
+        INSERT INTO guild_settings ({columns}) VALUES ({placeholders})
+        ON CONFLICT(guild_id) DO UPDATE SET {updates}
+        """,
+        (str(guild_id), *values.values())
+    )
+    connection.commit()
+    connection.close()
+
+GUILD_SCOPED_TABLES = ("cases", "contacts", "case_tasks", "case_events")
+
+def assign_default_guild(cursor=None):
+    """
+    Assigns rows without a guild (from before multi-guild support) to settings.DEFAULT_GUILD_ID
+    and seeds its guild settings from the constants in settings.py.
+    """
+    if cursor is None:
+        # Standalone run: the trigger is dropped and restored in the same transaction as
+        # the backfill, so a failure can't leave the audit log without its guard
+        connection = get_connection()
+        connection.isolation_level = None  # transaction is handled explicitly below
+        cursor = connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            assign_default_guild(cursor)
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+        return
+
+    guild_id = str(settings.DEFAULT_GUILD_ID)
+    # The audit log is append-only (migration 7); its guard is lifted for this one backfill
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_case_events_no_update'")
+    guard = cursor.fetchone()
+    if guard:
+        cursor.execute("DROP TRIGGER trg_case_events_no_update")
+    for table in GUILD_SCOPED_TABLES:
+        cursor.execute(f"UPDATE {table} SET guild_id = ? WHERE guild_id IS NULL", (guild_id,))
+        if cursor.rowcount:
+            print(f"[GUILDS] Assigned {cursor.rowcount} rows in '{table}' to guild {guild_id}")
+    if guard:
+        cursor.execute(guard[0])
+    # Contact search terms follow their contacts (the table exists from migration 11 on)
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'contact_trigrams'")
+    if cursor.fetchone():
+        cursor.execute("UPDATE contact_trigrams SET guild_id = ? WHERE guild_id IS NULL", (guild_id,))
+    cursor.execute(
+        """
+        INSERT OR IGNORE INTO guild_settings (guild_id, employee_role_id, manager_role_id,
+            notification_channel_id, case_forum_channel_id, contacts_forum_channel_id)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (guild_id, *(str(value) for value in (
+            settings.EMPLOYEE_ROLE_ID, settings.MANAGER_ROLE_ID, settings.NOTIFICATION_CHANNEL_ID,
+            settings.CASE_FORUM_CHANNEL_ID, settings.CONTACTS_FORUM_CHANNEL_ID
+        )))
+    )
+
+#------ NOTIFICATION OUTBOX
+
+def get_tasks_to_notify(guild_id, until):
+    """Open tasks of a guild due before `until` (UTC storage string) that have not been notified yet."""
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.row_factory = models.row_factory(models.Task)
+    cursor.execute(
+        f"""
+        SELECT {TASK_COLUMNS} FROM case_tasks
+        WHERE guild_id = ? AND done = 0 AND deadline <= ? AND notified_at IS NULL
+        """,
+        (str(guild_id), until)
+    )
+    tasks = cursor.fetchall()
+    connection.close()
+    return tasks
+
+def queue_notifications(guild_id, channel_id, notifications, notified_at):
+    """
+    Adds rendered notifications, a list of (task_id, payload), to the outbox and marks
+    their tasks as notified at `notified_at` in the same transaction, so each is queued exactly once.
+    """
+    if not notifications:
+        return
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.executemany(
+        "INSERT INTO notification_outbox (guild_id, channel_id, payload) VALUES (?, ?, ?)",
+        [(str(guild_id), str(channel_id), payload) for _, payload in notifications]
+    )
+    cursor.executemany(
+        "UPDATE case_tasks SET notified_at = ? WHERE id = ?",
+        [(notified_at, task_id) for task_id, _ in notifications]
+    )
+    connection.commit()
+    connection.close()
+
+def get_pending_notifications(limit):
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.row_factory = models.row_factory(models.OutboxEntry)
+    cursor.execute(
+        "SELECT id, guild_id, channel_id, payload FROM notification_outbox WHERE status = 'pending' ORDER BY id LIMIT ?",
+        (limit,)
+    )
+    entries = cursor.fetchall()
+    connection.close()
+    return entries
+
+def mark_notifications(results):
+    """Records the outcome of sent notifications, a list of (entry_id, "sent" or "failed")."""
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.executemany(
+        "UPDATE notification_outbox SET status = ?, sent_at = CURRENT_TIMESTAMP WHERE id = ?",
+        [(status, entry_id) for entry_id, status in results]
+    )
+    connection.commit()
+    connection.close()
+
+def prune_notifications(days):
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.execute(
+        "DELETE FROM notification_outbox WHERE status != 'pending' AND sent_at < datetime('now', ?)",
+        (f"-{days} days",)
+    )
+    pruned = cursor.rowcount
+    connection.commit()
+    connection.close()
+    return pruned
+
+#------ IDEMPOTENCY KEYS
+
+def claim_idempotency_keys(keys, ttl_seconds):
+    """
+    Returns (status, result) of an unexpired entry for any of `keys`, or None after
+    recording them all as pending. Checking and claiming happen in one write
+    transaction, so only one submission can claim the keys.
+    """
+    placeholders = ", ".join("?" * len(keys))
+    connection = get_connection()
+    connection.isolation_level = None  # transaction is handled explicitly below
+    cursor = connection.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        cursor.execute(
+            f"""
+            SELECT status, result FROM idempotency_keys
+            WHERE key IN ({placeholders}) AND created_at > datetime('now', ?)
+            ORDER BY status = 'done' DESC LIMIT 1
+            """,
+            (*keys, f"-{int(ttl_seconds)} seconds")
+        )
+        existing = cursor.fetchone()
+        if not existing:
+            cursor.executemany(
+                "INSERT OR REPLACE INTO idempotency_keys (key, status) VALUES (?, 'pending')",
+                [(key,) for key in keys]
+            )
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+    finally:
+        connection.close()
+    return existing
+
+def complete_idempotency_keys(keys, result):
+    placeholders = ", ".join("?" * len(keys))
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.execute(f"UPDATE idempotency_keys SET status = 'done', result = ? WHERE key IN ({placeholders})", (result, *keys))
+    connection.commit()
+    connection.close()
+
+def release_idempotency_keys(keys):
+    """Forgets keys of a submission that failed, so it can be tried again."""
+    placeholders = ", ".join("?" * len(keys))
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.execute(f"DELETE FROM idempotency_keys WHERE key IN ({placeholders})", keys)
+    connection.commit()
+    connection.close()
+
+def prune_idempotency_keys(ttl_seconds):
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.execute("DELETE FROM idempotency_keys WHERE created_at < datetime('now', ?)", (f"-{int(ttl_seconds)} seconds",))
+    pruned = cursor.rowcount
+    connection.commit()
+    connection.close()
+    return pruned
+
+#------ THREAD MESSAGES
+
+def get_tracked_threads():
+    """Threads of all cases and contacts, the ones synced longest ago (or never) first."""
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.row_factory = models.row_factory(models.ThreadCursor)
+    cursor.execute(
+        """
+        SELECT t.thread_id, t.guild_id, tc.last_message_id
+        FROM (
+            SELECT channel_id AS thread_id, guild_id FROM cases WHERE channel_id IS NOT NULL
+            UNION
+            SELECT channel_id, guild_id FROM contacts WHERE channel_id IS NOT NULL
+        ) t
+        LEFT JOIN thread_cursors tc ON tc.thread_id = t.thread_id
+        ORDER BY tc.synced_at IS NOT NULL, tc.synced_at
+        """
+    )
+    threads = cursor.fetchall()
+    connection.close()
+    return threads
+
+def get_thread_cursor(thread_id):
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.execute("SELECT last_message_id FROM thread_cursors WHERE thread_id = ?", (str(thread_id),))
+    row = cursor.fetchone()
+    connection.close()
+    return row[0] if row else None
+
+def save_thread_messages(messages, thread_id=None, guild_id=None, last_message_id=None):
+    """
+    Stores (or updates, for edits) `messages`, rows in ThreadMessage field order.
+    With `thread_id`, also moves that thread's cursor to `last_message_id` in the same transaction.
+    """
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.executemany(
+        f"""
+        INSERT INTO thread_messages ({THREAD_MESSAGE_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            author_name = excluded.author_name, content = excluded.content,
+            attachments = excluded.attachments, edited_at = excluded.edited_at
+        """,
+        messages
+    )
+    if thread_id is not None:
+        cursor.execute(
+            """
+            INSERT INTO thread_cursors (thread_id, guild_id, last_message_id, synced_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(thread_id) DO UPDATE SET
+                last_message_id = COALESCE(excluded.last_message_id, last_message_id), synced_at = CURRENT_TIMESTAMP
+            """,
+            (str(thread_id), str(guild_id) if guild_id else None, last_message_id)
+        )
+    connection.commit()
+    connection.close()
+
+def delete_thread_message(message_id):
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.execute("DELETE FROM thread_messages WHERE id = ?", (message_id,))
+    connection.commit()
+    connection.close()
+
+def iter_thread_messages(thread_id, batch_size=500):
+    """All stored messages of a thread oldest first, read in id-keyed batches so memory stays bounded."""
+    after_id = 0
+    while True:
+        connection = get_connection()
+        cursor = connection.cursor()
+        cursor.row_factory = models.row_factory(models.ThreadMessage)
+        cursor.execute(
+            f"SELECT {THREAD_MESSAGE_COLUMNS} FROM thread_messages WHERE thread_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (str(thread_id), after_id, batch_size)
+        )
+        messages = cursor.fetchall()
+        connection.close()
+        if not messages:
+            return
+        yield from messages
+        after_id = messages[-1].id
+
+def _forget_thread(cursor, thread_id):
+    if thread_id:
+        cursor.execute("DELETE FROM thread_messages WHERE thread_id = ?", (thread_id,))
+        cursor.execute("DELETE FROM thread_cursors WHERE thread_id = ?", (thread_id,))
+
+#------ CASE DOCUMENTS
+
+def add_case_document(case_id, guild_id, sha256, filename, content_type, size, uploaded_by, channel_id=None, message_id=None):
+    """Returns the new document's id, or None if the case already has a file with this content."""
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.execute(
+        """
+        INSERT INTO case_documents
+            (case_id, guild_id, sha256, filename, content_type, size, uploaded_by, channel_id, message_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(case_id, sha256) DO NOTHING
+        RETURNING id
+        """,
+        (case_id, str(guild_id) if guild_id else None, sha256, filename, content_type, size,
+         str(uploaded_by) if uploaded_by else None, channel_id, message_id)
+    )
+    row = cursor.fetchone()
+    connection.commit()
+    connection.close()
+    return row[0] if row else None
+
+def get_case_documents(case_id, guild_id, limit=200):
+    """Newest documents of a case first, with (count, total bytes) over all of them. Reads metadata only."""
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.execute(
+        "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM case_documents WHERE case_id = ? AND guild_id = ?",
+        (case_id, str(guild_id))
+    )
+    totals = cursor.fetchone()
+    cursor.row_factory = models.row_factory(models.CaseDocument)
+    cursor.execute(
+        f"SELECT {DOCUMENT_COLUMNS} FROM case_documents WHERE case_id = ? AND guild_id = ? ORDER BY id DESC LIMIT ?",
+        (case_id, str(guild_id), limit)
+    )
+    documents = cursor.fetchall()
+    connection.close()
+    return documents, totals
+
+def get_case_document(document_id, guild_id):
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.row_factory = models.row_factory(models.CaseDocument)
+    cursor.execute(f"SELECT {DOCUMENT_COLUMNS} FROM case_documents WHERE id = ? AND guild_id = ?", (document_id, str(guild_id)))
+    document = cursor.fetchone()
+    connection.close()
+    return document
+
+def get_document_hashes():
+    """Every stored file some case still refers to."""
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.execute("SELECT DISTINCT sha256 FROM case_documents")
+    hashes = {row[0] for row in cursor.fetchall()}
+    connection.close()
+    return hashes
+
+#------ TASK STATISTICS
+
+# Deadlines are stored as UTC "YYYY-MM-DD HH:MM", so they compare against this as strings
+SQL_NOW = "strftime('%Y-%m-%d %H:%M', 'now')"
+
+def case_stats_upsert_sql(case_filter):
+    """
+    Recomputes the case_task_stats rows of the cases matching `case_filter` (an
+    expression on `c`, the cases table). Cases that no longer exist get no row,
+    which matters when tasks are deleted by a cascading case delete.
+    Used by the triggers on case_tasks as well as by refresh_overdue_stats().
+    """
+    return f"""
+        INSERT OR REPLACE INTO case_task_stats
+            (case_id, open_tasks, done_tasks, overdue_tasks, next_deadline, updated_at)
+        SELECT c.id,
+            COUNT(t.id) - COALESCE(SUM(t.done), 0),
+            COALESCE(SUM(t.done), 0),
+            COALESCE(SUM(NOT t.done AND t.deadline < {SQL_NOW}), 0),
+            MIN(CASE WHEN NOT t.done AND t.deadline >= {SQL_NOW} THEN t.deadline END),
+            {SQL_NOW}
+        FROM cases c
+        LEFT JOIN case_tasks t ON t.case_id = c.id
+        WHERE {case_filter}
+        GROUP BY c.id
+        """
+
+def refresh_overdue_stats():
+    """
+    Moves tasks whose deadline has passed into the overdue count. Only cases whose
+    next deadline is in the past are recomputed. Returns the number of cases updated.
+    """
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.execute(case_stats_upsert_sql(
+        f"c.id IN (SELECT case_id FROM case_task_stats WHERE next_deadline < {SQL_NOW})"
+    ))
+    updated = cursor.rowcount
+    connection.commit()
+    connection.close()
+    return updated
+
+def get_case_stats(guild_id, status=None):
+    """Task counts for every case of a guild (optionally only those with `status`), without reading case_tasks."""
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.row_factory = models.row_factory(models.CaseStats)
+    cursor.execute(
+        f"""
+        SELECT c.id, c.name, c.status,
+            COALESCE(s.open_tasks, 0), COALESCE(s.done_tasks, 0), COALESCE(s.overdue_tasks, 0), s.next_deadline
+        FROM cases c
+        LEFT JOIN case_task_stats s ON s.case_id = c.id
+        WHERE c.guild_id = ? {"AND c.status = ?" if status else ""}
+        """,
+        (str(guild_id), status) if status else (str(guild_id),)
+    )
+    stats = cursor.fetchall()
+    connection.close()
+    return stats
+
+def get_contact_task_stats(contact_id):
+    """Summed (open, done, overdue) task counts over the cases a contact is linked to."""
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.execute(
+        """
+        SELECT COALESCE(SUM(s.open_tasks), 0), COALESCE(SUM(s.done_tasks), 0), COALESCE(SUM(s.overdue_tasks), 0)
+        FROM case_contacts cc
+        INNER JOIN case_task_stats s ON s.case_id = cc.case_id
+        WHERE cc.contact_id = ?
+        """,
+        (contact_id,)
+    )
+    stats = cursor.fetchone()
+    connection.close()
+    return stats
+
+#------ DIGEST
+
+def set_digest_enabled(discord_id, enabled):
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.execute(
+        """
+        INSERT INTO user_preferences (discord_id, digest_enabled) VALUES (?, ?)
+        ON CONFLICT(discord_id) DO UPDATE SET digest_enabled = excluded.digest_enabled
+        """,
+        (str(discord_id), int(enabled))
+    )
+    connection.commit()
+    connection.close()
+
+def get_digest_user_ids():
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.execute("SELECT discord_id FROM user_preferences WHERE digest_enabled = 1")
+    user_ids = {row[0] for row in cursor.fetchall()}
+    connection.close()
+    return user_ids
+
+def get_digests(now, due_soon, today=None, discord_id=None):
+    """
+    Every opted-in user's open tasks in one grouped pass, one row per user.
+    - now, due_soon: UTC storage strings bounding "overdue" and "due soon"
+    - today: skip users whose digest was already sent on this date
+    - discord_id: only this user, whether opted in or not (used for previews)
+    A task linked to a user through several contacts is counted once.
+    """
+    user_filter = "p.discord_id = :discord_id" if discord_id else "p.digest_enabled = 1 AND p.digest_sent_on IS NOT :today"
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.row_factory = models.row_factory(models.Digest)
+    cursor.execute(
+        f"""
+        WITH user_tasks AS (
+            SELECT DISTINCT c.discord_id, t.id, t.case_id, ca.name AS case_name, t.task, t.deadline
+            FROM user_preferences p
+            INNER JOIN contacts c ON c.discord_id = p.discord_id
+            INNER JOIN case_contacts cc ON cc.contact_id = c.id
+            INNER JOIN cases ca ON ca.id = cc.case_id
+            INNER JOIN case_tasks t ON t.case_id = cc.case_id
+            WHERE {user_filter} AND ca.status = 'open' AND NOT t.done
+        )
+        SELECT discord_id,
+            COUNT(*),
+            COALESCE(SUM(deadline >= :now AND deadline < :due_soon), 0),
+            COALESCE(SUM(deadline < :now), 0),
+            json_group_array(json_array(id, case_id, case_name, task, deadline)) FILTER (WHERE deadline < :due_soon)
+        FROM user_tasks
+        GROUP BY discord_id
+        """,
+        {"now": now, "due_soon": due_soon, "today": today, "discord_id": str(discord_id) if discord_id else None}
+    )
+    digests = cursor.fetchall()
+    connection.close()
+    return digests
+
+def mark_digests_sent(discord_ids, today):
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.executemany(
+        "UPDATE user_preferences SET digest_sent_on = ? WHERE discord_id = ?",
+        [(today, discord_id) for discord_id in discord_ids]
+    )
+    connection.commit()
+    connection.close()
+
+#------ AUDIT LOG
+
+def insert_case_events(events):
+    """Writes a batch of (case_id, contact_id, actor_id, action, description, diff, created_at, guild_id) rows in one transaction."""
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.executemany(
+        """
+        INSERT INTO case_events (case_id, contact_id, actor_id, action, description, diff, created_at, guild_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        events
+    )
+    connection.commit()
+    connection.close()
+
+def iter_case_events(guild_id, case_id, batch_size=500):
+    """All events of a case oldest first, read in id-keyed batches so memory stays bounded."""
+    after_id = 0
+    while True:
+        connection = get_connection()
+        cursor = connection.cursor()
+        cursor.row_factory = models.row_factory(models.CaseEvent)
+        cursor.execute(
+            f"""
+            SELECT {EVENT_COLUMNS} FROM case_events
+            WHERE case_id = ? AND id > ? AND guild_id = ?
+            ORDER BY id
+            LIMIT ?
+            """,
+            (case_id, after_id, str(guild_id), batch_size)
+        )
+        events = cursor.fetchall()
+        connection.close()
+        if not events:
+            return
+        yield from events
+        after_id = events[-1].id
+
+def get_case_events(guild_id, case_id, before_id=None, limit=10):
+    """
+    Newest events of a case first. Pages continue from the last id seen (`before_id`)
+    instead of an OFFSET, so every page is a single index range scan.
+    """
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.row_factory = models.row_factory(models.CaseEvent)
+    cursor.execute(
+        f"""
+        SELECT {EVENT_COLUMNS} FROM case_events
+        WHERE case_id = ? AND id < ? AND guild_id = ?
+        ORDER BY id DESC
+        LIMIT ?
+        """,
+        (case_id, before_id if before_id is not None else 2**63 - 1, str(guild_id), limit)
+    )
+    events = cursor.fetchall()
+    connection.close()
+    return events
+
+#------ CASE TEMPLATES
+
+def save_case_template(guild_id, name, tasks):
+    """Creates or replaces a guild's template `name` with `tasks`, a list of (task, deadline_offset)."""
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.execute(
+        """
+        INSERT INTO case_templates (guild_id, name) VALUES (?, ?)
+        ON CONFLICT(guild_id, name) DO UPDATE SET created_at = CURRENT_TIMESTAMP
+        RETURNING id
+        """,
+        (str(guild_id), name)
+    )
+    template_id = cursor.fetchone()[0]
+    cursor.execute("DELETE FROM case_template_tasks WHERE template_id = ?", (template_id,))
+    cursor.executemany(
+        "INSERT INTO case_template_tasks (template_id, position, task, deadline_offset) VALUES (?, ?, ?, ?)",
+        [(template_id, position, task, offset) for position, (task, offset) in enumerate(tasks)]
+    )
+    connection.commit()
+    connection.close()
+
+def get_case_templates(guild_id):
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.row_factory = models.row_factory(models.CaseTemplate)
+    cursor.execute(
+        """
+        SELECT t.id, t.name, COUNT(tt.id) FROM case_templates t
+        LEFT JOIN case_template_tasks tt ON tt.template_id = t.id
+        WHERE t.guild_id = ?
+        GROUP BY t.id
+        ORDER BY t.name
+        """,
+        (str(guild_id),)
+    )
+    templates = cursor.fetchall()
+    connection.close()
+    return templates
+
+def get_template_tasks(guild_id, name):
+    """Tasks of a guild's template in order, or None if there is no such template."""
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.execute("SELECT id FROM case_templates WHERE guild_id = ? AND name = ?", (str(guild_id), name))
+    row = cursor.fetchone()
+    if not row:
+        connection.close()
+        return None
+    cursor.row_factory = models.row_factory(models.TemplateTask)
+    cursor.execute(
+        "SELECT task, deadline_offset FROM case_template_tasks WHERE template_id = ? ORDER BY position",
+        (row[0],)
+    )
+    tasks = cursor.fetchall()
+    connection.close()
+    return tasks
+
+def delete_case_template(guild_id, name):
+    """Returns whether the template existed; its tasks go with it through ON DELETE CASCADE."""
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.execute("DELETE FROM case_templates WHERE guild_id = ? AND name = ?", (str(guild_id), name))
+    deleted = cursor.rowcount > 0
+    connection.commit()
+    connection.close()
+    return deleted
+
 #------
 
-def migrate_database():
+def get_user_timezone(discord_id):
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.execute("SELECT timezone FROM user_preferences WHERE discord_id = ?", (str(discord_id),))
+    row = cursor.fetchone()
+    connection.close()
+    return row[0] if row else None
+
+def set_user_timezone(discord_id, timezone):
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.execute(
+        """
+        INSERT INTO user_preferences (discord_id, timezone) VALUES (?, ?)
+        ON CONFLICT(discord_id) DO UPDATE SET timezone = excluded.timezone
+        """,
+        (str(discord_id), timezone)
+    )
+    connection.commit()
+    connection.close()
+
+#------ ARCHIVE
+
+ARCHIVED_TABLES = {"cases": "id", "case_contacts": "case_id", "case_tasks": "case_id"}
+
+def get_archive_connection():
+    """
+    Connection to the live database with the archive database attached as `archive`.
+    Archive tables mirror the live schema minus foreign keys, since contacts stay live.
+    """
     connection = get_connection()
+    connection.execute("ATTACH DATABASE ? AS archive", (archive_location(),))
     cursor = connection.cursor()
 
-    # Define expected schema
-    expected_schema = settings.DATABASE_SCHEMA
+    for table in ARCHIVED_TABLES:
+        schema = {col: definition.split(" REFERENCES")[0] for col, definition in settings.DATABASE_SCHEMA[table].items()}
+        cursor.execute(build_create_table_sql(f"archive.{table}", schema))
 
-    for table, columns in expected_schema.items():
-        # Get existing columns in DB
-        cursor.execute(f"PRAGMA table_info({table})")
+        # Keep up with columns added to the live table since the archive was created
+        cursor.execute(f"PRAGMA archive.table_info({table})")
         existing_cols = {col[1] for col in cursor.fetchall()}
-
-        # Add missing columns
-        for col_name, col_def in columns.items():
+        for col_name, col_def in schema.items():
             if col_name not in existing_cols:
-                print(f"[MIGRATION] Adding missing column '{col_name}' to '{table}'")
-                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {col_name} {col_def}")
+                cursor.execute(f"ALTER TABLE archive.{table} ADD COLUMN {col_name} {col_def}")
 
-        # Warn about deprecated columns
-        for col_name in existing_cols:
-            if col_name not in columns:
-                print(f"[WARNING] Column '{col_name}' exists in '{table}' but is not in expected schema (deprecated?). Deleting.")
+    # Bring archives written by older versions in line with the live tables
+    cursor.execute("PRAGMA archive.user_version")
+    archive_version = cursor.fetchone()[0]
+    if archive_version < 1:
+        # Deadlines stored in UTC (see migration 5)
+        import migrations
+        migrations.convert_deadlines_to_utc(cursor, "archive.case_tasks")
+        cursor.execute("PRAGMA archive.user_version = 1")
+    if archive_version < 2 and settings.DEFAULT_GUILD_ID:
+        # Cases archived before multi-guild support belong to the default guild (see migration 9)
+        for table in ("cases", "case_tasks"):
+            cursor.execute(f"UPDATE archive.{table} SET guild_id = ? WHERE guild_id IS NULL", (settings.DEFAULT_GUILD_ID,))
+        cursor.execute("PRAGMA archive.user_version = 2")
 
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS archive.idx_cases_id ON cases (id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS archive.idx_case_contacts_case ON case_contacts (case_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS archive.idx_case_tasks_case ON case_tasks (case_id)")
     connection.commit()
-    connection.close()
\ No newline at end of file
+    return connection
+
+def archive_closed_cases(guild_id, closed_before=None):
+    """
+    Moves a guild's closed cases with their links and tasks into the archive database,
+    settings.ARCHIVE_BATCH_SIZE cases per transaction. Returns how many were moved.
+    - closed_before: optional "YYYY-MM-DD HH:MM:SS" (UTC) cutoff on closed_at.
+    """
+    # Cases from today stay live: count_cases_today only sees live cases,
+    # so archiving them could hand out their ID a second time
+    today = datetime.now().strftime("%d%m%Y")
+
+    connection = get_archive_connection()
+    cursor = connection.cursor()
+
+    query = "SELECT id FROM main.cases WHERE guild_id = ? AND status = 'closed' AND id NOT LIKE ?"
+    params = [str(guild_id), f"%-{today}"]
+    if closed_before:
+        query += " AND closed_at <= ?"
+        params.append(closed_before)
+    query += " LIMIT ?"
+    params.append(settings.ARCHIVE_BATCH_SIZE)
+
+    archived = 0
+    try:
+        while True:
+            cursor.execute(query, params)
+            case_ids = [row[0] for row in cursor.fetchall()]
+            if not case_ids:
+                break
+            placeholders = ", ".join("?" for _ in case_ids)
+
+            for table, key in ARCHIVED_TABLES.items():
+                columns = ", ".join(settings.DATABASE_SCHEMA[table])
+                cursor.execute(
+                    f"INSERT INTO archive.{table} ({columns}) SELECT {columns} FROM main.{table} WHERE {key} IN ({placeholders})",
+                    case_ids
+                )
+            # Links and tasks follow through ON DELETE CASCADE
+            cursor.execute(f"DELETE FROM main.cases WHERE id IN ({placeholders})", case_ids)
+            connection.commit()
+            archived += len(case_ids)
+    finally:
+        connection.close()
+    return archived
+
+def get_cases_for_export(guild_id, status, limit, offset=0):
+    """
+    Returns ([(case_id, channel_id)], total) for one page of a guild's cases in ID order.
+    - status: open / closed (live cases), archived, or all (live and archived)
+    """
+    parts, params = [], []
+    if status != "archived":
+        parts.append(
+            "SELECT id, channel_id FROM main.cases WHERE guild_id = ?"
+            + (" AND COALESCE(status, 'open') = ?" if status in ("open", "closed") else "")
+        )
+        params += [str(guild_id), status] if status in ("open", "closed") else [str(guild_id)]
+    if status in ("archived", "all") and has_archive():
+        parts.append("SELECT id, channel_id FROM archive.cases WHERE guild_id = ?")
+        params.append(str(guild_id))
+    if not parts:
+        return [], 0
+
+    connection = get_archive_connection() if len(parts) > 1 or status == "archived" else get_connection()
+    cursor = connection.cursor()
+    selected = " UNION ALL ".join(parts)
+    cursor.execute(f"SELECT COUNT(*) FROM ({selected})", params)
+    total = cursor.fetchone()[0]
+    cursor.execute(f"SELECT id, channel_id FROM ({selected}) ORDER BY id LIMIT ? OFFSET ?", (*params, limit, offset))
+    cases = cursor.fetchall()
+    connection.close()
+    return cases, total
+
+def get_archived_case_details(case_id, guild_id):
+    """Returns (case, contacts, tasks) for a guild's archived case, shaped like the live getters, or None."""
+    if not has_archive():
+        return None
+
+    connection = get_archive_connection()
+    cursor = connection.cursor()
+    cursor.row_factory = models.row_factory(models.Case)
+    cursor.execute(f"SELECT {CASE_COLUMNS} FROM archive.cases WHERE id = ? AND guild_id = ?", (case_id, str(guild_id)))
+    case = cursor.fetchone()
+    if not case:
+        connection.close()
+        return None
+
+    cursor.row_factory = models.row_factory(models.CaseLink)
+    cursor.execute(
+        """
+        SELECT ca.id, ca.name, c.id, c.name, cc.role, c.discord_id
+        FROM archive.case_contacts cc
+        INNER JOIN main.contacts c ON c.id = cc.contact_id
+        INNER JOIN archive.cases ca ON ca.id = cc.case_id
+        WHERE cc.case_id = ?
+        """,
+        (case_id,)
+    )
+    contacts = cursor.fetchall()
+    cursor.row_factory = models.row_factory(models.Task)
+    cursor.execute(f"SELECT {TASK_COLUMNS} FROM archive.case_tasks WHERE case_id = ?", (case_id,))
+    tasks = cursor.fetchall()
+    connection.close()
+    return case, contacts, tasks
+
+#------
+
+def get_freelist_count():
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.execute("PRAGMA freelist_count")
+    count = cursor.fetchone()[0]
+    connection.close()
+    return count
+
+def incremental_vacuum(pages):
+    """Releases up to `pages` free pages and returns how many free pages remain."""
+    connection = get_connection()
+    cursor = connection.cursor()
+    cursor.execute(f"PRAGMA incremental_vacuum({int(pages)})")
+    cursor.fetchall()  # the pragma only does its work while being stepped
+    cursor.execute("PRAGMA freelist_count")
+    remaining = cursor.fetchone()[0]
+    connection.close()
+    return remaining
+
+def analyze():
+    connection = get_connection()
+    cursor = connection.cursor()
+    # Bound the work ANALYZE does per index so it stays short on large tables
+    cursor.execute(f"PRAGMA analysis_limit = {int(settings.ANALYSIS_LIMIT)}")
+    cursor.execute("ANALYZE")
+    connection.commit()
+    connection.close()
+
+def backup_database(destination_path, archive=False):
+    """
+    Copies the live database (or, with `archive`, the archive database) to `destination_path`
+    with the online backup API. Pages are copied in small steps with a pause after each,
+    so the bot's own connections can keep writing while a backup runs.
+    The copy is checked with PRAGMA integrity_check before it is kept.
+    """
+    source = get_archive_connection() if archive else get_connection()
+    target = sqlite3.connect(destination_path)
+    try:
+        source.backup(
+            target,
+            pages=settings.BACKUP_PAGES_PER_STEP,
+            progress=lambda status, remaining, total: time.sleep(settings.BACKUP_STEP_DELAY),
+            name="archive" if archive else "main"
+        )
+        result = target.execute("PRAGMA integrity_check").fetchone()[0]
+    finally:
+        target.close()
+        source.close()
+
+    if result != "ok":
+        os.remove(destination_path)
+        raise sqlite3.DatabaseError(f"Backup failed integrity check: {result}")
+
+def get_schema_version(cursor):
+    try:
+        cursor.execute("SELECT version FROM schema_version")
+    except sqlite3.OperationalError:
+        return 0  # database predates versioned migrations
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+def migrate_database():
+    """
+    Applies every pending migration from migrations.py in version order.
+    Each migration runs in its own transaction together with the version bump,
+    so a failing migration leaves the database at the previous version.
+    """
+    import migrations  # migrations.py imports this module for its helpers
+
+    connection = get_connection()
+    connection.isolation_level = None  # transactions are handled explicitly below
+    cursor = connection.cursor()
+
+    # The journal mode is stored in the database file, so setting it at startup is enough
+    cursor.execute(f"PRAGMA journal_mode = {settings.DATABASE_JOURNAL_MODE}")
+
+    current_version = get_schema_version(cursor)
+    if current_version >= migrations.LATEST_VERSION:
+        connection.close()
+        return
+
+    # Table rebuilds need foreign keys off; this can't be changed inside a transaction
+    cursor.execute("PRAGMA foreign_keys = OFF")
+    cursor.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+
+    try:
+        for version, description, migrate, transactional in migrations.MIGRATIONS:
+            if version <= current_version:
+                continue
+            print(f"[MIGRATION] {version:03d}: {description}")
+
+            if not transactional:
+                migrate(cursor)  # e.g. VACUUM, which can't run inside a transaction
+
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                if transactional:
+                    migrate(cursor)
+                cursor.execute("PRAGMA foreign_key_check")
+                if cursor.fetchall():
+                    raise sqlite3.IntegrityError(f"Migration {version} left rows violating foreign keys")
+                cursor.execute("DELETE FROM schema_version")
+                cursor.execute("INSERT INTO schema_version (version) VALUES (?)", (version,))
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+    finally:
+        connection.close()
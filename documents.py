@@ -0,0 +1,124 @@
+"""
+Case documents, stored on disk under their SHA-256 hash.
+
+Attachments posted in a case thread or uploaded with /upload_document are downloaded
+in chunks of settings.DOCUMENT_CHUNK_SIZE and hashed while they stream to a temporary
+file, which is then moved to DOCUMENTS_DIR/<first 2 hex digits>/<sha256>. A file that
+is already stored, for this case or any other, is not kept a second time. The
+case_documents table records which case has which file under which name, so
+listings read only metadata; files no case refers to are removed by prune().
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+import aiohttp
+import database
+import metrics
+import settings
+
+TEMP_DIR = os.path.join(settings.DOCUMENTS_DIR, "tmp")
+
+_session = None
+
+
+class DocumentTooLarge(Exception):
+    pass
+
+
+def path_for(sha256):
+    return os.path.join(settings.DOCUMENTS_DIR, sha256[:2], sha256)
+
+
+def format_size(size):
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def _get_session():
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=settings.DOCUMENT_DOWNLOAD_TIMEOUT))
+    return _session
+
+
+async def download(url):
+    """Streams `url` into the store; returns (sha256, size). Never holds more than one chunk in memory."""
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=TEMP_DIR)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            async with _get_session().get(url) as response:
+                response.raise_for_status()
+                async for chunk in response.content.iter_chunked(settings.DOCUMENT_CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > settings.DOCUMENT_MAX_BYTES:
+                        raise DocumentTooLarge(f"larger than {format_size(settings.DOCUMENT_MAX_BYTES)}")
+                    digest.update(chunk)
+                    out.write(chunk)
+
+        sha256 = digest.hexdigest()
+        path = path_for(sha256)
+        if os.path.exists(path):
+            os.utime(path)  # in use again, so prune() leaves it alone
+            metrics.increment("documents_deduplicated")
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)
+            temp_path = None
+        return sha256, size
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+
+
+async def store_attachment(attachment, case_id, guild_id, uploaded_by, channel_id=None, message_id=None):
+    """Stores a Discord attachment for a case; returns the document ID, or None if the case already had the file."""
+    if attachment.size > settings.DOCUMENT_MAX_BYTES:
+        raise DocumentTooLarge(f"larger than {format_size(settings.DOCUMENT_MAX_BYTES)}")
+    sha256, size = await download(attachment.url)
+    document_id = await asyncio.to_thread(
+        database.add_case_document, case_id, guild_id, sha256, attachment.filename, attachment.content_type, size,
+        uploaded_by, channel_id, message_id
+    )
+    metrics.increment("documents_stored" if document_id else "documents_already_on_case")
+    return document_id
+
+
+async def on_message(message):
+    """Keeps the attachments posted in case threads."""
+    if not message.guild or not message.attachments:
+        return
+    case = await asyncio.to_thread(database.get_case_by_thread, message.channel.id, message.guild.id)
+    if not case:
+        return
+    for attachment in message.attachments:
+        try:
+            await store_attachment(
+                attachment, case.id, message.guild.id, message.author.id, str(message.channel.id), str(message.id)
+            )
+        except (DocumentTooLarge, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"[DOCUMENTS] Not storing {attachment.filename} from case {case.id}: {e}")
+
+
+def prune():
+    """Removes files no case refers to and leftovers of failed downloads; returns how many."""
+    if not os.path.isdir(settings.DOCUMENTS_DIR):
+        return 0
+    in_use = database.get_document_hashes()
+    cutoff = time.time() - settings.DOCUMENT_ORPHAN_HOURS * 3600
+    removed = 0
+    for root, _, files in os.walk(settings.DOCUMENTS_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            # Recent files may belong to a download whose row isn't written yet
+            if (root == TEMP_DIR or name not in in_use) and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+    return removed
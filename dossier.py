@@ -0,0 +1,158 @@
+"""
+Case dossiers as Markdown or HTML files, for court filings and client handover.
+
+write_case() writes one case with its contacts, tasks, audit log and forum thread
+to a text stream section by section. Audit events and the thread messages copied
+by thread_sync.py are read in batches, so memory use doesn't grow with the size
+of the case. Meant to run on a worker thread.
+"""
+import html
+import json
+import settings
+import database
+import temporal
+
+EXTENSIONS = {"markdown": "md", "html": "html"}
+
+
+class MarkdownWriter:
+    def __init__(self, out):
+        self.out = out
+
+    def begin(self, title):
+        self.out.write(f"# {title}\n")
+
+    def heading(self, text):
+        self.out.write(f"\n## {text}\n\n")
+
+    def fields(self, pairs):
+        for name, value in pairs:
+            self.out.write(f"- **{name}:** {value or '—'}\n")
+
+    def text(self, value):
+        self.out.write(f"{value}\n")
+
+    def table(self, headers, rows):
+        self.out.write("| " + " | ".join(headers) + " |\n")
+        self.out.write("|" + "---|" * len(headers) + "\n")
+        for row in rows:
+            cells = (str(cell if cell is not None else "").replace("|", "\\|").replace("\n", "<br>") for cell in row)
+            self.out.write("| " + " | ".join(cells) + " |\n")
+
+    def entry(self, meta, body):
+        self.out.write(f"**{meta}**\n")
+        for line in (body or "").splitlines():
+            self.out.write(f"> {line}\n")
+        self.out.write("\n")
+
+    def end(self):
+        pass
+
+
+class HtmlWriter:
+    STYLE = (
+        "body{font-family:sans-serif;max-width:60em;margin:2em auto;line-height:1.4}"
+        "table{border-collapse:collapse}td,th{border:1px solid #ccc;padding:.3em .6em;text-align:left;vertical-align:top}"
+        ".entry{margin:.8em 0}.meta{font-weight:bold}.body{white-space:pre-wrap;margin:.2em 0 0 1em}"
+    )
+
+    def __init__(self, out):
+        self.out = out
+
+    def begin(self, title):
+        title = html.escape(title)
+        self.out.write(
+            f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{title}</title>"
+            f"<style>{self.STYLE}</style></head><body>\n<h1>{title}</h1>\n"
+        )
+
+    def heading(self, text):
+        self.out.write(f"<h2>{html.escape(text)}</h2>\n")
+
+    def fields(self, pairs):
+        self.out.write("<ul>\n")
+        for name, value in pairs:
+            self.out.write(f"<li><b>{html.escape(name)}:</b> {html.escape(str(value or '—'))}</li>\n")
+        self.out.write("</ul>\n")
+
+    def text(self, value):
+        self.out.write(f"<p>{html.escape(value)}</p>\n")
+
+    def table(self, headers, rows):
+        self.out.write("<table><tr>" + "".join(f"<th>{html.escape(h)}</th>" for h in headers) + "</tr>\n")
+        for row in rows:
+            cells = "".join(f"<td>{html.escape(str(cell if cell is not None else ''))}</td>" for cell in row)
+            self.out.write(f"<tr>{cells}</tr>\n")
+        self.out.write("</table>\n")
+
+    def entry(self, meta, body):
+        self.out.write(
+            f"<div class=\"entry\"><div class=\"meta\">{html.escape(meta)}</div>"
+            f"<div class=\"body\">{html.escape(body or '')}</div></div>\n"
+        )
+
+    def end(self):
+        self.out.write("</body></html>\n")
+
+
+WRITERS = {"markdown": MarkdownWriter, "html": HtmlWriter}
+
+
+def load_case(guild_id, case_id):
+    """(case, contacts, tasks, archived) from the live database or the archive, or None."""
+    case = database.get_case_by_id(case_id, guild_id)
+    if case:
+        return case, database.get_contacts_for_case(case_id), database.get_tasks_for_case(case_id), False
+    archived = database.get_archived_case_details(case_id, guild_id)
+    return (*archived, True) if archived else None
+
+
+def format_local(value, tz_name):
+    dt = temporal.parse_stored(value)
+    return dt.astimezone(temporal.get_timezone(tz_name)).strftime("%d.%m.%Y %H:%M %Z") if dt else value
+
+
+def format_event_body(event):
+    if event.diff:
+        return "\n".join(f"{field}: {old} → {new}" for field, (old, new) in json.loads(event.diff).items())
+    return event.description or ""
+
+
+def write_case(out, fmt, guild_id, loaded, tz_name=None):
+    """Writes the dossier of `loaded` (from load_case) to the text stream `out`."""
+    case, contacts, tasks, archived = loaded
+    writer = WRITERS[fmt](out)
+    writer.begin(f"Case {case.id}: {case.name}")
+    writer.fields([
+        ("Status", f"{case.status or 'open'}{' (archived)' if archived else ''}"),
+        ("Created", format_local(case.created_at, tz_name)),
+        ("Exported", temporal.now().astimezone(temporal.get_timezone(tz_name)).strftime("%d.%m.%Y %H:%M %Z")),
+    ])
+
+    writer.heading("Summary")
+    writer.text(case.summary or "—")
+    writer.heading("Notes")
+    writer.text(case.notes or "—")
+
+    writer.heading(f"Contacts ({len(contacts)})")
+    writer.table(["ID", "Name", "Role"], ((c.contact_id, c.contact_name, c.role) for c in contacts))
+
+    writer.heading(f"Tasks ({len(tasks)})")
+    writer.table(
+        ["ID", "Task", "Deadline", "Done"],
+        ((t.id, t.task, format_local(t.deadline, tz_name) if t.deadline else "", "yes" if t.done else "no") for t in tasks)
+    )
+
+    writer.heading("Audit Log")
+    for event in database.iter_case_events(guild_id, case.id, settings.EXPORT_BATCH_SIZE):
+        actor = f"user {event.actor_id}" if event.actor_id else "system"
+        writer.entry(f"{format_local(event.created_at, tz_name)} · {actor} · {event.action}", format_event_body(event))
+
+    writer.heading("Forum Thread")
+    if case.channel_id:
+        for message in database.iter_thread_messages(case.channel_id, settings.EXPORT_BATCH_SIZE):
+            edited = " (edited)" if message.edited_at else ""
+            body = "\n".join(filter(None, (message.content, message.attachments)))
+            writer.entry(f"{format_local(message.created_at, tz_name)} · {message.author_name}{edited}", body)
+
+    writer.end()
@@ -0,0 +1,128 @@
+"""
+Embeds that stay within Discord's size limits however large a case gets.
+
+EmbedComposer packs lines into fields of at most 1024 characters, continues a list
+in further fields and starts a new embed (page) when the 25-field or 6000-character
+budget of the current one is used up. The 6000 characters are a budget for a whole
+message, so each page is meant to be sent as its own message. Lines are rendered
+through lru_caches keyed by the row itself, so re-rendering a large case after one
+task changed only formats that task's line again.
+"""
+from functools import lru_cache
+import temporal
+
+# Discord's limits, counted in UTF-16 code units like Discord does
+TITLE_LIMIT = 256
+FIELD_NAME_LIMIT = 256
+FIELD_VALUE_LIMIT = 1024
+FIELDS_PER_EMBED = 25
+EMBED_TOTAL_LIMIT = 6000
+
+MAX_PAGES = 10  # messages one composed view may take up
+PAGE_RESERVE = 64  # room kept on each page for its page number and the "lines not shown" note
+
+
+def measure(text):
+    return len(text.encode("utf-16-le")) // 2 if text else 0
+
+
+def clip(text, limit):
+    """Shortens `text` to `limit` characters as Discord counts them, marking the cut with …"""
+    if measure(text) <= limit:
+        return text
+    text = text[:limit - 1]
+    while measure(text) > limit - 1:
+        text = text[:-1]
+    return text + "…"
+
+
+# ------------------ LINES ------------------
+@lru_cache(maxsize=8192)
+def task_line(task):
+    line = f"- *#{task.id}* [{'✅' if task.done else '❌'}] {task.task}"
+    if task.deadline:
+        line += f" (Due: {temporal.format_deadline(task.deadline)})"
+    return line
+
+
+@lru_cache(maxsize=8192)
+def case_contact_line(link):
+    return f"- *{link.role}* {link.contact_name} (ID {link.contact_id})"
+
+
+@lru_cache(maxsize=8192)
+def contact_case_line(link):
+    return f"- {link.case_name} (ID {link.case_id}) as **{link.role}**"
+
+
+# ------------------ COMPOSER ------------------
+class EmbedComposer:
+    """
+    Builds one or more embeds from `make_page(page_number)`, which returns an empty
+    embed with the title, description, colour and footer every page shares.
+    """
+
+    def __init__(self, make_page, max_pages=MAX_PAGES):
+        self.make_page = make_page
+        self.max_pages = max_pages
+        self.pages = []
+        self.hidden_lines = 0
+        self._new_page()
+
+    def _new_page(self):
+        if len(self.pages) == self.max_pages:
+            return False
+        page = self.make_page(len(self.pages) + 1)
+        self.pages.append(page)
+        self.used = sum(measure(text) for text in (page.title, page.description, page.footer.text, page.author.name))
+        self.used += PAGE_RESERVE
+        return True
+
+    def _fits(self, name, value):
+        page = self.pages[-1]
+        return len(page.fields) < FIELDS_PER_EMBED and self.used + measure(name) + measure(value) <= EMBED_TOTAL_LIMIT
+
+    def _place(self, name, value, inline):
+        """Adds a field to the current page, or to a new one; returns False if no page has room."""
+        if not self._fits(name, value) and not (self._new_page() and self._fits(name, value)):
+            return False
+        self.pages[-1].add_field(name=name, value=value, inline=inline)
+        self.used += measure(name) + measure(value)
+        return True
+
+    def add_field(self, name, value, inline=False):
+        name = clip(str(name), FIELD_NAME_LIMIT)
+        value = clip(str(value), FIELD_VALUE_LIMIT) if value not in (None, "") else "None"
+        if not self._place(name, value, inline):
+            self.hidden_lines += 1
+
+    def add_lines(self, name, lines, empty="None"):
+        """Adds `lines` under `name`, continuing in "name (cont.)" fields and pages as needed."""
+        if not lines:
+            self.add_field(name, empty)
+            return
+        chunk, chunk_size, field_name = [], 0, clip(name, FIELD_NAME_LIMIT)
+        for position, line in enumerate(lines):
+            line = clip(line, FIELD_VALUE_LIMIT)
+            size = measure(line) + (1 if chunk else 0)  # joined with newlines
+            if chunk and chunk_size + size > FIELD_VALUE_LIMIT:
+                if not self._place(field_name, "\n".join(chunk), False):
+                    self.hidden_lines += len(lines) - position + len(chunk)
+                    return
+                chunk, chunk_size, field_name = [], 0, clip(f"{name} (cont.)", FIELD_NAME_LIMIT)
+                size = measure(line)
+            chunk.append(line)
+            chunk_size += size
+        if not self._place(field_name, "\n".join(chunk), False):
+            self.hidden_lines += len(chunk)
+
+    def build(self):
+        """The composed pages, one embed per message, at most max_pages of them."""
+        if self.hidden_lines:
+            last = self.pages[-1]
+            note = f"{self.hidden_lines} more lines not shown"
+            last.set_footer(text=f"{last.footer.text} • {note}" if last.footer.text else note, icon_url=last.footer.icon_url)
+        if len(self.pages) > 1:
+            for number, page in enumerate(self.pages, start=1):
+                page.title = clip(f"{page.title or ''} ({number}/{len(self.pages)})", TITLE_LIMIT)
+        return self.pages
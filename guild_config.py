@@ -0,0 +1,52 @@
+"""
+Per-guild configuration (roles and channels) from the guild_settings table.
+
+Settings are read on nearly every interaction, so they are cached in memory for
+settings.GUILD_SETTINGS_CACHE_SECONDS. /configure writes through save(), which
+drops the cached entry so the change applies immediately.
+"""
+import time
+import database
+import metrics
+import settings
+
+_cache = {}  # guild_id -> (expires_at, GuildSettings or None)
+
+
+def get(guild_id):
+    """The GuildSettings of a guild, or None if it has not been configured."""
+    if guild_id is None:
+        return None
+    now = time.monotonic()
+    cached = _cache.get(guild_id)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    metrics.increment("guild_settings_loads")
+    guild_settings = database.get_guild_settings(guild_id)
+    _cache[guild_id] = (now + settings.GUILD_SETTINGS_CACHE_SECONDS, guild_settings)
+    return guild_settings
+
+
+def save(guild_id, **values):
+    database.save_guild_settings(guild_id, **values)
+    invalidate(guild_id)
+
+
+def invalidate(guild_id):
+    _cache.pop(guild_id, None)
+
+
+def get_channel(client, guild_id, setting):
+    """
+    The channel stored under `setting` (e.g. "case_forum_channel_id") for a guild,
+    or None if it is not configured or does not belong to that guild.
+    """
+    guild_settings = get(guild_id)
+    channel_id = getattr(guild_settings, setting, None) if guild_settings else None
+    if not channel_id:
+        return None
+    channel = client.get_channel(int(channel_id))
+    if channel is None or getattr(channel, "guild", None) is None or channel.guild.id != guild_id:
+        return None  # never post one firm's data into another firm's guild
+    return channel
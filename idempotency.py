@@ -0,0 +1,88 @@
+"""
+Runs create operations once per submission.
+
+A double-click or a redelivered interaction can submit the same modal twice, which
+would create a second case, thread or task. run() keys each submission by its
+interaction ID and by a hash of the user, action and submitted values. A repeat
+within settings.IDEMPOTENCY_TTL_SECONDS gets the first submission's reply instead
+of running again; if the first one is still running, the repeat waits for it.
+Keys are kept in a bounded in-memory cache and in the idempotency_keys table, so
+a repeat is also caught after the cache evicted the entry or the bot restarted.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+import database
+import metrics
+import settings
+
+IN_PROGRESS = "⏳ This was already submitted and is still being processed."
+
+_entries = OrderedDict()  # key -> (expires_at, future resolving to the reply)
+
+
+def submission_keys(interaction, action, payload):
+    digest = hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+    return [f"interaction:{interaction.id}", f"{action}:{interaction.user.id}:{digest}"]
+
+
+def _cached(keys):
+    now = time.monotonic()
+    for key in keys:
+        entry = _entries.get(key)
+        if entry and entry[0] > now:
+            return entry[1]
+    return None
+
+
+def _remember(keys, future):
+    expires_at = time.monotonic() + settings.IDEMPOTENCY_TTL_SECONDS
+    for key in keys:
+        _entries[key] = (expires_at, future)
+        _entries.move_to_end(key)
+    while len(_entries) > settings.IDEMPOTENCY_CACHE_SIZE:
+        _entries.popitem(last=False)
+
+
+def _forget(keys):
+    for key in keys:
+        _entries.pop(key, None)
+
+
+async def run(interaction, action, payload, operation):
+    """
+    Returns the reply of `operation()`, a coroutine function, run once per submission.
+    - payload: the submitted values, e.g. a dict of modal fields
+    Failed operations are forgotten so the user can submit again.
+    """
+    keys = submission_keys(interaction, action, payload)
+
+    future = _cached(keys)
+    if future is not None:
+        metrics.increment("idempotent_repeats")
+        return await asyncio.shield(future)
+
+    existing = database.claim_idempotency_keys(keys, settings.IDEMPOTENCY_TTL_SECONDS)
+    if existing:
+        metrics.increment("idempotent_repeats")
+        status, result = existing
+        return result if status == "done" else IN_PROGRESS
+
+    future = asyncio.get_running_loop().create_future()
+    _remember(keys, future)
+    try:
+        result = await operation()
+    except BaseException as e:
+        _forget(keys)
+        database.release_idempotency_keys(keys)
+        if isinstance(e, asyncio.CancelledError):
+            future.cancel()
+        else:
+            future.set_exception(e)
+            future.exception()  # marks it retrieved, so it isn't logged again when no repeat waited
+        raise
+    database.complete_idempotency_keys(keys, result)
+    future.set_result(result)
+    return result
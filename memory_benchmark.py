@@ -0,0 +1,125 @@
+"""
+Measures the memory cost of result rows and of the case/contact button views.
+
+    python memory_benchmark.py rows [--rows 100000]
+    python memory_benchmark.py views [--views 10000] [--max-retained 4096]
+
+rows: fetches the same Case rows from an in-memory SQLite database as plain tuples,
+models.Case NamedTuples, sqlite3.Row and dicts, and reports the traced bytes per
+row, the row's values included.
+
+views: builds /view_case and /view_contact views and hands each to a discord.py
+ViewStore the way sending a message does, then reports the memory still held after
+garbage collection. build_case_view()/build_contact_view() stop their views, so
+nothing should stay behind: the run fails with exit code 1 if either leaves views
+in the store or retains more than --max-retained bytes. A view left running is
+measured for comparison only.
+"""
+import os
+
+os.environ["DATABASE_PATH"] = ":memory:"  # the command modules import database.py; keep it off the real data
+
+import argparse
+import asyncio
+import gc
+import sqlite3
+import sys
+import tracemalloc
+import discord
+from discord.ui.view import ViewStore
+import models
+from commands.view_case import build_case_view, CASE_ACTIONS, CaseButton
+from commands.view_contact import build_contact_view
+
+ROW_FACTORIES = {
+    "tuple": None,
+    "Case": models.row_factory(models.Case),
+    "sqlite3.Row": sqlite3.Row,
+    "dict": lambda cursor, row: {column[0]: value for column, value in zip(cursor.description, row)},
+}
+
+
+def measure_rows(count):
+    conn = sqlite3.connect(":memory:")
+    conn.execute(f"CREATE TABLE cases ({', '.join(models.Case._fields)})")
+    conn.executemany(
+        "INSERT INTO cases VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            (
+                f"C-{i:06d}", f"Case {i}", f"Summary of case {i}", None, str(10**18 + i), str(10**18 + i),
+                "2024-01-01 12:00:00", "open", "1"
+            )
+            for i in range(count)
+        )
+    )
+    for label, factory in ROW_FACTORIES.items():
+        cursor = conn.cursor()
+        cursor.row_factory = factory
+        gc.collect()
+        tracemalloc.start()
+        rows = cursor.execute(f"SELECT {', '.join(models.Case._fields)} FROM cases").fetchall()
+        traced, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"[ROWS] {label:<12} {traced / len(rows):6.0f} B per row")
+        del rows
+    conn.close()
+
+
+def send(store, view, message_id):
+    """What discord.py does with a view passed to send_message() and friends."""
+    if not view.is_finished() and view.is_dispatchable():
+        store.add_view(view, message_id)
+
+
+def build_running_case_view(case_id):
+    view = discord.ui.View(timeout=None)
+    for action in CASE_ACTIONS:
+        view.add_item(CaseButton(action, case_id))
+    return view
+
+
+async def measure_views(count, max_retained):
+    """Returns the labels of the stopped views that were kept."""
+    builders = {  # label -> (builder, whether its views must be released)
+        "case": (build_case_view, True),
+        "contact": (build_contact_view, True),
+        "case, not stopped": (build_running_case_view, False),
+    }
+    failed = []
+    for label, (build, released) in builders.items():
+        store = ViewStore(None)
+        send(store, build(0), 0)  # the first use caches compiled templates and the like
+        gc.collect()
+        tracemalloc.start()
+        for i in range(1, count + 1):
+            send(store, build(i), i)
+        gc.collect()
+        retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"[VIEWS] {label:<18} {retained:>10} B retained after {count} views ({len(store._views)} messages in the store)")
+        if released and (store._views or retained > max_retained):
+            failed.append(label)
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the memory used by result rows and button views.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    rows = subparsers.add_parser("rows", help="bytes per fetched row for each row type")
+    rows.add_argument("--rows", type=int, default=100_000)
+    views = subparsers.add_parser("views", help="memory kept after sending many case/contact views")
+    views.add_argument("--views", type=int, default=10_000)
+    views.add_argument("--max-retained", type=int, default=4096, help="bytes stopped views may keep in total")
+    args = parser.parse_args()
+
+    if args.benchmark == "rows":
+        measure_rows(args.rows)
+    else:
+        failed = asyncio.run(measure_views(args.views, args.max_retained))
+        if failed:
+            sys.exit(f"[VIEWS] FAILED: {', '.join(failed)} views are kept after being sent")
+        print("[VIEWS] OK: stopped views are released")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""
+Process-wide counters and gauges, readable as JSON on the keep-alive server's /metrics route.
+"""
+import threading
+import time
+
+_lock = threading.Lock()
+_values = {}
+
+
+def set_value(name, value):
+    with _lock:
+        _values[name] = value
+
+
+def increment(name, amount=1):
+    with _lock:
+        _values[name] = _values.get(name, 0) + amount
+
+
+def observe(name, value):
+    """Records the latest value of `name` together with when it was observed."""
+    with _lock:
+        _values[name] = value
+        _values[f"{name}_at"] = int(time.time())
+
+
+def snapshot():
+    with _lock:
+        return dict(_values)
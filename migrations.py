@@ -0,0 +1,284 @@
+"""
+Numbered schema migrations, applied in order by database.migrate_database().
+
+Migrations never change once released; schema changes get a new, higher number.
+Tables and columns are declared in settings.DATABASE_SCHEMA, so a migration that
+introduces them can simply create whatever is missing from it.
+"""
+import database
+import settings
+import temporal
+
+MIGRATIONS = []  # (version, description, function, transactional)
+
+
+def migration(version, description, transactional=True):
+    def register(func):
+        MIGRATIONS.append((version, description, func, transactional))
+        return func
+    return register
+
+
+# ------------------ HELPERS ------------------
+def create_tables(cursor, *tables):
+    for table in tables:
+        cursor.execute(database.build_create_table_sql(table, settings.DATABASE_SCHEMA[table]))
+
+
+def add_missing_columns(cursor, table):
+    cursor.execute(f"PRAGMA table_info({table})")
+    existing_cols = {col[1] for col in cursor.fetchall()}
+
+    for col_name, col_def in settings.DATABASE_SCHEMA[table].items():
+        if col_name not in existing_cols:
+            print(f"[MIGRATION] Adding missing column '{col_name}' to '{table}'")
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {col_name} {col_def}")
+
+    for col_name in existing_cols - settings.DATABASE_SCHEMA[table].keys():
+        print(f"[WARNING] Column '{col_name}' exists in '{table}' but is not in expected schema (deprecated?). "
+              f"It is dropped the next time the table is rebuilt.")
+
+
+def create_indexes(cursor, *index_names):
+    for index_name in index_names:
+        table, columns, unique = settings.DATABASE_INDEXES[index_name]
+        cursor.execute(
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {index_name} ON {table} ({columns})"
+        )
+
+
+def has_foreign_keys(cursor, table):
+    cursor.execute(f"PRAGMA foreign_key_list({table})")
+    return bool(cursor.fetchall())
+
+
+def rebuild_table(cursor, table, where=None, batch_size=None):
+    """
+    Recreates `table` from its current settings.DATABASE_SCHEMA definition, which is
+    how SQLite changes column types or constraints and drops deprecated columns.
+    Rows are copied in rowid batches so progress on large tables is visible; `where`
+    optionally filters which rows are kept. Indexes on the table must be recreated
+    by the caller, and so must triggers (see create_case_stats_triggers). Expects
+    foreign keys to be off, as they are during migrations.
+    """
+    schema = settings.DATABASE_SCHEMA[table]
+    batch_size = batch_size or settings.MIGRATION_BATCH_SIZE
+
+    cursor.execute(f"PRAGMA table_info({table})")
+    existing_cols = {col[1] for col in cursor.fetchall()}
+    shared_cols = ", ".join(col for col in schema if col in existing_cols)
+    row_filter = f"AND ({where})" if where else ""
+
+    cursor.execute(f"DROP TABLE IF EXISTS {table}_rebuild")
+    cursor.execute(database.build_create_table_sql(f"{table}_rebuild", schema))
+
+    cursor.execute(f"SELECT COUNT(*) FROM {table}")
+    total = cursor.fetchone()[0]
+    copied = 0
+    last_rowid = -1
+
+    while True:
+        cursor.execute(
+            f"SELECT MAX(rowid) FROM (SELECT rowid FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?)",
+            (last_rowid, batch_size)
+        )
+        upper_rowid = cursor.fetchone()[0]
+        if upper_rowid is None:
+            break
+
+        cursor.execute(
+            f"""
+            INSERT INTO {table}_rebuild ({shared_cols})
+            SELECT {shared_cols} FROM {table}
+            WHERE rowid > ? AND rowid <= ? {row_filter}
+            """,
+            (last_rowid, upper_rowid)
+        )
+        copied += cursor.rowcount
+        last_rowid = upper_rowid
+        print(f"[MIGRATION] Rebuilding '{table}': {copied}/{total} rows copied")
+
+    if copied < total:
+        print(f"[MIGRATION] Dropped {total - copied} rows from '{table}'")
+
+    cursor.execute(f"DROP TABLE {table}")
+    cursor.execute(f"ALTER TABLE {table}_rebuild RENAME TO {table}")
+
+
+def convert_deadlines_to_utc(cursor, table):
+    """Rewrites deadlines stored in the firm's local time as UTC; unparseable values are left alone."""
+    cursor.execute(f"SELECT id, deadline FROM {table} WHERE deadline IS NOT NULL")
+    updates = []
+    for task_id, deadline in cursor.fetchall():
+        converted = temporal.local_to_storage(deadline)
+        if converted:
+            updates.append((converted, task_id))
+    cursor.executemany(f"UPDATE {table} SET deadline = ? WHERE id = ?", updates)
+    print(f"[MIGRATION] Converted {len(updates)} deadlines in '{table}' to UTC")
+
+
+def create_case_stats_triggers(cursor):
+    """Triggers that keep case_task_stats in step with every change to case_tasks."""
+    recompute_new = database.case_stats_upsert_sql("c.id = NEW.case_id")
+    recompute_old = database.case_stats_upsert_sql("c.id = OLD.case_id")
+    recompute_moved = database.case_stats_upsert_sql("c.id = OLD.case_id AND OLD.case_id IS NOT NEW.case_id")
+    triggers = {
+        "trg_case_tasks_stats_insert": ("AFTER INSERT", [recompute_new]),
+        "trg_case_tasks_stats_update": ("AFTER UPDATE", [recompute_new, recompute_moved]),
+        "trg_case_tasks_stats_delete": ("AFTER DELETE", [recompute_old]),
+    }
+    for name, (event, statements) in triggers.items():
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        body = ";\n".join(statements)
+        cursor.execute(f"CREATE TRIGGER {name} {event} ON case_tasks BEGIN {body}; END")
+
+
+# ------------------ MIGRATIONS ------------------
+@migration(1, "Create base tables")
+def create_base_tables(cursor):
+    # Also brings databases from before versioned migrations up to the base schema
+    for table in ("cases", "contacts", "case_contacts", "case_tasks"):
+        create_tables(cursor, table)
+        add_missing_columns(cursor, table)
+    create_indexes(cursor, "idx_cases_id")  # parent key the foreign keys point at
+
+
+@migration(2, "Foreign keys with ON DELETE CASCADE, removing orphaned rows")
+def add_cascading_foreign_keys(cursor):
+    orphan_filters = {
+        "case_contacts": "case_id IN (SELECT id FROM cases) AND contact_id IN (SELECT id FROM contacts)",
+        "case_tasks": "case_id IN (SELECT id FROM cases)",
+    }
+    for table, keep_rows in orphan_filters.items():
+        if has_foreign_keys(cursor, table):
+            cursor.execute(f"DELETE FROM {table} WHERE ({keep_rows}) IS NOT 1")
+            print(f"[MIGRATION] Removed {cursor.rowcount} orphaned rows from '{table}'")
+        else:
+            rebuild_table(cursor, table, where=keep_rows)
+
+    create_indexes(cursor, "idx_case_contacts_case", "idx_case_contacts_contact", "idx_case_tasks_case")
+
+
+@migration(3, "Enable incremental auto-vacuum", transactional=False)
+def enable_incremental_vacuum(cursor):
+    cursor.execute("PRAGMA auto_vacuum")
+    if cursor.fetchone()[0] != 2:
+        # Only takes effect through a full VACUUM, which is why this runs once here
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cursor.execute("VACUUM")
+
+
+@migration(4, "Case status for closing and archiving cases")
+def add_case_status(cursor):
+    add_missing_columns(cursor, "cases")
+    create_indexes(cursor, "idx_cases_status")
+
+
+@migration(5, "Store deadlines in UTC and add per-user timezones")
+def store_deadlines_in_utc(cursor):
+    convert_deadlines_to_utc(cursor, "case_tasks")
+    create_tables(cursor, "user_preferences")
+
+
+@migration(6, "Per-case task statistics maintained by triggers")
+def add_case_task_stats(cursor):
+    create_tables(cursor, "case_task_stats")
+    create_case_stats_triggers(cursor)
+    cursor.execute(database.case_stats_upsert_sql("c.id IN (SELECT case_id FROM case_tasks)"))
+    print(f"[MIGRATION] Computed task statistics for {cursor.rowcount} cases")
+
+
+@migration(7, "Append-only audit log of case and contact changes")
+def add_case_events(cursor):
+    create_tables(cursor, "case_events")
+    create_indexes(cursor, "idx_case_events_case", "idx_case_events_contact")
+    for event in ("UPDATE", "DELETE"):
+        cursor.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_case_events_no_{event.lower()} BEFORE {event} ON case_events
+            BEGIN SELECT RAISE(ABORT, 'case_events is append-only'); END
+            """
+        )
+
+
+@migration(8, "Daily digest preferences")
+def add_digest_preferences(cursor):
+    add_missing_columns(cursor, "user_preferences")
+    create_indexes(cursor, "idx_contacts_discord_id")
+
+
+@migration(9, "Per-guild settings and guild-scoped cases, contacts and tasks")
+def add_guilds(cursor):
+    for table in database.GUILD_SCOPED_TABLES:
+        add_missing_columns(cursor, table)
+    create_tables(cursor, "guild_settings")
+
+    # Everything so far belongs to the one guild the bot served
+    if settings.DEFAULT_GUILD_ID:
+        database.assign_default_guild(cursor)
+    else:
+        print(
+            "[WARNING] GUILD_ID is not set; existing cases and contacts have no guild until it is set "
+            "and `python MainScript.py assign-guild` is run"
+        )
+
+    create_indexes(cursor, "idx_cases_guild", "idx_contacts_guild", "idx_case_tasks_guild")
+
+
+@migration(10, "Notification outbox between the reminder worker and the bot")
+def add_notification_outbox(cursor):
+    add_missing_columns(cursor, "case_tasks")
+    create_tables(cursor, "notification_outbox")
+    create_indexes(cursor, "idx_notification_outbox_status")
+
+
+@migration(11, "Trigram index for finding duplicate contacts")
+def add_contact_trigrams(cursor):
+    create_tables(cursor, "contact_trigrams")
+    create_indexes(cursor, "idx_contact_trigrams", "idx_contact_trigrams_contact")
+    cursor.execute("SELECT id FROM contacts")
+    contact_ids = [row[0] for row in cursor.fetchall()]
+    for contact_id in contact_ids:
+        database.index_contact(cursor, contact_id)
+    print(f"[MIGRATION] Indexed {len(contact_ids)} contacts")
+
+
+@migration(12, "Case templates with standard task sets")
+def add_case_templates(cursor):
+    create_tables(cursor, "case_templates", "case_template_tasks")
+    create_indexes(cursor, "idx_case_templates_name", "idx_case_template_tasks_template")
+
+
+@migration(13, "Idempotency keys for repeated submissions")
+def add_idempotency_keys(cursor):
+    create_tables(cursor, "idempotency_keys")
+
+
+@migration(14, "Local copies of case and contact thread messages")
+def add_thread_messages(cursor):
+    create_tables(cursor, "thread_messages", "thread_cursors")
+    create_indexes(cursor, "idx_thread_messages_thread")
+
+
+@migration(15, "Case documents stored by content hash")
+def add_case_documents(cursor):
+    create_tables(cursor, "case_documents")
+    create_indexes(cursor, "idx_case_documents_case", "idx_case_documents_sha256")
+
+
+@migration(16, "One link per case and contact")
+def dedupe_case_contacts(cursor):
+    # Re-linking used to add another row; the newest one holds the current role
+    cursor.execute(
+        """
+        DELETE FROM case_contacts WHERE rowid NOT IN (
+            SELECT MAX(rowid) FROM case_contacts GROUP BY case_id, contact_id
+        )
+        """
+    )
+    print(f"[MIGRATION] Removed {cursor.rowcount} duplicate case-contact links")
+    create_indexes(cursor, "idx_case_contacts_link")
+
+
+MIGRATIONS.sort(key=lambda m: m[0])
+LATEST_VERSION = MIGRATIONS[-1][0]
@@ -0,0 +1,146 @@
+"""
+Row types returned by database.py.
+
+NamedTuples keep rows as compact as the plain tuples sqlite3 returns (no per-row
+__dict__), while call sites read fields by name instead of by position.
+"""
+from typing import NamedTuple, Optional
+
+
+class Case(NamedTuple):
+    id: str
+    name: str
+    summary: Optional[str]
+    notes: Optional[str]
+    channel_id: Optional[str]  # forum thread of the case
+    message_id: Optional[str]  # starter message inside that thread
+    created_at: Optional[str]
+    status: Optional[str]  # open / closed
+    guild_id: Optional[str]
+
+
+class Contact(NamedTuple):
+    id: int
+    name: str
+    contact: Optional[str]
+    notes: Optional[str]
+    status: Optional[str]
+    discord_id: Optional[str]
+    channel_id: Optional[str]  # forum thread of the contact
+    message_id: Optional[str]  # starter message inside that thread
+    created_at: Optional[str]
+    guild_id: Optional[str]
+
+
+class CaseLink(NamedTuple):
+    """A contact's role in a case, with the names needed to display either side."""
+    case_id: str
+    case_name: str
+    contact_id: int
+    contact_name: str
+    role: Optional[str]
+    discord_id: Optional[str]
+
+
+class Task(NamedTuple):
+    id: int
+    case_id: str
+    task: str
+    deadline: Optional[str]
+    done: int
+
+
+class CaseStats(NamedTuple):
+    """Task counts of a case, read from the case_task_stats table."""
+    case_id: str
+    case_name: str
+    status: Optional[str]
+    open_tasks: int
+    done_tasks: int
+    overdue_tasks: int
+    next_deadline: Optional[str]
+
+
+class CaseEvent(NamedTuple):
+    id: int
+    case_id: Optional[str]
+    contact_id: Optional[int]
+    actor_id: Optional[str]
+    action: str
+    description: Optional[str]
+    diff: Optional[str]  # JSON {field: [old, new]}
+    created_at: str
+
+
+class Digest(NamedTuple):
+    """One user's open tasks across all open cases they are linked to."""
+    discord_id: str
+    open_tasks: int
+    due_soon_tasks: int
+    overdue_tasks: int
+    tasks: str  # JSON [[task_id, case_id, case_name, task, deadline], ...] of overdue and due-soon tasks
+
+
+class GuildSettings(NamedTuple):
+    guild_id: str
+    employee_role_id: Optional[str]
+    manager_role_id: Optional[str]
+    notification_channel_id: Optional[str]
+    case_forum_channel_id: Optional[str]
+    contacts_forum_channel_id: Optional[str]
+
+
+class OutboxEntry(NamedTuple):
+    id: int
+    guild_id: str
+    channel_id: str
+    payload: str  # JSON {"embed": ..., "ping": ...}
+
+
+class CaseTemplate(NamedTuple):
+    id: int
+    name: str
+    task_count: int
+
+
+class TemplateTask(NamedTuple):
+    task: str
+    deadline_offset: Optional[int]  # minutes after the case is created
+
+
+class ThreadMessage(NamedTuple):
+    id: int
+    thread_id: str
+    guild_id: Optional[str]
+    author_id: Optional[str]
+    author_name: Optional[str]
+    content: Optional[str]
+    attachments: Optional[str]  # URLs, one per line
+    created_at: str  # UTC
+    edited_at: Optional[str]
+
+
+class ThreadCursor(NamedTuple):
+    """A case or contact thread with how far its history has been copied."""
+    thread_id: str
+    guild_id: Optional[str]
+    last_message_id: Optional[int]
+
+
+class CaseDocument(NamedTuple):
+    id: int
+    case_id: str
+    sha256: str
+    filename: str
+    content_type: Optional[str]
+    size: int
+    uploaded_by: Optional[str]
+    channel_id: Optional[str]
+    message_id: Optional[str]
+    created_at: str
+
+
+def row_factory(model):
+    """sqlite3 row factory building `model` rows straight from the fetched tuple."""
+    make = model._make
+    return lambda cursor, row: make(row)
@@ -0,0 +1,169 @@
+"""
+One prioritized queue for the bot's outbound Discord API calls.
+
+Calls are given a priority class and a route (the channel or thread they hit).
+A small pool of workers runs them highest priority first, throttled by a token
+bucket per route and one global bucket, so a burst of background notifications
+can't hold up a user who is waiting on their own forum post.
+Interaction responses themselves (interaction.response.*) are answered directly,
+since Discord only waits 3 seconds for them.
+"""
+import asyncio
+import itertools
+import random
+import time
+import discord
+import metrics
+import settings
+
+# ------------------ PRIORITY CLASSES ------------------
+INTERACTION = 0  # calls a user is waiting on (e.g. creating the thread for their new case)
+FORUM = 1  # re-rendering forum starter posts and thread logs
+BACKGROUND = 2  # notifications and other scheduled sends
+
+PRIORITY_NAMES = {INTERACTION: "interaction", FORUM: "forum", BACKGROUND: "background"}
+
+
+class TokenBucket:
+    def __init__(self, rate, per):
+        self.capacity = rate
+        self.tokens = float(rate)
+        self.fill_rate = rate / per
+        self.updated = time.monotonic()
+
+    def try_acquire(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self):
+        """Seconds until the next token, as of the last try_acquire()."""
+        return max(0.0, (1 - self.tokens) / self.fill_rate)
+
+    async def acquire(self):
+        while not self.try_acquire():
+            await asyncio.sleep(self.wait_time())
+
+
+_queue = None
+_workers = []
+_sequence = itertools.count()  # keeps FIFO order within one priority class
+_depth = {priority: 0 for priority in PRIORITY_NAMES}
+_route_buckets = {}
+_global_bucket = TokenBucket(*settings.OUTBOUND_GLOBAL_RATE)
+
+
+def _ensure_started():
+    global _queue
+    if _queue is None:
+        _queue = asyncio.PriorityQueue()
+        for _ in range(settings.OUTBOUND_WORKERS):
+            _workers.append(asyncio.create_task(_worker()))
+
+
+def _enqueue(priority, route, call, future, attempt, sequence=None):
+    if sequence is None:
+        sequence = next(_sequence)
+    _queue.put_nowait((priority, sequence, route, call, future, attempt))
+    _depth[priority] += 1
+    metrics.set_value(f"outbound_queue_depth_{PRIORITY_NAMES[priority]}", _depth[priority])
+
+
+async def submit(priority, route, call):
+    """
+    Runs `call` (a function returning the API coroutine, e.g. `lambda: thread.send(...)`)
+    through the queue and returns its result.
+    - route: the rate-limit route, e.g. f"channel:{channel.id}"
+    """
+    _ensure_started()
+    future = asyncio.get_running_loop().create_future()
+    _enqueue(priority, route, call, future, 0)
+    return await future
+
+
+def _retry_delay(error, attempt):
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is None and isinstance(error, discord.HTTPException) and error.response is not None:
+        retry_after = float(error.response.headers.get("Retry-After", 1))
+    # Jitter spreads retries of calls that hit the same limit at the same time
+    return (retry_after or 1) + random.uniform(0, settings.OUTBOUND_RETRY_JITTER * (attempt + 1))
+
+
+async def _worker():
+    while True:
+        priority, sequence, route, call, future, attempt = await _queue.get()
+        _depth[priority] -= 1
+        metrics.set_value(f"outbound_queue_depth_{PRIORITY_NAMES[priority]}", _depth[priority])
+
+        if future.cancelled():
+            continue
+
+        bucket = _route_buckets.get(route)
+        if bucket is None:
+            bucket = _route_buckets[route] = TokenBucket(*settings.OUTBOUND_ROUTE_RATE)
+        if not bucket.try_acquire():
+            # Put the call back until its route has a token, keeping its place in line,
+            # so a burst on one channel can't hold workers that other routes need
+            metrics.increment("outbound_route_waits")
+            asyncio.get_running_loop().call_later(
+                bucket.wait_time(), _enqueue, priority, route, call, future, attempt, sequence
+            )
+            continue
+        await _global_bucket.acquire()
+
+        try:
+            result = await call()
+        except (discord.RateLimited, discord.HTTPException) as e:
+            rate_limited = isinstance(e, discord.RateLimited) or e.status == 429
+            if rate_limited and attempt < settings.OUTBOUND_MAX_RETRIES:
+                metrics.increment("outbound_retries")
+                # Requeue later instead of sleeping, so this worker keeps serving other routes
+                asyncio.get_running_loop().call_later(
+                    _retry_delay(e, attempt), _enqueue, priority, route, call, future, attempt + 1
+                )
+                continue
+            error, result = e, None
+        except Exception as e:
+            error, result = e, None
+        else:
+            error = None
+
+        if not future.done():  # the caller may have been cancelled meanwhile
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        if error:
+            metrics.increment(f"outbound_errors_{PRIORITY_NAMES[priority]}")
+        else:
+            metrics.increment(f"outbound_sent_{PRIORITY_NAMES[priority]}")
+
+
+# ------------------ FORUM POSTS ------------------
+_background = set()  # tasks started by in_background(), referenced so they aren't garbage-collected
+
+
+def in_background(coro):
+    """Runs `coro` without waiting for it, e.g. forum updates after the user already got their reply."""
+    task = asyncio.create_task(coro)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return task
+
+
+async def refresh_thread(thread, starter_message_id, embed, log_embed):
+    """Replaces the embed of a case or contact thread's starter post and logs the change below it."""
+    route = f"channel:{thread.id}"
+    try:
+        starter_message = await submit(FORUM, route, lambda: thread.fetch_message(starter_message_id))
+        await submit(FORUM, route, lambda: starter_message.edit(embed=embed))
+    except Exception as e:
+        print(f"Error updating thread post: {e}")
+    try:
+        await submit(FORUM, route, lambda: thread.send(embed=log_embed))
+    except Exception as e:
+        print(f"Error logging to thread: {e}")
@@ -0,0 +1,99 @@
+"""
+Shared permission layer for commands and buttons.
+
+Every handler is wrapped with @guard("<action>"), which looks up the role the
+action needs in settings.PERMISSION_POLICY and the role IDs the guild configured
+with /configure (see guild_config.py), then applies a per-user rate and
+concurrency limit so one user's bulk clicking can't starve everyone else.
+"""
+import functools
+import time
+import discord
+import settings
+import guild_config
+from outbound import TokenBucket
+
+_role_cache = {}  # (guild_id, user_id) -> (expires_at, frozenset of role IDs)
+_in_flight = {}  # user_id -> interactions currently being handled
+_user_buckets = {}  # user_id -> TokenBucket
+
+
+def member_role_ids(member):
+    key = (member.guild.id, member.id)
+    cached = _role_cache.get(key)
+    now = time.monotonic()
+    if cached and cached[0] > now:
+        return cached[1]
+
+    role_ids = frozenset(role.id for role in member.roles)
+    _role_cache[key] = (now + settings.ROLE_CACHE_SECONDS, role_ids)
+    return role_ids
+
+
+async def invalidate_member(before, after):
+    """on_member_update listener: role changes apply immediately instead of after the cache expires."""
+    _role_cache.pop((after.guild.id, after.id), None)
+
+
+def prune():
+    """Drops expired roles and the buckets of idle users; run from the maintenance loop. Returns how many."""
+    now = time.monotonic()
+    expired = [key for key, (expires_at, _) in _role_cache.items() if expires_at <= now]
+    for key in expired:
+        del _role_cache[key]
+    # A bucket that has refilled completely behaves like a new one, so it can go
+    idle = [
+        user_id for user_id, bucket in _user_buckets.items()
+        if user_id not in _in_flight and bucket.tokens + (now - bucket.updated) * bucket.fill_rate >= bucket.capacity
+    ]
+    for user_id in idle:
+        del _user_buckets[user_id]
+    return len(expired) + len(idle)
+
+
+def has_permission(user, action):
+    if not isinstance(user, discord.Member):
+        return False  # no roles outside a guild
+    guild_settings = guild_config.get(user.guild.id)
+    if not guild_settings:
+        return False  # guild not configured yet
+    required_role = settings.PERMISSION_POLICY.get(action, "employee")
+    role_id = getattr(guild_settings, f"{required_role}_role_id")
+    return role_id is not None and int(role_id) in member_role_ids(user)
+
+
+def guard(action):
+    """
+    Decorator for app command callbacks and button handlers.
+    - action: command name, or "<kind>:<button action>" for buttons
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            interaction = next(arg for arg in args if isinstance(arg, discord.Interaction))
+
+            if not has_permission(interaction.user, action):
+                # Not allowed
+                await interaction.response.send_message("❌ You do not have permission.", ephemeral=True)
+                return
+
+            user_id = interaction.user.id
+            bucket = _user_buckets.get(user_id)
+            if bucket is None:
+                bucket = _user_buckets[user_id] = TokenBucket(*settings.USER_RATE_LIMIT)
+            if _in_flight.get(user_id, 0) >= settings.USER_MAX_CONCURRENT or not bucket.try_acquire():
+                await interaction.response.send_message(
+                    "⏳ You're sending requests too quickly. Please wait a moment.",
+                    ephemeral=True
+                )
+                return
+
+            _in_flight[user_id] = _in_flight.get(user_id, 0) + 1
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                _in_flight[user_id] -= 1
+                if not _in_flight[user_id]:
+                    del _in_flight[user_id]
+        return wrapper
+    return decorator
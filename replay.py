@@ -0,0 +1,176 @@
+"""
+Replays the reminder worker against a seeded task set on a simulated clock.
+
+    python replay.py [--tasks 500] [--days 7] [--tick-minutes 5] [--seed 1]
+
+Runs on the shared in-memory database, so the real one is never touched. Tasks are
+created at random times over the run with deadlines up to a few days later, and
+some are completed before their deadline. Each tick advances the clock by one
+scan interval, runs a scan and records every notification it queued with the
+simulated time it would have been sent. The report shows alert latency, duplicate
+and missed alerts and the work each tick did; passing a different `scan` to
+replay() compares scanning strategies on the same workload.
+"""
+import os
+
+os.environ["DATABASE_PATH"] = ":memory:"  # set before settings.py is imported, so the replay never touches real data
+
+import argparse
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple, Optional
+import clock
+import database
+import guild_config
+import metrics
+import settings
+import worker
+
+REPLAY_GUILD_ID = "replay"
+REPLAY_CHANNEL_ID = "1"
+TASKS_PER_CASE = 4
+MAX_LEAD_DAYS = 3  # deadlines fall up to this long after a task is created
+COMPLETED_SHARE = 0.3  # share of tasks marked done before their deadline
+
+
+class ReplayTask(NamedTuple):
+    case_id: str
+    created: datetime
+    deadline: datetime
+    done: Optional[datetime]  # when the task is marked done, if it is
+
+
+class Tick(NamedTuple):
+    at: datetime
+    seconds: float  # wall time the scan took
+    scanned: int  # tasks the scan read
+    queued: int  # notifications it queued
+
+
+def build_workload(task_count, days, seed, start):
+    """Seeded task set spread over `days` from `start`, ordered by creation time."""
+    rng = random.Random(seed)
+    case_count = task_count // TASKS_PER_CASE + 1
+    workload = []
+    for _ in range(task_count):
+        created = start + timedelta(seconds=rng.uniform(0, days * 86400))
+        # Deadlines are stored with minute precision
+        deadline = (created + timedelta(seconds=rng.uniform(0, MAX_LEAD_DAYS * 86400))).replace(second=0, microsecond=0)
+        done = created + (deadline - created) * rng.random() if rng.random() < COMPLETED_SHARE else None
+        workload.append(ReplayTask(f"R{rng.randrange(case_count):05d}", created, deadline, done))
+    workload.sort(key=lambda task: task.created)
+    return workload
+
+
+def replay(workload, start, end, tick, scan=None):
+    """
+    Runs `scan` (by default the worker's scan of the replay guild) once per `tick`
+    of simulated time from `start` to `end`.
+    Returns (sent, ticks): sent is a list of (workload index, simulated send time).
+    """
+    scan = scan or (lambda: worker.scan_guild(REPLAY_GUILD_ID, set()))
+    simulated = clock.SimulatedClock(start)
+    previous_clock = clock.install(simulated)
+    try:
+        database.migrate_database()
+        guild_config.save(REPLAY_GUILD_ID, notification_channel_id=REPLAY_CHANNEL_ID)
+        for case_id in sorted({task.case_id for task in workload}):
+            database.insert_case(case_id, f"Replay case {case_id}", None, None, guild_id=REPLAY_GUILD_ID)
+
+        completions = sorted((task.done, index) for index, task in enumerate(workload) if task.done)
+        task_ids, index_by_task_id = {}, {}
+        created = completed = 0
+        sent, ticks = [], []
+
+        while simulated.now() < end:
+            now = simulated.advance(tick)
+            while created < len(workload) and workload[created].created <= now:
+                task = workload[created]
+                task_id = database.add_task(task.case_id, f"Replay task {created}", task.deadline.strftime("%Y-%m-%d %H:%M"))
+                task_ids[created], index_by_task_id[task_id] = task_id, created
+                created += 1
+            while completed < len(completions) and completions[completed][0] <= now:
+                index = completions[completed][1]
+                if index in task_ids:  # created and done within the same tick otherwise
+                    database.mark_task_done(task_ids[index], workload[index].case_id)
+                completed += 1
+
+            scanned_before = metrics.snapshot().get("reminder_tasks_scanned", 0)
+            started = time.perf_counter()
+            notifications = scan()
+            seconds = time.perf_counter() - started
+            scanned = metrics.snapshot().get("reminder_tasks_scanned", 0) - scanned_before
+
+            sent.extend((index_by_task_id[task_id], now) for task_id, _ in notifications)
+            # Nothing delivers the outbox here, so mark it sent to keep it from growing
+            pending = database.get_pending_notifications(len(notifications) or 1)
+            database.mark_notifications([(entry.id, "sent") for entry in pending])
+            ticks.append(Tick(now, seconds, scanned, len(notifications)))
+    finally:
+        clock.install(previous_clock)
+    return sent, ticks
+
+
+def percentile(values, share):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def report(workload, sent, ticks, tick, end):
+    """Prints alert latency, duplicate and missed alerts and the work done per tick."""
+    first_sent = {}
+    for index, at in sent:
+        first_sent.setdefault(index, at)
+    duplicates = sum(count - 1 for count in Counter(index for index, _ in sent).values())
+
+    latencies, late, missed = [], 0, 0
+    for index, task in enumerate(workload):
+        # A task should be announced as soon as it exists inside the due-soon window
+        eligible = max(task.created, task.deadline - settings.DUE_SOON_WINDOW)
+        if eligible > end or (task.done and task.done <= eligible):
+            continue
+        if index not in first_sent:
+            if not task.done:
+                missed += 1
+            continue
+        latencies.append((first_sent[index] - eligible).total_seconds() / 60)
+        if first_sent[index] > task.deadline:
+            late += 1
+
+    scan_ms = [t.seconds * 1000 for t in ticks]
+    scanned = [t.scanned for t in ticks]
+    print(f"[REPLAY] {len(workload)} tasks, {len(ticks)} ticks of {tick.total_seconds() / 60:g} min")
+    print(f"[REPLAY] Notifications: {len(sent)} sent, {duplicates} duplicates, {missed} missed, {late} after the deadline")
+    print(
+        f"[REPLAY] Alert latency (min): p50 {percentile(latencies, 0.5):.1f}, "
+        f"p95 {percentile(latencies, 0.95):.1f}, max {max(latencies, default=0):.1f}"
+    )
+    print(
+        f"[REPLAY] Per tick: scan {sum(scan_ms) / max(len(ticks), 1):.2f} ms avg / {max(scan_ms, default=0):.2f} ms max, "
+        f"{sum(scanned) / max(len(ticks), 1):.1f} tasks read avg / {max(scanned, default=0)} max, "
+        f"{max((t.queued for t in ticks), default=0)} notifications max"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the reminder worker on a simulated clock.")
+    parser.add_argument("--tasks", type=int, default=500)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--tick-minutes", type=int, default=settings.REMINDER_SCAN_MINUTES)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    start = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    end = start + timedelta(days=args.days)
+    workload = build_workload(args.tasks, args.days, args.seed, start)
+    tick = timedelta(minutes=args.tick_minutes)
+    sent, ticks = replay(workload, start, end, tick)
+    report(workload, sent, ticks, tick, end)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,12 +8,59 @@ load_dotenv()
 # ------------------ DISCORD ------------------
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 COMMAND_PREFIX = "e!"
+# AutoShardedBot lets discord.py pick the shard count and spread guilds across shards
+SHARDED = os.getenv("SHARDED", "false").lower() in ("1", "true", "yes")
+
+# ------------------ PROCESSES ------------------
+# What `python MainScript.py` runs unless a role is given on the command line:
+#   all    - the bot, with the reminder worker in a child process
+#   bot    - only the bot (run the worker separately against the same database)
+#   worker - only the reminder worker
+PROCESS_ROLE = os.getenv("PROCESS_ROLE", "all")
+# Port of the keep-alive server (StayAlive.py) started with the bot; serves / and /metrics, 0 turns it off
+KEEP_ALIVE_PORT = int(os.getenv("KEEP_ALIVE_PORT", "8080"))
+REMINDER_SCAN_MINUTES = 5  # how often the worker looks for due tasks
+OUTBOX_POLL_SECONDS = 5  # how often the bot sends notifications the worker queued
+OUTBOX_BATCH_SIZE = 50  # notifications sent per poll
+OUTBOX_RETENTION_DAYS = 30  # sent notifications are pruned by maintenance after this
+
+# ------------------ OUTBOUND API ------------------
+OUTBOUND_WORKERS = 4  # concurrent outbound API calls
+OUTBOUND_ROUTE_RATE = (5, 5.0)  # calls per seconds on one channel/thread
+OUTBOUND_GLOBAL_RATE = (40, 1.0)  # calls per seconds overall (Discord allows 50)
+OUTBOUND_MAX_RETRIES = 5  # attempts after a 429 before the error is raised
+OUTBOUND_RETRY_JITTER = 0.5  # seconds of random delay added per retry attempt
+MAX_RATELIMIT_WAIT = 30.0  # longer rate limits are raised by discord.py and rescheduled by outbound.py (minimum 30)
+
+# ------------------ GUILDS ------------------
+# Each guild (firm) is configured with /configure and stored in guild_settings.
+# The role and channel IDs below only seed the configuration of DEFAULT_GUILD_ID,
+# the guild that all cases and contacts from before multi-guild support belong to.
+DEFAULT_GUILD_ID = os.getenv("GUILD_ID")
 
 # ------------------ PERMS ------------------
 
 EMPLOYEE_ROLE_ID = 1404762559613243442
 MANAGER_ROLE_ID = 1409979344478015591
 
+# Role required per command ("view_case") and per button ("case:delete").
+# Anything not listed here requires the employee role.
+PERMISSION_POLICY = {
+    "backup": "manager",
+    "archive_cases": "manager",
+    "case:delete": "manager",
+    "case:close": "manager",
+    "case:tasks_delete": "manager",
+    "save_template": "manager",
+    "delete_template": "manager",
+    "export_cases": "manager",
+    "contact:delete": "manager",
+}
+ROLE_CACHE_SECONDS = 60  # how long a member's resolved roles are reused
+GUILD_SETTINGS_CACHE_SECONDS = 300  # guild settings are also reloaded at once after /configure
+USER_MAX_CONCURRENT = 2  # interactions of one user handled at the same time
+USER_RATE_LIMIT = (8, 10.0)  # interactions per seconds allowed per user
+
 # ------------------ CHANNELS ------------------
 # Preferably, put these IDs in your .env instead of hardcoding
 NOTIFICATION_CHANNEL_ID = 1409979145970253854
@@ -22,8 +69,96 @@ CONTACTS_FORUM_CHANNEL_ID = 1409979025819963476
 
 # ------------------ TASK SETTINGS ------------------
 DUE_SOON_WINDOW = timedelta(hours=int(os.getenv("DUE_SOON_HOURS", "24")))
+# Deadlines are entered in the user's timezone (set with /set_timezone) or this one
+FIRM_TIMEZONE = os.getenv("FIRM_TIMEZONE", "Europe/Berlin")
+# Triggers keep task counts current; only "overdue" changes with time and is refreshed this often
+STATS_REFRESH_MINUTES = 5
+
+# ------------------ DIGEST ------------------
+# Users who opt in with /digest get one DM a day instead of channel pings
+DIGEST_HOUR = int(os.getenv("DIGEST_HOUR", "8"))  # in FIRM_TIMEZONE
+DIGEST_MAX_TASKS = 15  # tasks listed per digest, the rest are counted
+
+# ------------------ DUPLICATE CONTACTS ------------------
+DUPLICATE_THRESHOLD = 0.5  # name similarity (0-1) from which /add_contact asks before creating
+DUPLICATE_CANDIDATES = 20  # contacts sharing the most trigrams that are scored
+DUPLICATES_SHOWN = 3
+
+# ------------------ IDEMPOTENCY ------------------
+# A repeated modal submission within this window gets the first reply instead of running again
+IDEMPOTENCY_TTL_SECONDS = 600
+IDEMPOTENCY_CACHE_SIZE = 1000  # recent submissions kept in memory; older ones are looked up in the database
+
+# ------------------ CASE TEMPLATES ------------------
+TEMPLATE_MAX_TASKS = 50  # tasks one template may create
+
+# ------------------ CONFLICT CHECKS ------------------
+CONFLICT_HOPS = 2  # 1: the contact's own cases; 2: also cases of the other parties in those cases
+CONFLICTS_SHOWN = 15
+# Words in a role that put a party on one side of a case; "Attorney for Defendant" counts as defendant
+CONFLICT_SIDES = {
+    "plaintiff": "claimant", "claimant": "claimant", "petitioner": "claimant", "applicant": "claimant",
+    "defendant": "respondent", "respondent": "respondent", "accused": "respondent",
+}
+
+# ------------------ AUDIT LOG ------------------
+AUDIT_BATCH_SIZE = 50  # buffered events that trigger an immediate write
+AUDIT_FLUSH_SECONDS = 2.0  # longest an event stays buffered
+HISTORY_PAGE_SIZE = 10  # events per /case_history page
+
+# ------------------ THREAD HISTORY ------------------
+# Messages of case and contact threads are copied into thread_messages, see thread_sync.py
+THREAD_SYNC_MINUTES = 15  # how often threads are checked for messages the bot missed
+THREAD_SYNC_RATE = (2, 1.0)  # history requests per seconds, kept well below OUTBOUND_GLOBAL_RATE
+THREAD_SYNC_PAGES_PER_RUN = 300  # history requests one run may make; the stalest threads go first next run
+
+# ------------------ DOCUMENTS ------------------
+# Case files are stored once per content under DOCUMENTS_DIR/<first 2 hex digits>/<sha256>, see documents.py
+DOCUMENTS_DIR = os.getenv("DOCUMENTS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "documents"))
+DOCUMENT_MAX_BYTES = int(os.getenv("DOCUMENT_MAX_MB", "100")) * 1024 * 1024
+DOCUMENT_CHUNK_SIZE = 64 * 1024  # bytes read, hashed and written at a time
+DOCUMENT_DOWNLOAD_TIMEOUT = 300  # seconds one attachment may take to download
+DOCUMENTS_SHOWN = 200  # newest documents listed by /case_documents
+DOCUMENT_ORPHAN_HOURS = 24  # unreferenced files and failed downloads older than this are removed by maintenance
+
+# ------------------ EXPORTS ------------------
+EXPORT_BATCH_SIZE = 500  # audit events and thread messages read per query while writing a dossier
+EXPORT_MAX_CASES = 50  # cases one /export_cases zip may contain
+
+# ------------------ MAINTENANCE ------------------
+MAINTENANCE_INTERVAL_HOURS = int(os.getenv("MAINTENANCE_HOURS", "6"))
+VACUUM_PAGES_PER_STEP = 256  # free pages released per incremental_vacuum step
+MAINTENANCE_STEP_DELAY = 0.5  # seconds to yield to other connections between steps
+ANALYSIS_LIMIT = 1000  # rows sampled per index by ANALYZE
+
+# ------------------ BACKUPS ------------------
+BACKUP_DIR = os.getenv("BACKUP_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "backups"))
+BACKUP_INTERVAL_HOURS = int(os.getenv("BACKUP_HOURS", "24"))
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "7"))  # newest backups kept, older ones are deleted
+BACKUP_PAGES_PER_STEP = 100  # pages copied before pausing
+BACKUP_STEP_DELAY = 0.05  # seconds the backup pauses between steps
+
+# ------------------ STORAGE ------------------
+# Path of the SQLite database. ":memory:" keeps it in memory instead, shared by every
+# connection and thread of the process until it exits (tests and benchmarks)
+DATABASE_PATH = os.getenv("DATABASE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "database.db"))
+DATABASE_MEMORY_NAME = os.getenv("DATABASE_MEMORY_NAME", "bot")  # name of the shared in-memory database
+DATABASE_TIMEOUT = float(os.getenv("DATABASE_TIMEOUT", "10"))  # seconds a connection waits for another one's write lock
+DATABASE_JOURNAL_MODE = os.getenv("DATABASE_JOURNAL_MODE", "WAL")  # WAL lets the worker write while the bot reads
+DATABASE_SYNCHRONOUS = os.getenv("DATABASE_SYNCHRONOUS", "NORMAL")  # NORMAL is durable enough in WAL mode
+
+# ------------------ ARCHIVE ------------------
+# Closed cases are moved here by /archive_cases and attached on demand.
+# An in-memory live database gets an in-memory archive, since ":memory:" only attaches to one
+ARCHIVE_DATABASE_PATH = os.getenv(
+    "ARCHIVE_DATABASE_PATH",
+    ":memory:" if DATABASE_PATH == ":memory:" else os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive.db")
+)
+ARCHIVE_BATCH_SIZE = 50  # cases moved per transaction
 
 # ------------------ DATABASE ------------------
+MIGRATION_BATCH_SIZE = 5000  # rows copied per step when a migration rebuilds a table
+
 DATABASE_SCHEMA = {
         "cases": {
             "id": "TEXT",
@@ -32,7 +167,10 @@ DATABASE_SCHEMA = {
             "notes": "TEXT",
             "channel_id": "TEXT",  # linked forum post / channel
             "message_id": "TEXT",  # linked forum post / channel message
-            "created_at": "TIMESTAMP DEFAULT CURRENT_TIMESTAMP"
+            "created_at": "TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
+            "status": "TEXT DEFAULT 'open'",  # open / closed
+            "closed_at": "TIMESTAMP",
+            "guild_id": "TEXT"
         },
         "contacts": {
             "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
@@ -43,18 +181,144 @@ DATABASE_SCHEMA = {
             "discord_id": "TEXT",
             "channel_id": "TEXT",   # forum channel where contact post lives
             "message_id": "TEXT",   # message/post ID inside that channel
-            "created_at": "TIMESTAMP DEFAULT CURRENT_TIMESTAMP"
+            "created_at": "TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
+            "guild_id": "TEXT"
         },
         "case_contacts": {
-            "case_id": "TEXT",
-            "contact_id": "INTEGER",
+            "case_id": "TEXT REFERENCES cases(id) ON DELETE CASCADE",
+            "contact_id": "INTEGER REFERENCES contacts(id) ON DELETE CASCADE",
             "role": "TEXT"
         },
         "case_tasks": {
+            "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
+            "case_id": "TEXT REFERENCES cases(id) ON DELETE CASCADE",
+            "task": "TEXT NOT NULL",
+            "deadline": "TIMESTAMP",  # UTC, "YYYY-MM-DD HH:MM"
+            "done": "INTEGER DEFAULT 0",
+            "guild_id": "TEXT",  # copied from the case, for the per-guild reminder loop
+            "notified_at": "TIMESTAMP"  # set when the worker queued its reminder
+        },
+        "case_task_stats": {  # maintained by triggers on case_tasks, see migration 6
+            "case_id": "TEXT PRIMARY KEY REFERENCES cases(id) ON DELETE CASCADE",
+            "open_tasks": "INTEGER DEFAULT 0",
+            "done_tasks": "INTEGER DEFAULT 0",
+            "overdue_tasks": "INTEGER DEFAULT 0",
+            "next_deadline": "TIMESTAMP",  # earliest open deadline not yet passed (UTC)
+            "updated_at": "TIMESTAMP"
+        },
+        "case_events": {  # append-only audit log, kept when the case or contact is deleted
             "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
             "case_id": "TEXT",
+            "contact_id": "INTEGER",
+            "actor_id": "TEXT",  # Discord user ID
+            "action": "TEXT NOT NULL",
+            "description": "TEXT",
+            "diff": "TEXT",  # JSON {field: [old, new]}
+            "created_at": "TIMESTAMP",  # UTC, when the event was recorded
+            "guild_id": "TEXT"
+        },
+        "guild_settings": {
+            "guild_id": "TEXT PRIMARY KEY",
+            "employee_role_id": "TEXT",
+            "manager_role_id": "TEXT",
+            "notification_channel_id": "TEXT",
+            "case_forum_channel_id": "TEXT",
+            "contacts_forum_channel_id": "TEXT",
+            "updated_at": "TIMESTAMP DEFAULT CURRENT_TIMESTAMP"
+        },
+        "contact_trigrams": {  # search terms of contact names and details, see contact_index.py
+            "guild_id": "TEXT",
+            "trigram": "TEXT NOT NULL",
+            "contact_id": "INTEGER REFERENCES contacts(id) ON DELETE CASCADE"
+        },
+        "notification_outbox": {  # written by worker.py, sent by the bot
+            "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
+            "guild_id": "TEXT",
+            "channel_id": "TEXT",
+            "payload": "TEXT NOT NULL",  # JSON {"embed": ..., "ping": ...}
+            "status": "TEXT DEFAULT 'pending'",  # pending / sent / failed
+            "created_at": "TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
+            "sent_at": "TIMESTAMP"
+        },
+        "case_templates": {  # standard task sets for /create_case, per guild
+            "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
+            "guild_id": "TEXT NOT NULL",
+            "name": "TEXT NOT NULL",
+            "created_at": "TIMESTAMP DEFAULT CURRENT_TIMESTAMP"
+        },
+        "case_template_tasks": {
+            "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
+            "template_id": "INTEGER NOT NULL REFERENCES case_templates(id) ON DELETE CASCADE",
+            "position": "INTEGER NOT NULL",
             "task": "TEXT NOT NULL",
-            "deadline": "TIMESTAMP",
-            "done": "INTEGER DEFAULT 0"
+            "deadline_offset": "INTEGER"  # minutes after the case is created, NULL for no deadline
+        },
+        "idempotency_keys": {  # submissions being handled or recently handled, see idempotency.py
+            "key": "TEXT PRIMARY KEY",
+            "status": "TEXT NOT NULL",  # pending / done
+            "result": "TEXT",  # the reply the first submission got
+            "created_at": "TIMESTAMP DEFAULT CURRENT_TIMESTAMP"
+        },
+        "thread_messages": {  # copies of case and contact thread messages, see thread_sync.py
+            "id": "INTEGER PRIMARY KEY",  # Discord message ID; snowflakes grow with time
+            "thread_id": "TEXT NOT NULL",
+            "guild_id": "TEXT",
+            "author_id": "TEXT",
+            "author_name": "TEXT",
+            "content": "TEXT",  # message text, or the title and description of its embeds
+            "attachments": "TEXT",  # attachment URLs, one per line
+            "created_at": "TIMESTAMP",  # UTC
+            "edited_at": "TIMESTAMP"
+        },
+        "thread_cursors": {  # how far each thread has been copied
+            "thread_id": "TEXT PRIMARY KEY",
+            "guild_id": "TEXT",
+            "last_message_id": "INTEGER",  # newest message fetched from the history
+            "synced_at": "TIMESTAMP"
+        },
+        "case_documents": {  # files of a case; kept like case_events when the case is archived
+            "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
+            "case_id": "TEXT NOT NULL",
+            "guild_id": "TEXT",
+            "sha256": "TEXT NOT NULL",  # name of the stored file, shared by identical uploads
+            "filename": "TEXT NOT NULL",
+            "content_type": "TEXT",
+            "size": "INTEGER",  # bytes
+            "uploaded_by": "TEXT",  # Discord user ID
+            "channel_id": "TEXT",  # thread and message the file was posted in, if any
+            "message_id": "TEXT",
+            "created_at": "TIMESTAMP DEFAULT CURRENT_TIMESTAMP"
+        },
+        "user_preferences": {
+            "discord_id": "TEXT PRIMARY KEY",
+            "timezone": "TEXT",
+            "digest_enabled": "INTEGER DEFAULT 0",
+            "digest_sent_on": "TEXT"  # UTC date of the last digest, so a restart doesn't send it twice
         }
-    }
\ No newline at end of file
+    }
+
+# index name -> (table, columns, unique)
+DATABASE_INDEXES = {
+        "idx_cases_id": ("cases", "id", True),  # parent key for the foreign keys above
+        "idx_case_contacts_case": ("case_contacts", "case_id", False),
+        "idx_case_contacts_contact": ("case_contacts", "contact_id", False),
+        "idx_case_tasks_case": ("case_tasks", "case_id", False),
+        "idx_cases_status": ("cases", "status, closed_at", False),
+        # guild first, so every per-guild list and loop reads one index range
+        "idx_cases_guild": ("cases", "guild_id, status, closed_at", False),
+        "idx_contacts_guild": ("contacts", "guild_id, id", False),
+        "idx_case_tasks_guild": ("case_tasks", "guild_id, done, deadline", False),
+        "idx_contact_trigrams": ("contact_trigrams", "guild_id, trigram, contact_id", True),
+        "idx_contact_trigrams_contact": ("contact_trigrams", "contact_id", False),  # reindexing and cascades
+        "idx_notification_outbox_status": ("notification_outbox", "status, id", False),
+        "idx_contacts_discord_id": ("contacts", "discord_id", False),  # digest: user -> linked contacts
+        # ids increase with time, so these serve newest-first history pages
+        "idx_case_events_case": ("case_events", "case_id, id", False),
+        "idx_case_events_contact": ("case_events", "contact_id, id", False),
+        "idx_case_templates_name": ("case_templates", "guild_id, name", True),
+        "idx_case_template_tasks_template": ("case_template_tasks", "template_id, position", False),
+        "idx_thread_messages_thread": ("thread_messages", "thread_id, id", False),
+        "idx_case_documents_case": ("case_documents", "case_id, sha256", True),  # a file is listed once per case
+        "idx_case_documents_sha256": ("case_documents", "sha256", False),
+        "idx_case_contacts_link": ("case_contacts", "case_id, contact_id", True),  # a contact is linked once per case
+    }
@@ -0,0 +1,116 @@
+"""
+Deadline parsing and formatting.
+
+Users enter deadlines as DD.MM.YYYY or DD.MM.YYYY HH:MM in their own timezone
+(falling back to settings.FIRM_TIMEZONE). Deadlines are stored in UTC as
+"YYYY-MM-DD HH:MM", so string comparisons in SQL stay correct across DST
+changes, and are shown as Discord <t:...> timestamps in each viewer's local time.
+"""
+import re
+from datetime import datetime, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import clock
+import settings
+
+STORAGE_FORMAT = "%Y-%m-%d %H:%M"
+
+# Regexes instead of trying strptime formats one after another
+USER_INPUT_RE = re.compile(r"\s*(\d{1,2})\.(\d{1,2})\.(\d{4})(?:\s+(\d{1,2}):(\d{2}))?\s*")
+OFFSET_RE = re.compile(r"\s*(\d+)\s*([dhm])", re.IGNORECASE)  # e.g. "14d", "3d 12h", "90m"
+STORED_RE = re.compile(r"\s*(\d{4})-(\d{2})-(\d{2})(?:[ T](\d{2}):(\d{2})(?::\d{2})?)?\s*")  # seconds are ignored
+
+
+def now():
+    """Current UTC time from the installed clock (see clock.py)."""
+    return clock.now()
+
+
+@lru_cache(maxsize=None)
+def get_timezone(name=None):
+    """ZoneInfo for `name`, or the firm's timezone if `name` is empty or unknown."""
+    try:
+        return ZoneInfo(name or settings.FIRM_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(settings.FIRM_TIMEZONE)
+
+
+def is_valid_timezone(name):
+    try:
+        ZoneInfo(name)
+        return True
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+
+
+def _build(match, tz, day_first):
+    if not match:
+        return None
+    a, b, c, hour, minute = match.groups()
+    day, month, year = (a, b, c) if day_first else (c, b, a)
+    try:
+        local = datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0), tzinfo=tz)
+    except ValueError:
+        return None  # e.g. 31.02.2025 or 25:00
+    return local.astimezone(timezone.utc)
+
+
+@lru_cache(maxsize=4096)
+def parse_deadline(text, tz_name=None):
+    """
+    Parses user input (DD.MM.YYYY or DD.MM.YYYY HH:MM) entered in `tz_name`.
+    Returns an aware UTC datetime, or None for malformed input.
+    """
+    if not text:
+        return None
+    return _build(USER_INPUT_RE.fullmatch(text), get_timezone(tz_name), day_first=True)
+
+
+@lru_cache(maxsize=65536)
+def parse_stored(value):
+    """Parses a stored deadline ("YYYY-MM-DD HH:MM", UTC) into an aware datetime, or None."""
+    if not value:
+        return None
+    return _build(STORED_RE.fullmatch(value), timezone.utc, day_first=False)
+
+
+def parse_many(values):
+    """Parses a batch of stored deadlines; repeated values are only parsed once."""
+    return [parse_stored(value) for value in values]
+
+
+def parse_offset(text):
+    """Parses a relative deadline such as "14d" or "2d 4h" into minutes, or None for malformed input."""
+    parts = OFFSET_RE.findall(text or "")
+    if not parts or OFFSET_RE.sub("", text).strip():
+        return None
+    return sum(int(amount) * {"d": 1440, "h": 60, "m": 1}[unit.lower()] for amount, unit in parts)
+
+
+def format_offset(minutes):
+    days, rest = divmod(minutes, 1440)
+    hours, minutes = divmod(rest, 60)
+    return " ".join(f"{value}{unit}" for value, unit in ((days, "d"), (hours, "h"), (minutes, "m")) if value) or "0m"
+
+
+def to_storage(dt):
+    return dt.astimezone(timezone.utc).strftime(STORAGE_FORMAT)
+
+
+def local_to_storage(value, tz_name=None):
+    """Converts a deadline stored in local time (the format before UTC storage) to UTC storage format."""
+    if not value:
+        return None
+    dt = _build(STORED_RE.fullmatch(value), get_timezone(tz_name), day_first=False)
+    return to_storage(dt) if dt else None
+
+
+def discord_timestamp(dt, style="f"):
+    """Renders `dt` as a Discord timestamp, shown in each viewer's own timezone."""
+    return f"<t:{int(dt.timestamp())}:{style}>"
+
+
+def format_deadline(value, style="f"):
+    """Formats a stored deadline for an embed, keeping unparseable values as they are."""
+    dt = parse_stored(value)
+    return discord_timestamp(dt, style) if dt else value
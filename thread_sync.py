@@ -0,0 +1,143 @@
+"""
+Local copies of the messages in case and contact forum threads.
+
+Messages posted while the bot is online are stored as they arrive (on_message,
+on_message_edit, on_raw_message_delete). sync() catches up on everything else:
+for each thread it pages the history after the thread's cursor, the newest
+message ID copied so far, so a run only fetches what is new. Threads whose
+cached last message is not past the cursor cost no request at all. History
+requests are throttled by their own token bucket and capped per run; the
+threads synced longest ago go first, so a capped run is continued next time.
+"""
+import asyncio
+import discord
+import database
+import guild_config
+import metrics
+import outbound
+import settings
+
+PAGE_SIZE = 100  # messages per history request, Discord's maximum
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_tracked = {}  # thread_id -> guild_id of every case and contact thread, refreshed by sync()
+_bucket = outbound.TokenBucket(*settings.THREAD_SYNC_RATE)
+
+
+def message_row(message):
+    """A thread_messages row (ThreadMessage field order) for a Discord message."""
+    content = message.content
+    if not content and message.embeds:  # the bot's own log posts
+        content = "\n".join(filter(None, (part for e in message.embeds for part in (e.title, e.description))))
+    return (
+        message.id,
+        str(message.channel.id),
+        str(message.guild.id) if message.guild else None,
+        str(message.author.id),
+        message.author.display_name,
+        content or None,
+        "\n".join(a.url for a in message.attachments) or None,
+        message.created_at.strftime(TIME_FORMAT),
+        message.edited_at.strftime(TIME_FORMAT) if message.edited_at else None,
+    )
+
+
+async def _get_thread(client, thread_id):
+    thread = client.get_channel(thread_id)
+    if thread is None:  # Discord-archived threads are not cached
+        await _bucket.acquire()
+        thread = await client.fetch_channel(thread_id)
+    return thread
+
+
+async def sync_thread(client, thread_id, guild_id=None, after_id=None, max_pages=None):
+    """
+    Copies the messages of a thread newer than `after_id` (its stored cursor if not given).
+    Returns (messages stored, history requests made, caught up).
+    """
+    if after_id is None:
+        after_id = await asyncio.to_thread(database.get_thread_cursor, thread_id)
+    try:
+        thread = await _get_thread(client, int(thread_id))
+    except (discord.NotFound, discord.Forbidden):
+        await asyncio.to_thread(database.save_thread_messages, [], thread_id, guild_id)  # move it to the back
+        return 0, 1, True
+
+    if after_id and thread.last_message_id and thread.last_message_id <= after_id:
+        await asyncio.to_thread(database.save_thread_messages, [], thread_id, guild_id)
+        return 0, 0, True
+
+    stored = pages = 0
+    while max_pages is None or pages < max_pages:
+        await _bucket.acquire()
+        after = discord.Object(after_id) if after_id else None
+        page = [message async for message in thread.history(limit=PAGE_SIZE, after=after, oldest_first=True)]
+        pages += 1
+        if page:
+            after_id = page[-1].id
+        await asyncio.to_thread(
+            database.save_thread_messages, [message_row(m) for m in page], thread_id, guild_id or thread.guild.id, after_id
+        )
+        stored += len(page)
+        if len(page) < PAGE_SIZE:
+            return stored, pages, True
+    return stored, pages, False
+
+
+async def sync(client):
+    """One catch-up run over all case and contact threads, within settings.THREAD_SYNC_PAGES_PER_RUN."""
+    threads = await asyncio.to_thread(database.get_tracked_threads)
+    _tracked.clear()
+    _tracked.update((int(t.thread_id), t.guild_id) for t in threads)
+
+    budget = settings.THREAD_SYNC_PAGES_PER_RUN
+    stored = behind = 0
+    for thread in threads:
+        if budget <= 0:
+            behind += 1
+            continue
+        try:
+            count, pages, caught_up = await sync_thread(
+                client, thread.thread_id, thread.guild_id, thread.last_message_id, budget
+            )
+        except discord.HTTPException as e:
+            print(f"[THREADS] Syncing thread {thread.thread_id} failed: {e}")
+            continue
+        budget -= pages
+        stored += count
+        behind += not caught_up
+
+    metrics.increment("thread_messages_synced", stored)
+    metrics.set_value("threads_behind", behind)
+    if stored or behind:
+        print(f"[THREADS] Stored {stored} missed messages ({behind} threads still behind)")
+
+
+def is_tracked(channel):
+    if channel.id in _tracked:
+        return True
+    if not isinstance(channel, discord.Thread):
+        return False
+    # Threads created since the last sync: anything in a case or contact forum
+    config = guild_config.get(channel.guild.id)
+    forums = {config.case_forum_channel_id, config.contacts_forum_channel_id} if config else set()
+    if str(channel.parent_id) in forums:
+        _tracked[channel.id] = str(channel.guild.id)
+        return True
+    return False
+
+
+# ------------------ LIVE EVENTS ------------------
+async def on_message(message):
+    if message.guild and is_tracked(message.channel):
+        await asyncio.to_thread(database.save_thread_messages, [message_row(message)])
+
+
+async def on_message_edit(before, after):
+    if after.guild and is_tracked(after.channel):
+        await asyncio.to_thread(database.save_thread_messages, [message_row(after)])
+
+
+async def on_raw_message_delete(payload):
+    if payload.channel_id in _tracked:
+        await asyncio.to_thread(database.delete_thread_message, payload.message_id)
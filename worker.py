@@ -0,0 +1,96 @@
+"""
+Reminder worker: scans for due and overdue tasks and renders their notifications.
+
+Runs in its own process (see MainScript.py), so a long scan never delays command
+handling. Rendered notifications are written to the notification_outbox table in
+the same transaction that marks their tasks as notified; the bot process only
+sends what it finds there (MainScript.deliver_notifications).
+"""
+import json
+import time
+import discord
+import database
+import metrics
+import settings
+import temporal
+
+
+def render_notification(task, task_dt, case, contacts, digest_users, now):
+    """Embed and ping text for one task, as the JSON payload stored in the outbox."""
+    # Collect mentions for Discord users who have discord_id set
+    linked = [f"<@{c.discord_id}>" for c in contacts if c.discord_id]
+    mention_text = " ".join(linked) if linked else "No users linked"
+    mentions = [f"<@{c.discord_id}>" for c in contacts if c.discord_id and c.discord_id not in digest_users]
+
+    if task_dt < now:
+        embed = discord.Embed(title="❌ Task Overdue!", color=discord.Color.red(), timestamp=task_dt)
+    else:
+        embed = discord.Embed(title="⚠️ Task Due Soon!", color=discord.Color.orange(), timestamp=task_dt)
+    embed.add_field(name="Task", value=task.task, inline=False)
+    embed.add_field(name="Case", value=f"{case.name} (ID: {case.id})", inline=False)
+    embed.add_field(name="Deadline", value=temporal.discord_timestamp(task_dt, "F"), inline=False)
+    embed.add_field(name="Linked Contacts", value=mention_text, inline=False)
+    embed.set_footer(text="Reminder from TaskBot")
+
+    return json.dumps({
+        "embed": embed.to_dict(),
+        "ping": "🔔 " + " ".join(mentions) if mentions else None,
+    }, ensure_ascii=False)
+
+
+def scan_guild(guild_id, digest_users):
+    """Queues notifications for a guild's due tasks and returns them as a list of (task_id, payload)."""
+    # Read fresh each scan: /configure invalidates guild_config's cache in the bot process, not here
+    guild_settings = database.get_guild_settings(guild_id)
+    if not guild_settings or not guild_settings.notification_channel_id:
+        return []  # no channel to notify in
+
+    now = temporal.now()
+    upcoming_window = now + settings.DUE_SOON_WINDOW
+    tasks = database.get_tasks_to_notify(guild_id, temporal.to_storage(upcoming_window))
+    metrics.increment("reminder_tasks_scanned", len(tasks))
+
+    notifications = []
+    deadlines = temporal.parse_many(task.deadline for task in tasks)
+    for task, task_dt in zip(tasks, deadlines):
+        if not task_dt:
+            continue
+        case = database.get_case_by_id(task.case_id)
+        if not case:
+            continue  # task of a deleted case
+        contacts = database.get_contacts_for_case(task.case_id)
+        notifications.append((task.id, render_notification(task, task_dt, case, contacts, digest_users, now)))
+
+    database.queue_notifications(
+        guild_id, guild_settings.notification_channel_id, notifications, now.strftime("%Y-%m-%d %H:%M:%S")
+    )
+    return notifications
+
+
+def scan_once():
+    digest_users = database.get_digest_user_ids()  # they get a daily DM instead of pings
+    queued = 0
+    for guild_id in database.get_configured_guild_ids():
+        try:
+            queued += len(scan_guild(guild_id, digest_users))
+        except Exception as e:
+            print(f"[WORKER] Checking guild {guild_id} failed: {e}")
+    return queued
+
+
+def run():
+    print(f"[WORKER] Reminder worker started, scanning every {settings.REMINDER_SCAN_MINUTES} minutes")
+    while True:
+        started = time.monotonic()
+        try:
+            queued = scan_once()
+        except Exception as e:  # e.g. "database is locked" during a backup; try again next round
+            print(f"[WORKER] Scan failed: {e}")
+            queued = 0
+        if queued:
+            print(f"[WORKER] Queued {queued} notifications in {time.monotonic() - started:.2f}s")
+        time.sleep(settings.REMINDER_SCAN_MINUTES * 60)
+
+
+if __name__ == "__main__":
+    run()